@@ -1,5 +1,94 @@
-from django.contrib import admin
-from .models import Lead, UploadHistory
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.db.models import Q
+from .bulk import BULK_EDITABLE_FIELDS, chunked_delete, chunked_update
+from .canonical import company_key, location_key
+from .forms import LeadNotesForm
+from .ingest import rollback_upload
+from .models import Company, Lead, LeadFacet, Location, SavedSearch, UploadHistory
+from .pagination import EstimatedCountPaginator
+from .signals import lead_snapshot, notify_leads_changed
+
+
+class LeadBulkActionForm(ActionForm):
+    """Action bar with a field/value pair for the bulk edit action"""
+    field = forms.ChoiceField(
+        choices=[('', '---------')] + [(f, f.replace('_', ' ')) for f in BULK_EDITABLE_FIELDS],
+        required=False
+    )
+    value = forms.CharField(required=False)
+
+
+class DimensionListFilter(admin.SimpleListFilter):
+    """Sidebar of the most common canonical values, read from the maintained counts"""
+    model = None
+    size = 50
+
+    def lookups(self, request, model_admin):
+        rows = self.model.objects.filter(lead_count__gt=0).values_list('pk', 'name')[:self.size]
+        return [(str(pk), name) for pk, name in rows]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{f'{self.parameter_name}_id': self.value()})
+        return queryset
+
+
+class CompanyListFilter(DimensionListFilter):
+    title = 'company'
+    parameter_name = 'canonical_company'
+    model = Company
+
+
+class LocationListFilter(DimensionListFilter):
+    title = 'location'
+    parameter_name = 'canonical_location'
+    model = Location
+
+
+# Distinct company, location or role values a search term may expand to
+MAX_SEARCH_VALUES = 200
+
+
+def _prefix_range(field, prefix):
+    # A range rather than LIKE, so a plain btree index serves it on any collation
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': prefix + '\uffff'})
+
+
+def indexed_search_filter(term):
+    """
+    Admin search that only touches indexes on the lead table: exact email,
+    name prefix, and companies, locations and roles containing the term.
+    Those are matched in the Company, Location and LeadFacet tables, which
+    hold one row per distinct value, and then looked up on Lead by key.
+    """
+    term = term.strip()
+    if '@' in term:
+        return Q(email__in={term, term.lower()})
+
+    q = Q()
+    for variant in {term, term.capitalize(), term.title()}:
+        q |= _prefix_range('name', variant)
+
+    # Resolve to ID lists first: IN subqueries would stop the planner using an index per branch
+    if company_key(term):
+        companies = list(Company.objects.filter(key__contains=company_key(term))
+                         .order_by().values_list('pk', flat=True)[:MAX_SEARCH_VALUES])
+        if companies:
+            q |= Q(canonical_company__in=companies)
+    if location_key(term):
+        locations = list(Location.objects.filter(key__contains=location_key(term))
+                         .order_by().values_list('pk', flat=True)[:MAX_SEARCH_VALUES])
+        if locations:
+            q |= Q(canonical_location__in=locations)
+    roles = list(
+        LeadFacet.objects.filter(facet='role', value__icontains=term, count__gt=0)
+        .order_by().values_list('value', flat=True)[:MAX_SEARCH_VALUES]
+    )
+    if roles:
+        q |= Q(role__in=roles)
+    return q
 
 
 @admin.register(Lead)
@@ -12,9 +101,76 @@ class LeadAdmin(admin.ModelAdmin):
         'match_score',
         'created_at'
     ]
-    list_filter = ['created_at', 'company']
-    search_fields = ['name', 'email', 'skills', 'company']
+    # Only indexed columns can be sorted on
+    sortable_by = ['name', 'email', 'company', 'role', 'created_at']
+    list_filter = ['created_at', CompanyListFilter, LocationListFilter]
+    # Matched by indexed_search_filter, not by LIKE over these columns
+    search_fields = ['name', 'email', 'company', 'location', 'role']
+    form = LeadNotesForm
+    search_help_text = "Exact email, name prefix, or part of a company, location or role"
     ordering = ['-created_at']
+    paginator = EstimatedCountPaginator
+    # Skip the second, unfiltered COUNT(*) behind "N total"
+    show_full_result_count = False
+    action_form = LeadBulkActionForm
+    actions = ['delete_in_chunks', 'update_in_chunks']
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if request.resolver_match and request.resolver_match.url_name.endswith('_changelist'):
+            # Load the displayed columns only; skills can be large
+            queryset = queryset.only('pk', *self.list_display)
+        return queryset
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(indexed_search_filter(search_term)), False
+
+    def get_actions(self, request):
+        # The stock action loads every selected object for its confirmation page
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def delete_model(self, request, obj):
+        pk = obj.pk
+        before = {pk: lead_snapshot(obj)}
+        super().delete_model(request, obj)
+        notify_leads_changed(deleted=[pk], before=before)
+
+    def delete_queryset(self, request, queryset):
+        chunked_delete(queryset)
+
+    @admin.action(description="Delete selected leads (chunked)", permissions=['delete'])
+    def delete_in_chunks(self, request, queryset):
+        result = chunked_delete(queryset)
+        self.message_user(
+            request,
+            f"Deleted {result['processed']} of {result['matched']} leads in {result['chunks']} chunks",
+            messages.SUCCESS
+        )
+
+    @admin.action(description="Set field on selected leads (chunked)", permissions=['change'])
+    def update_in_chunks(self, request, queryset):
+        field = request.POST.get('field')
+        value = request.POST.get('value', '')
+        if field not in BULK_EDITABLE_FIELDS:
+            self.message_user(request, "Choose a field to update", messages.ERROR)
+            return
+        if field == 'experience_years':
+            try:
+                value = int(value)
+            except ValueError:
+                self.message_user(request, "Experience years must be a number", messages.ERROR)
+                return
+
+        result = chunked_update(queryset, {field: value})
+        self.message_user(
+            request,
+            f"Updated {field} on {result['processed']} of {result['matched']} leads in {result['chunks']} chunks",
+            messages.SUCCESS
+        )
 
 
 @admin.register(UploadHistory)
@@ -23,7 +179,43 @@ class UploadHistoryAdmin(admin.ModelAdmin):
         'filename',
         'uploaded_at',
         'records_imported',
-        'records_updated'
+        'records_updated',
+        'rolled_back_at'
     ]
     list_filter = ['uploaded_at']
     ordering = ['-uploaded_at']
+    actions = ['roll_back']
+
+    @admin.action(description="Roll back selected uploads", permissions=['change'])
+    def roll_back(self, request, queryset):
+        # Newest first, so an older upload's restore is not undone by a newer one
+        for upload in queryset.order_by('-uploaded_at'):
+            try:
+                result = rollback_upload(upload)
+            except ValueError as e:
+                self.message_user(request, str(e), messages.WARNING)
+                continue
+            self.message_user(
+                request,
+                f"Rolled back {upload.filename}: deleted {result['deleted']} leads, "
+                f"restored {result['restored']}, skipped {result['skipped']} changed by later uploads",
+                messages.SUCCESS
+            )
+
+
+class DimensionAdmin(admin.ModelAdmin):
+    list_display = ['name', 'key', 'lead_count']
+    search_fields = ['name', 'key']
+    readonly_fields = ['key', 'lead_count']
+    ordering = ['-lead_count', 'name']
+
+
+admin.site.register(Company, DimensionAdmin)
+admin.site.register(Location, DimensionAdmin)
+
+
+@admin.register(SavedSearch)
+class SavedSearchAdmin(admin.ModelAdmin):
+    list_display = ['name', 'query', 'created_at', 'last_viewed_at']
+    search_fields = ['name', 'query']
+    readonly_fields = ['query', 'tokens']
@@ -0,0 +1,343 @@
+"""
+Shared OpenAI client for the AI lead search.
+
+Several things sit in front of `chat.completions.create`:
+
+* single-flight coalescing: concurrent identical requests share one
+  in-flight call instead of each hitting the API;
+* client-side request and token buckets that make callers queue for
+  capacity rather than run into the API's rate_limit errors;
+* bounded retries with jittered exponential backoff, all inside one
+  latency budget per request;
+* a circuit breaker that opens after consecutive failed or slow calls
+  and fails fast until the upstream has had time to recover.
+
+All of it is per process. Queue depth, wait times and breaker state are
+available from `AIClient.stats()`.
+"""
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+import openai
+from openai import OpenAI
+
+from .prompting import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Upstream errors worth another attempt; anything else (bad key, bad request) is final
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+class AIUnavailable(Exception):
+    """The AI search cannot answer within its latency budget right now"""
+
+
+class CircuitOpen(AIUnavailable):
+    pass
+
+
+class BudgetExhausted(AIUnavailable):
+    pass
+
+
+class TokenBucket:
+    """
+    Blocking token bucket. Each caller reserves its tokens on arrival and
+    sleeps until the reservation is covered, so callers are served in
+    arrival order and nobody is rejected.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate  # tokens per second
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.max_waiting = 0
+        self.acquired = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def acquire(self, amount=1, max_wait=None):
+        """
+        Take `amount` tokens, blocking until they are available. Returns seconds waited.
+        Raises BudgetExhausted without taking anything if the wait would exceed `max_wait`.
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            remaining = self._tokens - amount
+            delay = -remaining / self.rate if remaining < 0 else 0.0
+            if max_wait is not None and delay > max_wait:
+                raise BudgetExhausted(f"Rate limit queue wait of {delay:.1f}s exceeds the budget")
+            self._tokens = remaining
+            if delay:
+                self.waiting += 1
+                self.max_waiting = max(self.max_waiting, self.waiting)
+
+        if delay:
+            time.sleep(delay)
+
+        with self._lock:
+            if delay:
+                self.waiting -= 1
+            self.acquired += 1
+            self.total_wait += delay
+            self.max_wait = max(self.max_wait, delay)
+        return delay
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queue_depth': self.waiting,
+                'max_queue_depth': self.max_waiting,
+                'acquired': self.acquired,
+                'avg_wait': round(self.total_wait / self.acquired, 4) if self.acquired else 0.0,
+                'max_wait': round(self.max_wait, 4),
+            }
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures, where a call
+    slower than `slow_call_seconds` counts as a failure. While open every
+    call fails fast; after `reset_timeout` one trial call is let through
+    (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, slow_call_seconds, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self.trips = 0
+
+    def before_call(self):
+        """Raise CircuitOpen unless a call may go ahead"""
+        with self._lock:
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpen("OpenAI circuit is open")
+                self._state = self.HALF_OPEN
+                self._trial_running = False
+            if self._state == self.HALF_OPEN:
+                if self._trial_running:
+                    raise CircuitOpen("OpenAI circuit is half-open; trial call in progress")
+                self._trial_running = True
+
+    def release(self):
+        """End a call that says nothing about upstream health, leaving the state as it is"""
+        with self._lock:
+            self._trial_running = False
+
+    def record(self, success, elapsed):
+        with self._lock:
+            if success and elapsed <= self.slow_call_seconds:
+                self._state = self.CLOSED
+                self._failures = 0
+                self._trial_running = False
+                return
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.trips += 1
+                    logger.warning("OpenAI circuit opened after %d failed or slow calls", self._failures)
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trial_running = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def stats(self):
+        with self._lock:
+            failures = self._failures
+        return {'state': self.state, 'consecutive_failures': failures, 'trips': self.trips}
+
+
+def backoff_delay(attempt, base, cap):
+    """Full-jitter exponential backoff for retry number `attempt` (0-based)"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers share its outcome"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+
+def request_key(kwargs):
+    """Stable identity of a completion request"""
+    return hashlib.sha256(json.dumps(kwargs, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def estimate_request_tokens(kwargs):
+    """Prompt tokens plus the completion allowance, as the API's TPM limit counts them"""
+    prompt = sum(count_tokens(m.get('content') or '') for m in kwargs.get('messages', []))
+    return prompt + (kwargs.get('max_tokens') or 0)
+
+
+class AIClient:
+    def __init__(self, client, requests_per_minute, tokens_per_minute,
+                 max_retries=2, backoff_base=0.5, backoff_cap=4.0, latency_budget=25.0,
+                 failure_threshold=5, slow_call_seconds=15.0, reset_timeout=30.0):
+        self.client = client
+        self.request_bucket = TokenBucket(requests_per_minute / 60.0, max(1, requests_per_minute // 6))
+        self.token_bucket = TokenBucket(tokens_per_minute / 60.0, max(1, tokens_per_minute // 6))
+        self.flight = SingleFlight()
+        self.breaker = CircuitBreaker(failure_threshold, slow_call_seconds, reset_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.latency_budget = latency_budget
+
+    def chat_completion(self, **kwargs):
+        """
+        `chat.completions.create`, coalesced, rate limited and retried.
+        Raises AIUnavailable when the circuit is open or the latency budget
+        runs out, and the last upstream error when retries are exhausted.
+        """
+        return self.flight.do(request_key(kwargs), lambda: self._create(kwargs))
+
+    def _create(self, kwargs):
+        deadline = time.monotonic() + self.latency_budget
+        tokens = estimate_request_tokens(kwargs)
+
+        for attempt in range(self.max_retries + 1):
+            # Fail fast while open, before queueing for rate limit capacity
+            if self.breaker.state == CircuitBreaker.OPEN:
+                raise CircuitOpen("OpenAI circuit is open")
+            self.request_bucket.acquire(1, max_wait=deadline - time.monotonic())
+            self.token_bucket.acquire(tokens, max_wait=deadline - time.monotonic())
+            # Checked before claiming the half-open trial, which every exit below must give back
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise BudgetExhausted("No time left in the latency budget")
+            self.breaker.before_call()
+
+            started = time.monotonic()
+            try:
+                response = self.client.with_options(timeout=remaining).chat.completions.create(**kwargs)
+            except RETRYABLE_ERRORS as e:
+                self.breaker.record(False, time.monotonic() - started)
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+                if attempt == self.max_retries or time.monotonic() + delay >= deadline:
+                    raise
+                logger.info("OpenAI call failed (%s), retry %d in %.2fs", type(e).__name__, attempt + 1, delay)
+                time.sleep(delay)
+                continue
+            except BaseException:
+                # Not the upstream's health (bad key, bad request): leave the breaker alone
+                self.breaker.release()
+                raise
+
+            self.breaker.record(True, time.monotonic() - started)
+            return response
+
+    def stats(self):
+        return {
+            'in_flight': self.flight.in_flight(),
+            'coalesced': self.flight.coalesced,
+            'circuit': self.breaker.stats(),
+            'requests': self.request_bucket.stats(),
+            'tokens': self.token_bucket.stats(),
+        }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_ai_client():
+    """Process-wide AIClient built from settings"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = AIClient(
+                # Retries happen here, inside the latency budget, not in the SDK
+                OpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL, max_retries=0),
+                requests_per_minute=settings.LEADS_OPENAI_REQUESTS_PER_MINUTE,
+                tokens_per_minute=settings.LEADS_OPENAI_TOKENS_PER_MINUTE,
+                max_retries=settings.LEADS_OPENAI_MAX_RETRIES,
+                latency_budget=settings.LEADS_AI_LATENCY_BUDGET,
+                failure_threshold=settings.LEADS_OPENAI_BREAKER_FAILURES,
+                slow_call_seconds=settings.LEADS_OPENAI_BREAKER_SLOW_CALL_SECONDS,
+                reset_timeout=settings.LEADS_OPENAI_BREAKER_RESET_SECONDS,
+            )
+        return _client
+
+
+@receiver(setting_changed)
+def reset_ai_client(setting, **kwargs):
+    global _client
+    if setting.startswith(('OPENAI_', 'LEADS_OPENAI_', 'LEADS_AI_')):
+        with _client_lock:
+            _client = None
@@ -0,0 +1,204 @@
+"""
+Versioned JSON API for programmatic lead lookup, upsert and listing.
+
+Responses are encoded with orjson and built from `.values()` rows, so
+integration traffic never renders a template or instantiates models
+for reading.
+"""
+from functools import wraps
+import hmac
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db.models import F, Q
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+import orjson
+
+from .ingest import UPSERT_FIELDS, upsert_leads
+from .models import Lead, LeadText
+
+LEAD_API_FIELDS = [
+    'id', 'name', 'email', 'phone', 'role', 'company', 'linkedin_url',
+    'location', 'skills', 'experience_years', 'match_score',
+    'created_at', 'updated_at',
+]
+# Response fields joined in from LeadText
+LEAD_API_TEXT = {'notes': F('text__notes')}
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def json_response(data, status=200):
+    return HttpResponse(orjson.dumps(data), status=status, content_type='application/json')
+
+
+def error_response(message, status=400, **extra):
+    return json_response({'error': message, **extra}, status=status)
+
+
+def _authorized(request):
+    """Whether the request carries `Authorization: Bearer <LEADS_API_TOKEN>`"""
+    header = request.headers.get('Authorization', '')
+    return hmac.compare_digest(header, f'Bearer {settings.LEADS_API_TOKEN}')
+
+
+def api_view(view):
+    """
+    CSRF-exempt token-checked JSON endpoint. Without LEADS_API_TOKEN the API
+    is off: being CSRF-exempt, it would otherwise take writes from any site
+    a visitor's browser is on.
+    """
+    @csrf_exempt
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if not settings.LEADS_API_TOKEN:
+            return error_response('The API is disabled; set LEADS_API_TOKEN to enable it', status=403)
+        if not _authorized(request):
+            return error_response('Invalid or missing API token', status=401)
+        return view(request, *args, **kwargs)
+    return wrapped
+
+
+def _parse_body(request):
+    try:
+        return orjson.loads(request.body or b'{}')
+    except orjson.JSONDecodeError:
+        return None
+
+
+def clean_lead_row(data):
+    """
+    Validate one upsert payload item.
+    Returns (row, errors); row is None when the item is rejected.
+    """
+    if not isinstance(data, dict):
+        return None, ['Each lead must be a JSON object']
+
+    errors = []
+    unknown = set(data) - set(UPSERT_FIELDS)
+    if unknown:
+        errors.append(f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    row = {}
+    for field_name in UPSERT_FIELDS:
+        if field_name not in data:
+            continue
+        value = data[field_name]
+        model = LeadText if field_name in LeadText.TEXT_FIELDS else Lead
+        field = model._meta.get_field(field_name)
+        if field_name == 'experience_years':
+            if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+                errors.append('experience_years must be a non-negative integer')
+                continue
+        else:
+            value = '' if value is None else str(value).strip()
+            if field.max_length and len(value) > field.max_length:
+                errors.append(f'{field_name} must be at most {field.max_length} characters')
+                continue
+        row[field_name] = value
+
+    if not row.get('name'):
+        errors.append('name is required')
+    try:
+        validate_email(row.get('email', ''))
+    except ValidationError:
+        errors.append('A valid email is required')
+
+    return (None, errors) if errors else (row, [])
+
+
+@api_view
+@require_GET
+def lead_list(request):
+    """
+    Cursor-paginated listing in primary key order.
+    `?cursor=` takes the `next_cursor` of the previous page.
+    """
+    try:
+        limit = min(int(request.GET.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        cursor = int(request.GET.get('cursor') or 0)
+    except ValueError:
+        return error_response('cursor and limit must be integers')
+    if limit < 1:
+        return error_response('limit must be positive')
+
+    # Fetch one extra row to know whether another page exists
+    rows = list(
+        Lead.objects.filter(pk__gt=cursor)
+        .order_by('pk')
+        .values(*LEAD_API_FIELDS, **LEAD_API_TEXT)[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    return json_response({
+        'results': rows,
+        'next_cursor': str(rows[-1]['id']) if has_more else None,
+    })
+
+
+@api_view
+@require_POST
+def lead_lookup(request):
+    """Fetch up to LEADS_API_MAX_BATCH leads by `ids` and/or `emails` in one query"""
+    payload = _parse_body(request)
+    if not isinstance(payload, dict):
+        return error_response('Request body must be a JSON object')
+
+    ids = payload.get('ids') or []
+    emails = payload.get('emails') or []
+    if not isinstance(ids, list) or not isinstance(emails, list):
+        return error_response('ids and emails must be lists')
+    if not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids):
+        return error_response('ids must be integers')
+    if len(ids) + len(emails) > settings.LEADS_API_MAX_BATCH:
+        return error_response(f'At most {settings.LEADS_API_MAX_BATCH} ids and emails per request')
+
+    rows = list(
+        Lead.objects.filter(Q(pk__in=ids) | Q(email__in=[str(e) for e in emails]))
+        .order_by('pk')
+        .values(*LEAD_API_FIELDS, **LEAD_API_TEXT)
+    )
+    found_ids = {row['id'] for row in rows}
+    found_emails = {row['email'] for row in rows}
+
+    return json_response({
+        'results': rows,
+        'missing_ids': [pk for pk in ids if pk not in found_ids],
+        'missing_emails': [email for email in emails if email not in found_emails],
+    })
+
+
+@api_view
+@require_POST
+def lead_upsert(request):
+    """
+    Create or update up to LEADS_API_MAX_BATCH leads keyed by email,
+    through the same batched path as the Excel upload.
+    Only the fields present on each item are written.
+    """
+    payload = _parse_body(request)
+    if not isinstance(payload, dict) or not isinstance(payload.get('leads'), list):
+        return error_response('Request body must be {"leads": [...]}')
+
+    items = payload['leads']
+    if len(items) > settings.LEADS_API_MAX_BATCH:
+        return error_response(f'At most {settings.LEADS_API_MAX_BATCH} leads per request')
+
+    rows = []
+    errors = {}
+    for index, item in enumerate(items):
+        row, row_errors = clean_lead_row(item)
+        if row_errors:
+            errors[str(index)] = row_errors
+        else:
+            rows.append(row)
+    if errors:
+        return error_response('Invalid leads; nothing was written', errors=errors)
+
+    result = upsert_leads(rows)
+    return json_response(result)
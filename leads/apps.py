@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class BaseConfig(AppConfig):
     name = 'leads'
+
+    def ready(self):
+        # Connect signal receivers
+        from . import autocomplete, caching, cooccurrence, dimensions, facets, percolator, signals, similarity  # noqa: F401
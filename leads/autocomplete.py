@@ -0,0 +1,223 @@
+"""
+Keyword autocomplete over the lead vocabulary.
+
+Terms are the normalised values of `role`, `company`, `location` and each
+comma-separated skill, counted by the number of leads carrying them. They
+sit in a sorted array searched with bisect; every term is also keyed by
+each of its later words, so "eng" finds "software engineer".
+
+The index lives in process memory. It is built on first use and then
+adjusted from `leads_changed` using the before-images of updated and
+deleted leads. Other processes notice a write through a shared version
+key (checked at most every AUTOCOMPLETE_VERSION_CHECK seconds) and
+rebuild it in a background thread, answering from the old index
+meanwhile. With a per-process cache (LocMemCache) that key isn't shared,
+so the index is also rebuilt once it is AUTOCOMPLETE_MAX_AGE old.
+"""
+from bisect import bisect_left, insort
+from collections import Counter
+import heapq
+import logging
+import re
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.dispatch import receiver
+
+from .models import Lead
+from .signals import lead_snapshots, leads_changed
+
+logger = logging.getLogger(__name__)
+
+AUTOCOMPLETE_FIELDS = ['role', 'skills', 'company', 'location']
+
+VERSION_KEY = 'leads:vocabulary_version'
+
+# Seconds between checks of the shared version key
+AUTOCOMPLETE_VERSION_CHECK = 1.0
+
+# Seconds after which the index is rebuilt even without a version change
+AUTOCOMPLETE_MAX_AGE = 300.0
+
+_SEPARATORS = re.compile(r'[^a-z0-9+#.& ]+')
+
+
+def normalize_term(value):
+    """Lowercase, drop stray punctuation and collapse whitespace"""
+    return ' '.join(_SEPARATORS.sub(' ', value.lower()).split()).strip(' &')
+
+
+def lead_terms(values):
+    """(field, term) pairs for one lead, given a dict of AUTOCOMPLETE_FIELDS values"""
+    terms = set()
+    for field in AUTOCOMPLETE_FIELDS:
+        value = values.get(field) or ''
+        parts = value.split(',') if field == 'skills' else [value]
+        for part in parts:
+            term = normalize_term(part)
+            if len(term) > 1:
+                terms.add((field, term))
+    return terms
+
+
+class Vocabulary:
+    """Term frequencies with a sorted (key, field, term) array for prefix lookups"""
+
+    def __init__(self):
+        self.counts = Counter()
+        self._keys = []
+
+    @staticmethod
+    def _keys_for(field, term):
+        words = term.split(' ')
+        return [(' '.join(words[i:]), field, term) for i in range(len(words))]
+
+    @classmethod
+    def build(cls, rows):
+        vocabulary = cls()
+        for values in rows:
+            vocabulary.counts.update(lead_terms(values))
+        vocabulary._keys = sorted(
+            key for field, term in vocabulary.counts for key in cls._keys_for(field, term)
+        )
+        return vocabulary
+
+    def apply(self, deltas):
+        """Add a Counter of (field, term) -> change; new terms are inserted in order"""
+        for (field, term), delta in deltas.items():
+            if not delta:
+                continue
+            if (field, term) not in self.counts:
+                for key in self._keys_for(field, term):
+                    insort(self._keys, key)
+            # Terms that drop to zero keep their keys and are filtered out in complete()
+            self.counts[field, term] += delta
+
+    def complete(self, prefix, limit=10, fields=None):
+        """Most frequent terms with a word starting with `prefix`"""
+        prefix = normalize_term(prefix)
+        if not prefix:
+            return []
+        start = bisect_left(self._keys, (prefix,))
+        end = bisect_left(self._keys, (prefix + '\uffff',), lo=start)
+
+        candidates = {}
+        for _, field, term in self._keys[start:end]:
+            count = self.counts.get((field, term), 0)
+            if count > 0 and (fields is None or field in fields):
+                candidates[field, term] = count
+        best = heapq.nlargest(limit, candidates.items(), key=lambda item: (item[1], -len(item[0][1])))
+        return [{'term': term, 'field': field, 'count': count} for (field, term), count in best]
+
+
+_vocabulary = None
+_version = None
+_built_at = 0.0
+_checked_at = 0.0
+_rebuilding = False
+# Guards the globals above; never held across a query
+_lock = threading.Lock()
+# One build at a time
+_build_lock = threading.Lock()
+
+
+def _shared_version():
+    return cache.get_or_set(VERSION_KEY, 1, timeout=None)
+
+
+def _build():
+    """Build the vocabulary from the lead table and install it; caller holds _build_lock"""
+    global _vocabulary, _version, _built_at, _checked_at
+    # Read first: a write landing during the scan leaves the index a version behind, so it is redone
+    version = _shared_version()
+    vocabulary = Vocabulary.build(
+        Lead.objects.order_by().values(*AUTOCOMPLETE_FIELDS).iterator(chunk_size=2000)
+    )
+    with _lock:
+        _vocabulary = vocabulary
+        _version = version
+        _built_at = _checked_at = time.monotonic()
+
+
+def _rebuild():
+    global _rebuilding
+    try:
+        with _build_lock:
+            _build()
+    except Exception:
+        logger.exception("Rebuilding the autocomplete vocabulary failed")
+    finally:
+        with _lock:
+            _rebuilding = False
+
+
+def _start_rebuild():
+    def run():
+        try:
+            _rebuild()
+        finally:
+            connection.close()
+    threading.Thread(target=run, name='autocomplete-rebuild', daemon=True).start()
+
+
+def get_vocabulary():
+    """
+    This process's vocabulary. When another process has written leads it is
+    rebuilt in the background, and the current one answers until then.
+    """
+    global _checked_at, _rebuilding
+    if _vocabulary is None:
+        # Nothing to answer from yet: the first lookup builds, concurrent ones wait for it
+        with _build_lock:
+            if _vocabulary is None:
+                _build()
+        return _vocabulary
+
+    now = time.monotonic()
+    with _lock:
+        if _rebuilding or now - _checked_at < AUTOCOMPLETE_VERSION_CHECK:
+            return _vocabulary
+        _checked_at = now
+        version, built_at = _version, _built_at
+    if _shared_version() == version and now - built_at < AUTOCOMPLETE_MAX_AGE:
+        return _vocabulary
+    with _lock:
+        start = not _rebuilding
+        _rebuilding = True
+    if start:
+        _start_rebuild()
+    return _vocabulary
+
+
+def complete(prefix, limit=10, fields=None):
+    return get_vocabulary().complete(prefix, limit=limit, fields=fields)
+
+
+@receiver(leads_changed)
+def update_vocabulary(sender, created, updated, deleted, before=None, **kwargs):
+    global _version, _checked_at
+    before = before or {}
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, timeout=None)
+        version = 2
+
+    if _vocabulary is None:
+        return
+    deltas = Counter()
+    for pk in list(updated) + list(deleted):
+        if pk in before:
+            deltas.subtract(lead_terms(before[pk]))
+    for values in lead_snapshots(list(created) + list(updated)).values():
+        deltas.update(lead_terms(values))
+
+    with _lock:
+        if _version is None or version != _version + 1:
+            # Another process wrote in between; the next lookup starts a rebuild
+            _checked_at = 0.0
+            return
+        _vocabulary.apply(deltas)
+        _version = version
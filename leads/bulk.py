@@ -0,0 +1,169 @@
+"""
+Chunked bulk delete and bulk edit for leads.
+
+Both operations walk the matching rows by primary key in bounded chunks
+and commit each chunk in its own short transaction, so a 20k-row cleanup
+never holds a long lock on the leads table.
+"""
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .industries import infer_industry
+from .models import Company, Lead, Location
+from .signals import lead_snapshots, notify_leads_changed
+
+logger = logging.getLogger(__name__)
+
+# Fields that may be overwritten by a bulk edit. Name and email identify
+# a lead and are deliberately left out.
+BULK_EDITABLE_FIELDS = ['role', 'company', 'location', 'skills', 'experience_years', 'phone']
+
+
+def search_query_filter(search_query):
+    """Free-text filter shared by the lead list and the bulk operations"""
+    return (
+        Q(name__icontains=search_query) |
+        Q(email__icontains=search_query) |
+        Q(company__icontains=search_query) |
+        Q(skills__icontains=search_query)
+    )
+
+
+def upload_batch_filter(upload):
+    """
+    Leads written by an upload, from its lineage rows. Uploads recorded
+    before lineage existed (has_lineage off) have none; their leads can't
+    be told apart from ones edited since, so selecting them raises
+    ValueError rather than guessing from timestamps.
+    """
+    if not upload.has_lineage:
+        raise ValueError(f"{upload} predates import lineage; select its leads by search or ID instead")
+    return Q(pk__in=upload.changes.values('lead_id'))
+
+
+def leads_matching(search='', upload=None, ids=None):
+    """
+    Build the queryset a bulk operation applies to.
+    Filters combine with AND; at least one must be given.
+    """
+    if not search and upload is None and not ids:
+        raise ValueError("A bulk operation needs a search, upload or ID filter")
+
+    leads = Lead.objects.all()
+    if search:
+        leads = leads.filter(search_query_filter(search))
+    if upload is not None:
+        leads = leads.filter(upload_batch_filter(upload))
+    if ids:
+        leads = leads.filter(pk__in=ids)
+    return leads
+
+
+def iter_pk_chunks(queryset, chunk_size):
+    """
+    Yield lists of primary keys in ascending order, using keyset
+    pagination so each chunk is an indexed range scan rather than an OFFSET.
+    """
+    pks = queryset.order_by().order_by('pk').values_list('pk', flat=True)
+    last_pk = None
+    while True:
+        page = pks if last_pk is None else pks.filter(pk__gt=last_pk)
+        chunk = list(page[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1]
+
+
+def _log_progress(operation, done, total):
+    logger.info("bulk %s: %d/%d leads", operation, done, total)
+
+
+def _refresh_industry(pks):
+    """Re-derive Lead.industry for leads whose role or company was overwritten"""
+    leads = list(
+        Lead.objects.filter(pk__in=pks).select_related('text')
+        .only('pk', 'role', 'company', 'industry', 'text__notes')
+    )
+    changed = []
+    for lead in leads:
+        industry = infer_industry(lead.role, lead.company, lead.notes)
+        if industry != lead.industry:
+            lead.industry = industry
+            changed.append(lead)
+    if changed:
+        Lead.objects.bulk_update(changed, ['industry'])
+
+
+def chunked_delete(queryset, chunk_size=None, progress=None):
+    """
+    Delete every lead in `queryset`, one chunk per transaction.
+    `progress(done, total)` is called after each chunk commits.
+    Returns a dict with the matched, processed and chunk counts.
+    """
+    chunk_size = chunk_size or settings.LEADS_BULK_CHUNK_SIZE
+    total = queryset.count()
+    done = 0
+    chunks = 0
+
+    for pks in iter_pk_chunks(queryset, chunk_size):
+        with transaction.atomic():
+            before = lead_snapshots(pks)
+            # Lead cascades to its text, lineage, chat, similarity and saved-search
+            # rows. None of those has signals or dependents of its own, so the
+            # collector removes each with one DELETE ... WHERE lead_id IN (...);
+            # only('pk') keeps its pass over the leads to a SELECT of the IDs.
+            Lead.objects.filter(pk__in=pks).only('pk').delete()
+        notify_leads_changed(deleted=pks, before=before)
+        done += len(pks)
+        chunks += 1
+        _log_progress('delete', done, total)
+        if progress:
+            progress(done, total)
+
+    return {'matched': total, 'processed': done, 'chunks': chunks}
+
+
+def chunked_update(queryset, values, chunk_size=None, progress=None):
+    """
+    Apply `values` to every lead in `queryset` with QuerySet.update,
+    one chunk per transaction.
+    Returns a dict with the matched, processed and chunk counts.
+    """
+    unknown = set(values) - set(BULK_EDITABLE_FIELDS)
+    if unknown:
+        raise ValueError(f"Fields cannot be bulk edited: {', '.join(sorted(unknown))}")
+    if not values:
+        raise ValueError("No fields to update")
+
+    chunk_size = chunk_size or settings.LEADS_BULK_CHUNK_SIZE
+    # QuerySet.update bypasses auto_now, so stamp the edit explicitly
+    values = dict(values, updated_at=timezone.now())
+    reclassify = bool({'role', 'company'} & set(values))
+    # Every lead in the queryset gets the same company/location, so resolve them once
+    if 'company' in values:
+        values['canonical_company_id'] = Company.resolve([values['company']]).get(values['company'])
+    if 'location' in values:
+        values['canonical_location_id'] = Location.resolve([values['location']]).get(values['location'])
+    total = queryset.count()
+    done = 0
+    chunks = 0
+
+    for pks in iter_pk_chunks(queryset, chunk_size):
+        with transaction.atomic():
+            before = lead_snapshots(pks)
+            Lead.objects.filter(pk__in=pks).update(**values)
+            if reclassify:
+                _refresh_industry(pks)
+        notify_leads_changed(updated=pks, before=before)
+        done += len(pks)
+        chunks += 1
+        _log_progress('update', done, total)
+        if progress:
+            progress(done, total)
+
+    return {'matched': total, 'processed': done, 'chunks': chunks}
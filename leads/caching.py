@@ -0,0 +1,99 @@
+"""
+HTTP validators and fragment cache keys for the lead pages.
+
+List pages are fingerprinted by the lead count, the newest `updated_at`
+and a version that every lead write bumps; the detail page by the
+lead's own `updated_at` and score plus that version (its "similar leads"
+panel depends on other leads). The list fingerprint keys the
+`{% cache %}` fragments, so an unchanged table costs one aggregate query
+and no rendering. The version is a `CacheVersion` row rather than a cache
+entry: with the per-process default cache a bump made by one worker would
+never reach the others, which would go on serving their stale fragments
+and answering 304 for pages whose scores had changed.
+"""
+import hashlib
+
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db.models import Count, F, Max
+from django.dispatch import receiver
+
+from .models import CacheVersion, Lead
+from .signals import leads_changed
+
+VERSION_NAME = 'leads'
+
+
+def lead_cache_version():
+    version = CacheVersion.objects.filter(name=VERSION_NAME).values_list('version', flat=True).first()
+    return version or 1
+
+
+def bump_lead_cache_version():
+    if not CacheVersion.objects.filter(name=VERSION_NAME).update(version=F('version') + 1):
+        # First write; a concurrent first write creates the same row
+        CacheVersion.objects.bulk_create([CacheVersion(name=VERSION_NAME, version=2)], ignore_conflicts=True)
+
+
+@receiver(leads_changed)
+def invalidate_lead_caches(sender, **kwargs):
+    bump_lead_cache_version()
+
+
+def _has_pending_messages(request):
+    # A flash message must be rendered, so never answer 304 over one
+    return len(get_messages(request)) > 0
+
+
+def lead_table_state(request):
+    """Count and newest update of the lead table, computed once per request"""
+    if not hasattr(request, '_lead_table_state'):
+        state = Lead.objects.aggregate(count=Count('id'), last_modified=Max('updated_at'))
+        version = lead_cache_version()
+        state['fingerprint'] = f"{state['count']}:{state['last_modified']}:{version}"
+        request._lead_table_state = state
+    return request._lead_table_state
+
+
+def lead_list_etag(request, *args, **kwargs):
+    if _has_pending_messages(request):
+        return None
+    fingerprint = lead_table_state(request)['fingerprint']
+    return hashlib.md5(fingerprint.encode()).hexdigest()
+
+
+def lead_list_last_modified(request, *args, **kwargs):
+    if _has_pending_messages(request):
+        return None
+    return lead_table_state(request)['last_modified']
+
+
+def _lead_state(request, pk):
+    if not hasattr(request, '_lead_state'):
+        request._lead_state = (
+            Lead.objects.filter(pk=pk).values_list('updated_at', 'match_score').first()
+        )
+    return request._lead_state
+
+
+def lead_detail_etag(request, pk):
+    if _has_pending_messages(request):
+        return None
+    state = _lead_state(request, pk)
+    if state is None:
+        return None
+    updated_at, match_score = state
+    # The version covers the "similar leads" panel, which changes with other leads
+    return hashlib.md5(f"{pk}:{updated_at}:{match_score}:{lead_cache_version()}".encode()).hexdigest()
+
+
+def lead_detail_last_modified(request, pk):
+    if _has_pending_messages(request):
+        return None
+    state = _lead_state(request, pk)
+    return state[0] if state else None
+
+
+def cached_for_version(key, compute, timeout=600):
+    """Cache an expensive computation until the next lead write"""
+    return cache.get_or_set(f'{key}:{lead_cache_version()}', compute, timeout)
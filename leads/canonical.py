@@ -0,0 +1,29 @@
+"""
+Canonical keys for company and location names.
+
+Variants of one name ("Infosys", "infosys ltd", "Infosys Limited.")
+share a key, and leads point at the Company or Location row for that
+key. The first spelling seen becomes the row's display name.
+"""
+import re
+
+# Trailing words dropped from company names
+LEGAL_SUFFIXES = {
+    'ltd', 'limited', 'inc', 'incorporated', 'llc', 'llp', 'plc', 'corp',
+    'corporation', 'co', 'company', 'pvt', 'private', 'gmbh', 'ag', 'sa', 'bv',
+}
+
+
+def _words(name):
+    return re.sub(r'[^a-z0-9&]+', ' ', (name or '').lower()).split()
+
+
+def company_key(name):
+    words = _words(name)
+    while len(words) > 1 and words[-1] in LEGAL_SUFFIXES:
+        words.pop()
+    return ' '.join(words)[:200]
+
+
+def location_key(name):
+    return ' '.join(_words(name))[:200]
@@ -0,0 +1,172 @@
+"""
+Chunked, resumable workbook uploads.
+
+A single multipart POST is bounded by the request size limits, and a
+dropped connection means starting over. Instead the client opens a
+ChunkedUpload with the file's name and size, then sends the file in
+order, one chunk per request, each with its offset and SHA-256.
+
+Chunks are streamed to a part file under LEADS_CHUNKED_UPLOAD_DIR, so a
+request holds no more than a read buffer in memory, and `offset` only
+advances once a chunk is on disk and its checksum matches. After a
+failure the client asks for the offset and resends from there.
+Finalizing hands the assembled file to ingest.import_upload, the same
+import path as a single-request upload.
+"""
+from datetime import timedelta
+import hashlib
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import locks
+from django.utils import timezone
+
+from .ingest import import_upload
+from .models import ChunkedUpload
+
+ALLOWED_EXTENSIONS = ('.xlsx', '.xls')
+
+# Bytes read from the request or the part file at a time
+READ_SIZE = 64 * 1024
+
+
+class OffsetMismatch(ValueError):
+    """A chunk sent for an offset other than the next expected byte"""
+
+    def __init__(self, message, offset):
+        super().__init__(message)
+        self.offset = offset
+
+
+def part_path(chunked):
+    return Path(settings.LEADS_CHUNKED_UPLOAD_DIR) / f'{chunked.pk}.part'
+
+
+def start_upload(filename, size, sha256=''):
+    """Open a chunked upload of `size` bytes; `sha256` of the whole file is optional"""
+    filename = os.path.basename(filename or '')
+    if not filename.lower().endswith(ALLOWED_EXTENSIONS):
+        raise ValueError('Only Excel files (.xlsx, .xls) are allowed')
+    if size <= 0:
+        raise ValueError('The file is empty')
+    if size > settings.LEADS_CHUNKED_UPLOAD_MAX_SIZE:
+        raise ValueError(f'Files are limited to {settings.LEADS_CHUNKED_UPLOAD_MAX_SIZE} bytes')
+
+    purge_expired_uploads()
+    chunked = ChunkedUpload.objects.create(filename=filename[:255], size=size, sha256=sha256.lower()[:64])
+    path = part_path(chunked)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch()
+    return chunked
+
+
+def append_chunk(chunked, offset, stream, length, sha256):
+    """
+    Write `length` bytes read from `stream` at `offset` and advance the
+    upload's offset. The chunk is discarded unless it is the next one
+    expected and its SHA-256 matches `sha256`. Returns the new offset.
+    """
+    if chunked.completed_at is not None:
+        raise ValueError('The upload is already finished')
+    if not sha256:
+        raise ValueError('The chunk checksum is missing')
+    if not 0 < length <= settings.LEADS_CHUNKED_UPLOAD_CHUNK_SIZE:
+        raise ValueError(f'Chunks must be 1 to {settings.LEADS_CHUNKED_UPLOAD_CHUNK_SIZE} bytes')
+
+    with open(part_path(chunked), 'r+b') as part:
+        # One writer per upload: a retried chunk racing its original waits here
+        locks.lock(part, locks.LOCK_EX)
+        try:
+            chunked.refresh_from_db(fields=['offset', 'completed_at'])
+            if offset != chunked.offset:
+                raise OffsetMismatch(f'Expected the chunk at offset {chunked.offset}', chunked.offset)
+            if offset + length > chunked.size:
+                raise ValueError('The chunk runs past the end of the file')
+
+            # Anything past the acknowledged offset is left from a failed attempt
+            part.seek(offset)
+            part.truncate()
+            digest = hashlib.sha256()
+            received = 0
+            while received < length:
+                data = stream.read(min(READ_SIZE, length - received))
+                if not data:
+                    break
+                digest.update(data)
+                part.write(data)
+                received += len(data)
+
+            if received != length or digest.hexdigest() != sha256.lower():
+                part.truncate(offset)
+                if received != length:
+                    raise ValueError(f'Received {received} of {length} bytes')
+                raise ValueError('The chunk checksum does not match')
+
+            part.flush()
+            os.fsync(part.fileno())
+            chunked.offset = offset + length
+            chunked.save(update_fields=['offset', 'updated_at'])
+        finally:
+            locks.unlock(part)
+    return chunked.offset
+
+
+def finish_upload(chunked):
+    """
+    Import a fully received upload. Returns import_upload()'s
+    (upload, result) and removes the part file. If the import raises, the
+    part file is kept and the upload can be finished again.
+    """
+    # Claimed with a conditional update so a repeated finalize can't import twice
+    claimed = ChunkedUpload.objects.filter(
+        pk=chunked.pk, completed_at__isnull=True, offset=chunked.size
+    ).update(completed_at=timezone.now())
+    if not claimed:
+        chunked.refresh_from_db()
+        if chunked.completed_at is not None:
+            raise ValueError('The upload is already finished')
+        raise ValueError(f'{chunked.size - chunked.offset} bytes of the file have not been received')
+
+    path = part_path(chunked)
+    unclaimed = ChunkedUpload.objects.filter(pk=chunked.pk)
+    if chunked.sha256 and file_sha256(path) != chunked.sha256:
+        # No resent chunk can fix the assembled file, so it is received again from the start
+        with open(path, 'r+b') as part:
+            part.truncate(0)
+        unclaimed.update(completed_at=None, offset=0, updated_at=timezone.now())
+        raise ValueError('The assembled file does not match its checksum; send it again')
+
+    # The workbook readers pick a format by extension
+    workbook = path.with_suffix(Path(chunked.filename).suffix.lower())
+    os.replace(path, workbook)
+    try:
+        upload, result = import_upload(workbook, chunked.filename)
+    except Exception:
+        os.replace(workbook, path)
+        unclaimed.update(completed_at=None, updated_at=timezone.now())
+        raise
+    workbook.unlink(missing_ok=True)
+
+    if upload is not None:
+        chunked.upload = upload
+        chunked.save(update_fields=['upload', 'updated_at'])
+    return upload, result
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for data in iter(lambda: handle.read(READ_SIZE), b''):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def purge_expired_uploads():
+    """Drop unfinished uploads not appended to within LEADS_CHUNKED_UPLOAD_EXPIRY_HOURS"""
+    cutoff = timezone.now() - timedelta(hours=settings.LEADS_CHUNKED_UPLOAD_EXPIRY_HOURS)
+    expired = list(ChunkedUpload.objects.filter(completed_at__isnull=True, updated_at__lt=cutoff))
+    for chunked in expired:
+        part_path(chunked).unlink(missing_ok=True)
+    ChunkedUpload.objects.filter(pk__in=[chunked.pk for chunked in expired]).delete()
+    return len(expired)
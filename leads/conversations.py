@@ -0,0 +1,50 @@
+"""
+Per-lead chat conversations, stored outside the session.
+
+Kept in the session, a conversation was re-serialised into the session
+row on every save. Here each message is a ChatMessage row keyed by
+session key and lead: appending is one INSERT, reading is one indexed
+range scan, and the session itself is never written for it.
+"""
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+
+from .models import ChatMessage
+
+
+def session_key(request):
+    """The request's session key, creating the session if it has none yet"""
+    if request.session.session_key is None:
+        request.session.save()
+    return request.session.session_key
+
+
+def append_message(request, lead_id, role, content):
+    return ChatMessage.objects.create(
+        session_key=session_key(request), lead_id=lead_id, role=role, content=content
+    )
+
+
+def conversation(request, lead_id, limit=None):
+    """The session's messages about a lead, oldest first; with `limit`, the latest `limit`"""
+    key = request.session.session_key
+    if key is None:
+        return []
+    messages = ChatMessage.objects.filter(session_key=key, lead_id=lead_id)
+    if limit:
+        return list(reversed(messages.order_by('-pk')[:limit]))
+    return list(messages.order_by('pk'))
+
+
+def clear_conversation(request, lead_id):
+    """Delete the session's messages about a lead; returns how many there were"""
+    key = request.session.session_key
+    if key is None:
+        return 0
+    return ChatMessage.objects.filter(session_key=key, lead_id=lead_id).delete()[0]
+
+
+def purge_expired_conversations():
+    """Delete the messages of sessions that have expired or been removed"""
+    live = Session.objects.filter(expire_date__gt=timezone.now()).values('session_key')
+    return ChatMessage.objects.exclude(session_key__in=live).delete()[0]
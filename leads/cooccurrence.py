@@ -0,0 +1,193 @@
+"""
+Keyword co-occurrence index for search suggestions.
+
+`TermCount` holds the number of leads whose role, skills, company or
+location contain each keyword token, and `TermPair` the number holding
+both tokens of a pair. Both are adjusted by delta from `leads_changed`
+using the before-images of updated and deleted leads, the same way
+leads.facets keeps its counts, so a search's related-term and
+missing-keyword suggestions are a few indexed reads rather than a
+re-tokenising of the matched leads. `rebuild_cooccurrence` recomputes
+the index from the lead table (`manage.py rebuild_cooccurrence`).
+
+Related terms are ranked by pointwise mutual information,
+log(P(a, b) / (P(a) P(b))): how much more often two terms share a lead
+than chance would have them.
+"""
+from collections import Counter
+from itertools import combinations
+import math
+
+from django.db import transaction
+from django.dispatch import receiver
+
+from .bulk import iter_pk_chunks
+from .counts import apply_count_deltas
+from .matching import normalize_text
+from .models import Lead, TermCount, TermPair
+from .pagination import table_row_estimate
+from .signals import lead_snapshots, leads_changed
+
+COOCCURRENCE_FIELDS = ['role', 'skills', 'company', 'location']
+
+# Tokens indexed per lead, in field order; bounds its pairs at n(n-1)/2
+MAX_TERMS_PER_LEAD = 50
+
+# Pairs sharing fewer leads are too little evidence: PMI overrates rare pairs
+MIN_PAIR_COUNT = 3
+
+# Leading characters a missing keyword shares with the terms suggested for it
+HINT_PREFIX_LENGTH = 4
+
+# Keys resolved to row IDs per query
+KEY_CHUNK_SIZE = 500
+
+
+def lead_terms(image):
+    """The distinct tokens of one lead's COOCCURRENCE_FIELDS, sorted"""
+    terms = {}
+    for field in COOCCURRENCE_FIELDS:
+        for token in normalize_text(image.get(field)):
+            if len(token) <= 100:
+                terms.setdefault(token, None)
+    return sorted(list(terms)[:MAX_TERMS_PER_LEAD])
+
+
+def _counts(images):
+    terms = Counter()
+    pairs = Counter()
+    for image in images:
+        tokens = lead_terms(image)
+        terms.update(tokens)
+        pairs.update(combinations(tokens, 2))
+    return terms, pairs
+
+
+def _row_ids(model, keys, key_fields):
+    """Row ID of each key tuple, creating rows for new keys"""
+    model.objects.bulk_create(
+        [model(**dict(zip(key_fields, key))) for key in keys],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    ids = {}
+    # Sorted, so a chunk of pairs spans few `first` values and the lookup fetches little else
+    keys = sorted(keys)
+    for start in range(0, len(keys), KEY_CHUNK_SIZE):
+        chunk = set(keys[start:start + KEY_CHUNK_SIZE])
+        lookup = {f'{field}__in': {key[i] for key in chunk} for i, field in enumerate(key_fields)}
+        for pk, *key in model.objects.filter(**lookup).values_list('pk', *key_fields):
+            if tuple(key) in chunk:
+                ids[tuple(key)] = pk
+    return ids
+
+
+def apply_cooccurrence_deltas(term_deltas, pair_deltas):
+    """Add Counters of term -> change and (first, second) -> change to the index"""
+    term_deltas = {(term,): delta for term, delta in term_deltas.items() if delta}
+    pair_deltas = {pair: delta for pair, delta in pair_deltas.items() if delta}
+    with transaction.atomic():
+        for model, key_fields, deltas in (
+            (TermCount, ['term'], term_deltas),
+            (TermPair, ['first', 'second'], pair_deltas),
+        ):
+            if deltas:
+                ids = _row_ids(model, list(deltas), key_fields)
+                apply_count_deltas(model, Counter({ids[key]: delta for key, delta in deltas.items()}))
+
+
+@receiver(leads_changed)
+def update_cooccurrence(sender, created, updated, deleted, before=None, **kwargs):
+    before = before or {}
+    old_terms, old_pairs = _counts(before[pk] for pk in list(updated) + list(deleted) if pk in before)
+    term_deltas, pair_deltas = _counts(lead_snapshots(list(created) + list(updated)).values())
+    term_deltas.subtract(old_terms)
+    pair_deltas.subtract(old_pairs)
+    apply_cooccurrence_deltas(term_deltas, pair_deltas)
+
+
+def rebuild_cooccurrence(chunk_size=1000):
+    """Recount the index from the lead table; returns the number of terms and pairs"""
+    terms = Counter()
+    pairs = Counter()
+    for pks in iter_pk_chunks(Lead.objects.all(), chunk_size):
+        chunk_terms, chunk_pairs = _counts(
+            Lead.objects.filter(pk__in=pks).values(*COOCCURRENCE_FIELDS)
+        )
+        terms.update(chunk_terms)
+        pairs.update(chunk_pairs)
+
+    with transaction.atomic():
+        TermPair.objects.all().delete()
+        TermCount.objects.all().delete()
+        TermCount.objects.bulk_create(
+            [TermCount(term=term, lead_count=count) for term, count in terms.items()], batch_size=1000
+        )
+        TermPair.objects.bulk_create(
+            [TermPair(first=first, second=second, lead_count=count) for (first, second), count in pairs.items()],
+            batch_size=1000,
+        )
+    return {'terms': len(terms), 'pairs': len(pairs)}
+
+
+def related_terms(tokens, limit=5):
+    """
+    Terms most associated with `tokens` across all leads, as {'word',
+    'count'} dicts, best first; `count` is the leads sharing them with a
+    query token. Scored by the summed positive PMI with the query tokens.
+    """
+    tokens = set(tokens)
+    known = dict(
+        TermCount.objects.filter(term__in=tokens, lead_count__gt=0).values_list('term', 'lead_count')
+    )
+    if not known:
+        return []
+
+    # Pairs store each term in one position only, so look in both
+    shared = []
+    for column, other in (('first', 'second'), ('second', 'first')):
+        shared.extend(
+            TermPair.objects.filter(**{f'{column}__in': list(known)}, lead_count__gte=MIN_PAIR_COUNT)
+            .values_list(column, other, 'lead_count')
+        )
+    candidates = {term for _, term, _ in shared if term not in tokens}
+    if not candidates:
+        return []
+    totals = dict(TermCount.objects.filter(term__in=candidates).values_list('term', 'lead_count'))
+    leads = max(table_row_estimate(Lead), 1)
+
+    scores = Counter()
+    counts = Counter()
+    for token, term, both in shared:
+        if term not in totals or not totals[term]:
+            continue
+        pmi = math.log(both * leads / (known[token] * totals[term]))
+        if pmi > 0:
+            scores[term] += pmi
+            counts[term] += both
+    best = sorted(scores, key=lambda term: (-scores[term], -counts[term], term))[:limit]
+    return [{'word': term, 'count': counts[term]} for term in best]
+
+
+def term_hints(term, exclude=(), limit=3):
+    """Indexed terms starting like `term`, most common first: 'engineers' -> 'engineer'"""
+    prefix = term[:HINT_PREFIX_LENGTH]
+    return list(
+        TermCount.objects.filter(term__gte=prefix, term__lt=prefix + '\uffff', lead_count__gt=0)
+        .exclude(term__in=[term, *exclude])
+        .order_by('-lead_count', 'term')
+        .values_list('term', flat=True)[:limit]
+    )
+
+
+def keyword_suggestions(query_tokens, missing):
+    """
+    The `partial` and `missing` entries of a search's keyword stats: terms
+    related to the query, and each missing keyword with the indexed terms
+    it may have been meant as.
+    """
+    query_tokens = set(query_tokens)
+    return {
+        'partial': related_terms(query_tokens),
+        'missing': [{'word': word, 'hints': term_hints(word, exclude=query_tokens)} for word in missing],
+    }
@@ -0,0 +1,23 @@
+"""
+Delta updates of denormalised `lead_count` columns.
+
+Shared by the indexes kept current from `leads_changed` (leads.dimensions,
+leads.cooccurrence): each receiver works out how many leads a row gained
+or lost and applies it here, without reading the rows first.
+"""
+from django.db.models import F
+
+
+def apply_count_deltas(model, deltas):
+    """Add `deltas`, a Counter of row ID -> change, to `model.lead_count`"""
+    by_delta = {}
+    for pk, delta in deltas.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(pk)
+    # One UPDATE per distinct delta; almost always just +1 and -1
+    for delta, pks in by_delta.items():
+        if delta > 0:
+            model.objects.filter(pk__in=pks).update(lead_count=F('lead_count') + delta)
+        else:
+            model.objects.filter(pk__in=pks, lead_count__gte=-delta).update(lead_count=F('lead_count') + delta)
+            model.objects.filter(pk__in=pks, lead_count__lt=-delta).update(lead_count=0)
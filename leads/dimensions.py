@@ -0,0 +1,53 @@
+"""
+Company and Location dimension counts.
+
+Each lead points at the canonical Company and Location for its free-text
+`company` and `location` (see leads.canonical). `lead_count` on those rows
+is adjusted by delta from each `leads_changed` notification, the same way
+leads.facets keeps its counts, so "top companies" is an indexed read.
+`rebuild_dimension_counts` recomputes the counts from the lead table.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.dispatch import receiver
+
+from .counts import apply_count_deltas
+from .models import Company, Lead, Location
+from .signals import lead_snapshots, leads_changed
+
+# Dimension model -> Lead foreign key column
+DIMENSIONS = {
+    Company: 'canonical_company_id',
+    Location: 'canonical_location_id',
+}
+
+
+@receiver(leads_changed)
+def update_dimension_counts(sender, created, updated, deleted, before=None, **kwargs):
+    before = before or {}
+    old = [before[pk] for pk in list(updated) + list(deleted) if pk in before]
+    new = list(lead_snapshots(list(created) + list(updated)).values())
+    with transaction.atomic():
+        for model, column in DIMENSIONS.items():
+            deltas = Counter(image[column] for image in new if image.get(column))
+            deltas.subtract(image[column] for image in old if image.get(column))
+            apply_count_deltas(model, deltas)
+
+
+def rebuild_dimension_counts():
+    """Recount leads per Company and Location; returns the number of rows of each"""
+    result = {}
+    for model, column in DIMENSIONS.items():
+        counts = (
+            Lead.objects.filter(**{column: OuterRef('pk')})
+            .order_by()
+            .values(column)
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        model.objects.update(lead_count=Coalesce(Subquery(counts), Value(0)))
+        result[model._meta.verbose_name_plural] = model.objects.count()
+    return result
@@ -0,0 +1,163 @@
+"""
+Faceted navigation for the lead list.
+
+`LeadFacet` holds the number of leads per company, location, industry
+and role value. It is adjusted by delta from each `leads_changed`
+notification, comparing the before-images of updated and deleted leads
+with the stored rows after the write, so the sidebar is a handful of
+indexed top-N reads however large the lead table grows. `rebuild_facets`
+recomputes the whole table from scratch (`manage.py rebuild_facets`).
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.dispatch import receiver
+
+from .models import Lead, LeadFacet
+from .signals import lead_snapshots, leads_changed
+
+# Lead column -> sidebar heading. Each is an indexed column on Lead.
+FACETS = {
+    'company': 'Company',
+    'location': 'Location',
+    'industry': 'Industry',
+    'role': 'Role',
+}
+
+
+def facet_label(facet, value):
+    if facet == 'industry':
+        return value.replace('_', ' ').title()
+    return value
+
+
+def _counts(images):
+    counts = Counter()
+    for image in images:
+        for facet in FACETS:
+            if image.get(facet):
+                counts[facet, image[facet]] += 1
+    return counts
+
+
+def apply_facet_deltas(deltas):
+    """Add `deltas`, a Counter of (facet, value) -> change, to the stored counts"""
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        # Make sure every row exists, then lock and adjust. Rows that drop to
+        # zero are kept, so a concurrent writer never loses its row mid-update.
+        LeadFacet.objects.bulk_create(
+            [LeadFacet(facet=facet, value=value) for facet, value in deltas],
+            ignore_conflicts=True,
+        )
+        for facet in FACETS:
+            changes = {value: delta for (f, value), delta in deltas.items() if f == facet}
+            if not changes:
+                continue
+            rows = list(
+                LeadFacet.objects.select_for_update()
+                .filter(facet=facet, value__in=list(changes))
+                .order_by('pk')
+            )
+            for row in rows:
+                row.count = max(0, row.count + changes[row.value])
+            LeadFacet.objects.bulk_update(rows, ['count'])
+
+
+@receiver(leads_changed)
+def update_facet_counts(sender, created, updated, deleted, before=None, **kwargs):
+    before = before or {}
+    deltas = Counter()
+    deltas.subtract(_counts(before[pk] for pk in list(updated) + list(deleted) if pk in before))
+    # Updated leads without a before-image are counted as new, never subtracted
+    deltas.update(_counts(lead_snapshots(list(created) + list(updated)).values()))
+    apply_facet_deltas(deltas)
+
+
+def rebuild_facets():
+    """Recompute every facet count with one GROUP BY per facet"""
+    rows = []
+    for facet in FACETS:
+        grouped = (
+            Lead.objects.exclude(**{facet: ''})
+            .order_by()
+            .values_list(facet)
+            .annotate(count=Count('id'))
+        )
+        rows.extend(LeadFacet(facet=facet, value=value, count=count) for value, count in grouped)
+
+    with transaction.atomic():
+        LeadFacet.objects.all().delete()
+        LeadFacet.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def selected_facets(params):
+    """The facet values selected in a GET QueryDict, e.g. ?company=Acme&company=Initech"""
+    return {
+        facet: [value for value in params.getlist(facet) if value]
+        for facet in FACETS
+        if any(params.getlist(facet))
+    }
+
+
+def filter_by_facets(leads, selected):
+    """Values of one facet are alternatives (OR); different facets combine with AND"""
+    for facet, values in selected.items():
+        leads = leads.filter(**{f'{facet}__in': values})
+    return leads
+
+
+def _toggle_url(params, facet, value):
+    query = params.copy()
+    values = query.getlist(facet)
+    if value in values:
+        values.remove(value)
+    else:
+        values.append(value)
+    query.setlist(facet, values)
+    return '?' + query.urlencode()
+
+
+def facet_sidebar(params, size=None):
+    """
+    Top values per facet with their lead counts and toggle links.
+    Selected values are always listed, even when outside the top `size`.
+    """
+    size = size or settings.LEADS_FACET_SIZE
+    selected = selected_facets(params)
+    groups = []
+
+    for facet, title in FACETS.items():
+        counts = dict(
+            LeadFacet.objects.filter(facet=facet, count__gt=0)
+            .order_by('-count', 'value')
+            .values_list('value', 'count')[:size]
+        )
+        chosen = selected.get(facet, [])
+        missing = [value for value in chosen if value not in counts]
+        if missing:
+            counts.update(LeadFacet.objects.filter(facet=facet, value__in=missing).values_list('value', 'count'))
+            counts.update({value: 0 for value in missing if value not in counts})
+
+        groups.append({
+            'facet': facet,
+            'title': title,
+            'values': [
+                {
+                    'value': value,
+                    'label': facet_label(facet, value),
+                    'count': count,
+                    'selected': value in chosen,
+                    'url': _toggle_url(params, facet, value),
+                }
+                for value, count in counts.items()
+            ],
+        })
+
+    return groups
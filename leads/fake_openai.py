@@ -0,0 +1,177 @@
+"""
+Local stand-in for the OpenAI chat completions API, for tests and load tests.
+
+The server answers `POST /v1/chat/completions` with a well-formed
+completion after a configurable latency, and fails a configurable share
+of requests with a 429 or 500. Its reply picks the first leads of the
+prompt's lead table as matches, so the app's parsing path is exercised.
+
+    server = FakeOpenAIServer(latency=0.2, error_rate=0.05)
+    server.start()
+    ... OpenAI(base_url=server.base_url, api_key='test') ...
+    server.stop()
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import threading
+import time
+
+from .prompting import DELIMITER, FIELD_CODES
+
+HEADER_ROW = DELIMITER.join(FIELD_CODES.values())
+
+
+def _lead_ids(messages, limit):
+    """IDs of the first `limit` rows of the lead table in the prompt"""
+    for message in messages:
+        lines = (message.get('content') or '').splitlines()
+        if HEADER_ROW in lines:
+            rows = lines[lines.index(HEADER_ROW) + 1:]
+            ids = []
+            for row in rows:
+                first = row.split(DELIMITER, 1)[0]
+                if not first.isdigit():
+                    break
+                ids.append(int(first))
+                if len(ids) == limit:
+                    break
+            return ids
+    return []
+
+
+def completion_body(model, content):
+    return {
+        'id': f'chatcmpl-fake{random.randrange(10**9)}',
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': model,
+        'choices': [{
+            'index': 0,
+            'message': {'role': 'assistant', 'content': content},
+            'finish_reason': 'stop',
+        }],
+        'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = 'FakeOpenAI/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        fake = self.server.fake
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        fake.record(request)
+
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send(404, {'error': {'message': 'Not found', 'type': 'invalid_request_error'}})
+            return
+
+        time.sleep(fake.latency() if callable(fake.latency) else fake.latency)
+
+        scripted = fake.next_scripted_failure()
+        if scripted:
+            self._send(scripted, {'error': {'message': f'Scripted failure {scripted}', 'type': 'server_error'}})
+            return
+
+        if fake.error_rate and random.random() < fake.error_rate:
+            if random.random() < 0.5:
+                self._send(429, {'error': {
+                    'message': 'Rate limit reached', 'type': 'requests', 'code': 'rate_limit_exceeded',
+                }})
+            else:
+                self._send(500, {'error': {'message': 'Internal server error', 'type': 'server_error'}})
+            return
+
+        content = fake.reply(request)
+        self._send(200, completion_body(request.get('model', 'gpt-3.5-turbo'), content))
+
+
+class FakeOpenAIServer:
+    """
+    Threaded fake OpenAI server on localhost.
+    `latency` is seconds per request or a zero-argument callable;
+    `error_rate` is the fraction of requests answered with 429/500.
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, matches=5, port=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.matches = matches
+        self.requests = []
+        self._scripted_failures = []
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    @property
+    def request_count(self):
+        with self._lock:
+            return len(self.requests)
+
+    def record(self, request):
+        with self._lock:
+            self.requests.append(request)
+
+    def reset(self):
+        """Forget recorded requests and pending scripted failures"""
+        with self._lock:
+            self.requests.clear()
+            self._scripted_failures.clear()
+
+    def fail_next(self, count, status=500):
+        """Answer the next `count` requests with `status` regardless of error_rate"""
+        with self._lock:
+            self._scripted_failures.extend([status] * count)
+
+    def next_scripted_failure(self):
+        with self._lock:
+            return self._scripted_failures.pop(0) if self._scripted_failures else None
+
+    def reply(self, request):
+        ids = _lead_ids(request.get('messages', []), self.matches)
+        return json.dumps({
+            'interpretation': 'Fake interpretation of the request',
+            'search_type': 'consumer',
+            'industry_alignment': 'Fake alignment note',
+            'matches': [
+                {
+                    'lead_id': lead_id,
+                    'confidence_score': 90 - rank * 5,
+                    'reasoning': 'Listed early in the prompt',
+                    'strengths': ['Relevant role'],
+                    'concerns': [],
+                }
+                for rank, lead_id in enumerate(ids)
+            ],
+        })
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
@@ -0,0 +1,66 @@
+"""
+Model fields.
+"""
+import zlib
+
+from django import forms
+from django.conf import settings
+from django.db import models
+
+# Texts shorter than this are stored as-is; zlib gains nothing on them
+COMPRESS_MIN_LENGTH = 200
+
+_PLAIN = b'\x00'
+_ZLIB = b'\x01'
+
+
+class CompressedTextField(models.BinaryField):
+    """
+    Text stored as bytes, zlib-compressed when LEADS_COMPRESS_TEXT is on
+    and the text is long enough to gain from it. A one-byte header says
+    which, so rows written under either setting read back the same.
+    The column can't be filtered on with SQL text lookups.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('editable', True)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        # Editable unlike BinaryField, so only record the opposite
+        if self.editable:
+            kwargs.pop('editable', None)
+        else:
+            kwargs['editable'] = False
+        return name, path, args, kwargs
+
+    def get_default(self):
+        return super().get_default() or ''
+
+    def from_db_value(self, value, expression, connection):
+        return self.to_python(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, str):
+            return value or ''
+        value = bytes(value)
+        header, data = value[:1], value[1:]
+        if header == _ZLIB:
+            data = zlib.decompress(data)
+        return data.decode('utf-8')
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if isinstance(value, str):
+            data = value.encode('utf-8')
+            if settings.LEADS_COMPRESS_TEXT and len(data) >= COMPRESS_MIN_LENGTH:
+                value = _ZLIB + zlib.compress(data)
+            else:
+                value = _PLAIN + data
+        return super().get_db_prep_value(value, connection, prepared)
+
+    def value_to_string(self, obj):
+        return self.value_from_object(obj)
+
+    def formfield(self, **kwargs):
+        return models.Field.formfield(self, **{'form_class': forms.CharField, 'widget': forms.Textarea, **kwargs})
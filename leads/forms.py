@@ -1,5 +1,7 @@
 from django import forms
-from .models import Lead
+from django.urls import reverse_lazy
+from .bulk import BULK_EDITABLE_FIELDS, upload_batch_filter
+from .models import Lead, UploadHistory
 
 class LeadUploadForm(forms.Form):
     file = forms.FileField(
@@ -28,14 +30,33 @@ class LeadSearchForm(forms.Form):
         widget=forms.Textarea(attrs={
             'class': 'form-control',
             'rows': 3,
-            'placeholder': 'e.g., Marketing Strategy, SEO, SEM, Public Relations (PR), Content Development'
+            'placeholder': 'e.g., Marketing Strategy, SEO, SEM, Public Relations (PR), Content Development',
+            'data-autocomplete-url': reverse_lazy('autocomplete'),
         })
     )
 
 
 
 
-class LeadForm(forms.ModelForm):
+class LeadNotesForm(forms.ModelForm):
+    """Base of the Lead forms: edits notes, which are stored in LeadText"""
+    notes = forms.CharField(
+        required=False,
+        widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 4}),
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.fields['notes'].initial = self.instance.notes
+
+    def save(self, commit=True):
+        # Set before saving: Lead.save() derives the industry from the notes
+        self.instance.notes = self.cleaned_data['notes']
+        return super().save(commit)
+
+
+class LeadForm(LeadNotesForm):
     class Meta:
         model = Lead
         fields = ['name', 'email', 'phone', 'role', 'company', 'linkedin_url', 
@@ -54,5 +75,51 @@ class LeadForm(forms.ModelForm):
                 'placeholder': 'Enter comma-separated skills'
             }),
             'experience_years': forms.NumberInput(attrs={'class': 'form-control'}),
-            'notes': forms.Textarea(attrs={'class': 'form-control', 'rows': 4}),
-        }
\ No newline at end of file
+        }
+
+class BulkLeadFilterForm(forms.Form):
+    search = forms.CharField(required=False)
+    upload = forms.ModelChoiceField(queryset=UploadHistory.objects.all(), required=False)
+    ids = forms.CharField(
+        required=False,
+        help_text='Comma-separated lead IDs'
+    )
+
+    def clean_upload(self):
+        upload = self.cleaned_data.get('upload')
+        if upload is not None:
+            try:
+                upload_batch_filter(upload)
+            except ValueError as e:
+                raise forms.ValidationError(str(e))
+        return upload
+
+    def clean_ids(self):
+        ids = self.cleaned_data.get('ids', '')
+        try:
+            return [int(pk) for pk in ids.split(',') if pk.strip()]
+        except ValueError:
+            raise forms.ValidationError('IDs must be comma-separated numbers')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not (cleaned_data.get('search') or cleaned_data.get('upload') or cleaned_data.get('ids')):
+            raise forms.ValidationError('Choose a search query, an upload batch or a list of IDs')
+        return cleaned_data
+
+
+class BulkLeadUpdateForm(BulkLeadFilterForm):
+    role = forms.CharField(max_length=200, required=False)
+    company = forms.CharField(max_length=200, required=False)
+    location = forms.CharField(max_length=200, required=False)
+    skills = forms.CharField(required=False)
+    phone = forms.CharField(max_length=20, required=False)
+    experience_years = forms.IntegerField(min_value=0, required=False)
+
+    def get_update_values(self):
+        """Only the fields that were actually submitted are overwritten"""
+        return {
+            field: self.cleaned_data[field]
+            for field in BULK_EDITABLE_FIELDS
+            if field in self.data and self.cleaned_data.get(field) is not None
+        }
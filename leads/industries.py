@@ -0,0 +1,42 @@
+"""
+Keyword-based industry classification of leads.
+
+The result is stored on `Lead.industry` whenever a lead is written, so
+industry filters and counts never have to re-run the classifier.
+"""
+
+INDUSTRY_KEYWORDS = {
+    'technology': ['software', 'tech', 'it', 'developer', 'engineer', 'data', 'ai', 'cloud', 'saas', 'digital', 'cyber', 'programming', 'coding'],
+    'finance': ['finance', 'bank', 'investment', 'trading', 'accounting', 'fintech', 'financial', 'capital', 'wealth', 'credit'],
+    'healthcare': ['healthcare', 'medical', 'pharma', 'hospital', 'clinical', 'health', 'biotech', 'medicine', 'pharmaceutical'],
+    'manufacturing': ['manufacturing', 'production', 'factory', 'industrial', 'assembly', 'supply chain', 'operations'],
+    'retail': ['retail', 'ecommerce', 'store', 'shop', 'merchant', 'consumer', 'sales'],
+    'consulting': ['consulting', 'consultant', 'advisory', 'strategy', 'management consulting'],
+    'real_estate': ['real estate', 'property', 'construction', 'building', 'infrastructure'],
+    'education': ['education', 'university', 'school', 'training', 'learning', 'academic', 'teaching'],
+    'energy': ['energy', 'oil', 'gas', 'renewable', 'power', 'utilities', 'solar', 'wind'],
+    'telecommunications': ['telecom', 'network', 'wireless', 'broadband', 'communication', '5g'],
+    'media': ['media', 'advertising', 'marketing', 'content', 'publishing', 'broadcasting'],
+    'automotive': ['automotive', 'automobile', 'vehicle', 'car', 'transportation'],
+    'aerospace': ['aerospace', 'aviation', 'aircraft', 'defense'],
+    'logistics': ['logistics', 'shipping', 'freight', 'delivery', 'warehouse', 'distribution'],
+    'hospitality': ['hospitality', 'hotel', 'restaurant', 'tourism', 'travel'],
+    'legal': ['legal', 'law', 'attorney', 'lawyer', 'compliance'],
+    'insurance': ['insurance', 'underwriting', 'risk', 'claims'],
+    'agriculture': ['agriculture', 'farming', 'agribusiness', 'agro'],
+    'gaming': ['gaming', 'game', 'esports', 'entertainment'],
+    'government': ['government', 'public sector', 'municipal', 'federal', 'state']
+}
+
+
+def infer_industry(role, company, notes):
+    """
+    Infer industry sector from role, company name, and notes
+    """
+    text = f"{role} {company} {notes}".lower()
+    
+    for industry, keywords in INDUSTRY_KEYWORDS.items():
+        if any(keyword in text for keyword in keywords):
+            return industry
+    
+    return 'other'
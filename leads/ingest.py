@@ -0,0 +1,370 @@
+"""
+Bulk lead ingestion shared by the Excel upload and the JSON API.
+
+Rows are cleaned into plain dicts of Lead fields and then upserted by
+email in batches: one SELECT per batch to find existing leads, then a
+single bulk_create and a single bulk_update, instead of one
+update_or_create round trip per row.
+
+Large workbooks are parsed sheet by sheet in a process pool (see
+leads.workbook) while this process writes each parsed sheet in order.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+import logging
+import multiprocessing
+import os
+from pathlib import Path
+import tempfile
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast, NullIf
+from django.utils import timezone
+
+from .bulk import chunked_delete, iter_pk_chunks
+from .industries import infer_industry
+from .models import Company, Lead, LeadImportChange, LeadText, Location, UploadHistory
+from .profiling import span
+from .signals import lead_snapshot, lead_snapshots, notify_leads_changed
+from .workbook import parse_sheet, sheet_names
+
+logger = logging.getLogger(__name__)
+
+# Parsing processes when LEADS_INGEST_WORKERS is 0; each re-imports pandas
+DEFAULT_MAX_WORKERS = 4
+
+# Lead fields an ingested row may set
+UPSERT_FIELDS = [
+    'name', 'email', 'phone', 'role', 'company', 'linkedin_url',
+    'location', 'skills', 'experience_years', 'notes',
+]
+
+
+# Columns computed from the row rather than taken from it
+DERIVED_FIELDS = {'industry', 'canonical_company', 'canonical_location'}
+
+
+# Lead columns an upload's before-image records, by attname, so that a
+# rollback restores derived values without recomputing them
+LINEAGE_FIELDS = UPSERT_FIELDS + [
+    'industry', 'canonical_company_id', 'canonical_location_id', 'import_batch_id',
+]
+
+
+def _derive_fields(lead, companies, locations):
+    lead.industry = infer_industry(lead.role, lead.company, lead.notes)
+    lead.canonical_company_id = companies.get(lead.company)
+    lead.canonical_location_id = locations.get(lead.location)
+
+
+def _record_changes(upload, created, before):
+    """
+    Record `upload`'s lineage rows. `before` maps each updated lead's pk to the
+    values it overwrote; a lead already written earlier in the same upload
+    keeps its first before-image, extended with any newly overwritten fields.
+    """
+    earlier = {
+        change.lead_id: change
+        for change in LeadImportChange.objects.filter(batch=upload, lead_id__in=[*created, *before])
+    }
+    to_create = [
+        LeadImportChange(batch=upload, lead_id=pk, action=LeadImportChange.CREATED)
+        for pk in created
+    ]
+    to_update = []
+    for pk, fields in before.items():
+        change = earlier.get(pk)
+        if change is None:
+            to_create.append(LeadImportChange(batch=upload, lead_id=pk, action=LeadImportChange.UPDATED, before=fields))
+        elif change.action == LeadImportChange.UPDATED and set(fields) - set(change.before):
+            change.before = {**fields, **change.before}
+            to_update.append(change)
+    LeadImportChange.objects.bulk_create(to_create, batch_size=1000, ignore_conflicts=True)
+    LeadImportChange.objects.bulk_update(to_update, ['before'], batch_size=1000)
+
+
+def _upsert_batch(batch, upload=None):
+    """
+    Upsert one batch of rows keyed by email inside a single transaction.
+    With `upload`, written leads are stamped with it and their lineage recorded.
+    """
+    # Later rows for the same email win, as repeated update_or_create calls would
+    by_email = {}
+    duplicates = 0
+    for row in batch:
+        if row['email'] in by_email:
+            duplicates += 1
+            by_email[row['email']].update(row)
+        else:
+            by_email[row['email']] = dict(row)
+
+    with transaction.atomic():
+        existing = Lead.objects.select_related('text').in_bulk(list(by_email), field_name='email')
+        # Canonical rows for every company and location the batch will hold
+        merged = [{**lead_snapshot(existing[email]), **row} if email in existing else row
+                  for email, row in by_email.items()]
+        companies = Company.resolve(row.get('company') for row in merged)
+        locations = Location.resolve(row.get('location') for row in merged)
+
+        to_create = []
+        to_update = []
+        texts = {}
+        before = {}
+        overwritten = {}
+        update_fields = set()
+        now = timezone.now()
+        for email, row in by_email.items():
+            lead = existing.get(email)
+            if lead is None:
+                lead = Lead(**row)
+                # bulk_create skips Lead.save(), so derive its fields here
+                _derive_fields(lead, companies, locations)
+                lead.import_batch = upload
+                to_create.append(lead)
+                continue
+            before[lead.pk] = lead_snapshot(lead)
+            previous = {field: getattr(lead, field) for field in LINEAGE_FIELDS}
+            for field, value in row.items():
+                setattr(lead, field, value)
+            _derive_fields(lead, companies, locations)
+            if upload is not None:
+                lead.import_batch = upload
+                overwritten[lead.pk] = {
+                    field: value for field, value in previous.items() if getattr(lead, field) != value
+                }
+            # bulk_update skips auto_now, so stamp the change explicitly
+            lead.updated_at = now
+            update_fields.update(row)
+            to_update.append(lead)
+            texts[lead.pk] = {
+                field: row[field] for field in LeadText.TEXT_FIELDS
+                if field in row and row[field] != previous[field]
+            }
+
+        created = Lead.objects.bulk_create(to_create)
+        for lead in created:
+            texts[lead.pk] = {field: getattr(lead, field) for field in LeadText.TEXT_FIELDS if getattr(lead, field)}
+        if to_update:
+            fields = (update_fields - set(LeadText.TEXT_FIELDS)) | DERIVED_FIELDS | {'updated_at'}
+            if upload is not None:
+                fields.add('import_batch')
+            Lead.objects.bulk_update(to_update, sorted(fields))
+        LeadText.write({pk: values for pk, values in texts.items() if values})
+        if upload is not None:
+            _record_changes(upload, [lead.pk for lead in created], overwritten)
+
+    notify_leads_changed(
+        created=[lead.pk for lead in created],
+        updated=[lead.pk for lead in to_update],
+        before=before,
+    )
+    return {
+        'imported': len(created),
+        'updated': len(to_update) + duplicates,
+        'created_pks': [lead.pk for lead in created],
+        'updated_pks': [lead.pk for lead in to_update],
+    }
+
+
+def upsert_leads(rows, batch_size=None, upload=None):
+    """
+    Create or update leads from row dicts keyed by email, recording lineage
+    against the `upload` UploadHistory row when given.
+    Returns counts plus the primary keys that were created and updated.
+    """
+    batch_size = batch_size or settings.LEADS_INGEST_BATCH_SIZE
+    result = {'imported': 0, 'updated': 0, 'created_pks': [], 'updated_pks': []}
+
+    for start in range(0, len(rows), batch_size):
+        batch_result = _upsert_batch(rows[start:start + batch_size], upload)
+        for key, value in batch_result.items():
+            result[key] += value
+
+    return result
+
+
+@contextmanager
+def uploaded_workbook_path(uploaded_file):
+    """Filesystem path of an uploaded workbook; in-memory uploads are spooled to a temp file"""
+    if hasattr(uploaded_file, 'temporary_file_path'):
+        yield uploaded_file.temporary_file_path()
+        return
+
+    with tempfile.NamedTemporaryFile(suffix=Path(uploaded_file.name).suffix, delete=False) as tmp:
+        for chunk in uploaded_file.chunks():
+            tmp.write(chunk)
+    try:
+        yield tmp.name
+    finally:
+        os.unlink(tmp.name)
+
+
+def _parse_serially(path, names, start=0):
+    for position in range(start, len(names)):
+        yield parse_sheet(path, names[position], position)
+
+
+def _parsed_sheets(path, names):
+    """
+    Parsed sheets in tab order. Workbooks of several sheets and at least
+    LEADS_INGEST_PARALLEL_MIN_BYTES are parsed in a process pool; smaller
+    ones aren't worth starting it for. Where no pool can start (no
+    /dev/shm on serverless hosts) the sheets are parsed here instead.
+    """
+    workers = settings.LEADS_INGEST_WORKERS or min(os.cpu_count() or 1, DEFAULT_MAX_WORKERS)
+    workers = min(workers, len(names))
+    if workers <= 1 or os.path.getsize(path) < settings.LEADS_INGEST_PARALLEL_MIN_BYTES:
+        yield from _parse_serially(path, names)
+        return
+
+    try:
+        # spawn rather than fork: forking a threaded server process is unsafe
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    except (OSError, NotImplementedError) as e:
+        logger.warning("Parsing %s in-process, no process pool: %s", path, e)
+        yield from _parse_serially(path, names)
+        return
+    parsed = 0
+    try:
+        for sheet in pool.map(parse_sheet, [path] * len(names), names, range(len(names))):
+            yield sheet
+            parsed += 1
+    except (BrokenProcessPool, OSError) as e:
+        logger.warning("Parsing %s in-process from sheet %d, process pool failed: %s", path, parsed, e)
+        yield from _parse_serially(path, names, parsed)
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def ingest_workbook(path, upload=None):
+    """
+    Import every sheet of an Excel workbook, as the `upload` batch when given.
+
+    Sheets may be parsed in parallel but are written here, one sheet at a time
+    in tab order, so a lead repeated on a later tab wins as it would in a
+    single sheet. Returns totals plus a `sheets` list with each sheet's
+    row, imported, updated and skipped counts and any error.
+    """
+    result = {'imported': 0, 'updated': 0, 'skipped': 0, 'sheets': []}
+
+    with span('ingest.parse', path=str(path)) as timing:
+        names = sheet_names(path)
+        timing['sheets'] = len(names)
+
+    for parsed in _parsed_sheets(path, names):
+        with span('ingest.write', sheet=parsed['sheet'], rows=len(parsed['rows'])):
+            written = upsert_leads(parsed['rows'], upload=upload) if parsed['rows'] else {'imported': 0, 'updated': 0}
+        result['imported'] += written['imported']
+        result['updated'] += written['updated']
+        result['skipped'] += parsed['skipped']
+        result['sheets'].append({
+            'sheet': parsed['sheet'],
+            'rows': len(parsed['rows']),
+            'imported': written['imported'],
+            'updated': written['updated'],
+            'skipped': parsed['skipped'],
+            'error': parsed['error'],
+        })
+
+    return result
+
+
+def import_upload(path, filename):
+    """
+    Import the workbook at `path` as a new UploadHistory named `filename`.
+
+    The upload is created first so every lead written is stamped with it.
+    Returns (upload, result); upload is None when no sheet had a Name
+    column and so nothing was imported.
+    """
+    upload = UploadHistory.objects.create(filename=filename)
+    result = ingest_workbook(path, upload=upload)
+
+    if all(sheet['error'] for sheet in result['sheets']):
+        upload.delete()
+        return None, result
+
+    upload.records_imported = result['imported']
+    upload.records_updated = result['updated']
+    upload.sheet_counts = result['sheets']
+    upload.save(update_fields=['records_imported', 'records_updated', 'sheet_counts'])
+    return upload, result
+
+
+def rollback_upload(upload, chunk_size=None, force=False, progress=None):
+    """
+    Undo `upload`: delete the leads it created and restore the values it
+    overwrote on the leads it updated, one chunk per transaction.
+
+    Restoring is set-based: per chunk, one UPDATE per lineage field copies
+    the value out of the before-images in LeadImportChange, and one upsert
+    puts back the overwritten LeadText.
+
+    Leads a later upload has written since are skipped unless `force`, as
+    reverting them would also discard that upload's changes.
+    `progress(done, total)` is called after each chunk commits.
+    Returns counts of deleted, restored and skipped leads.
+    """
+    if upload.rolled_back_at is not None:
+        raise ValueError(f"{upload} was already rolled back")
+    if not upload.has_lineage:
+        raise ValueError(f"{upload} predates import lineage and can't be rolled back")
+    chunk_size = chunk_size or settings.LEADS_BULK_CHUNK_SIZE
+
+    changes = upload.changes.all()
+    skipped = 0
+    if not force:
+        skipped = changes.exclude(lead__import_batch=upload).count()
+        changes = changes.filter(lead__import_batch=upload)
+    total = changes.count()
+    created = Lead.objects.filter(
+        pk__in=changes.filter(action=LeadImportChange.CREATED).values('lead_id')
+    )
+    updated = Lead.objects.filter(
+        pk__in=changes.filter(action=LeadImportChange.UPDATED).values('lead_id')
+    )
+
+    def deleted_chunk(done, _):
+        if progress:
+            progress(done, total)
+
+    with span('ingest.rollback', upload=upload.pk, leads=total):
+        deleted = chunked_delete(created, chunk_size, progress=deleted_chunk)['processed']
+        done = deleted
+
+        images = LeadImportChange.objects.filter(batch=upload, lead_id=OuterRef('pk'))
+        for pks in iter_pk_chunks(updated, chunk_size):
+            with transaction.atomic():
+                before = lead_snapshots(pks)
+                for field in LINEAGE_FIELDS:
+                    if field in LeadText.TEXT_FIELDS:
+                        continue
+                    model_field = Lead._meta.get_field(field)
+                    value = KT(f'before__{field}')
+                    if model_field.null:
+                        # SQLite extracts a JSON null as the text 'null'
+                        value = NullIf(value, Value('null'))
+                    value = Cast(value, output_field=model_field)
+                    Lead.objects.filter(
+                        pk__in=pks, import_changes__batch=upload, import_changes__before__has_key=field
+                    ).update(**{field: Subquery(images.annotate(value=value).values('value')[:1])})
+                text_images = LeadImportChange.objects.filter(
+                    batch=upload, lead_id__in=pks, before__has_any_keys=LeadText.TEXT_FIELDS
+                ).values_list('lead_id', 'before')
+                LeadText.write({
+                    pk: {field: image[field] for field in LeadText.TEXT_FIELDS if field in image}
+                    for pk, image in text_images
+                })
+                Lead.objects.filter(pk__in=pks).update(updated_at=timezone.now())
+            notify_leads_changed(updated=pks, before=before)
+            done += len(pks)
+            if progress:
+                progress(done, total)
+
+    upload.rolled_back_at = timezone.now()
+    upload.save(update_fields=['rolled_back_at'])
+    return {'deleted': deleted, 'restored': done - deleted, 'skipped': skipped}
@@ -0,0 +1,210 @@
+"""
+Closed-loop load generator for the lead pages.
+
+Each simulated user picks an endpoint from a weighted mix, sends the
+request, records its latency and status, and immediately picks the next
+one until the run ends. OpenAI traffic is answered by a local
+`FakeOpenAIServer`, so AI searches cost nothing and fail at a chosen rate.
+Results are per-endpoint throughput and latency percentiles; see the
+`loadtest` management command.
+"""
+from dataclasses import dataclass, field
+from io import BytesIO
+import math
+import random
+import threading
+import time
+import uuid
+
+import httpx
+import pandas as pd
+
+DEFAULT_MIX = {
+    'home': 3,
+    'all_leads': 3,
+    'search': 2,
+    'ai': 1,
+    'export': 1,
+    'upload': 1,
+}
+
+SEARCH_QUERIES = [
+    'python django postgres',
+    'marketing strategy seo content',
+    'sales manager enterprise saas',
+    'data engineer spark cloud',
+    'finance controller audit',
+]
+
+AI_PROMPTS = [
+    'Senior backend engineers with Python experience in Bangalore',
+    'Marketing leaders at consumer brands who could sponsor a campaign',
+    'Finance heads at companies opening a GCC in India',
+    'Healthcare operations managers in Pune',
+]
+
+UPLOAD_ROLES = ['Software Engineer', 'Marketing Manager', 'Finance Director', 'Sales Lead', 'Staff Nurse']
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def upload_filename(run_id):
+    return f'loadtest-{run_id}.xlsx'
+
+
+def upload_email_prefix(run_id):
+    return f'loadtest.{run_id}.'
+
+
+def upload_workbook(run_id, rows=25):
+    """Small lead workbook; emails are stable within a run, so repeats become updates"""
+    df = pd.DataFrame({
+        'Name': [f'Load Test {i}' for i in range(rows)],
+        'Email': [f'{upload_email_prefix(run_id)}{i}@leads.local' for i in range(rows)],
+        'Designation': [UPLOAD_ROLES[i % len(UPLOAD_ROLES)] for i in range(rows)],
+        'Company Name': [f'Load Co {i % 7}' for i in range(rows)],
+    })
+    output = BytesIO()
+    df.to_excel(output, index=False)
+    return output.getvalue()
+
+
+@dataclass
+class EndpointStats:
+    latencies: list = field(default_factory=list)
+    errors: int = 0
+    statuses: dict = field(default_factory=dict)
+
+    def record(self, latency, status):
+        self.latencies.append(latency)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if status == 'error' or status >= 400:
+            self.errors += 1
+
+    def summary(self, elapsed):
+        latencies = sorted(self.latencies)
+        return {
+            'requests': len(latencies),
+            'errors': self.errors,
+            'rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+            'max_ms': round(latencies[-1] * 1000, 1) if latencies else 0.0,
+            'statuses': {str(k): v for k, v in sorted(self.statuses.items(), key=str)},
+        }
+
+
+class LoadTest:
+    """
+    Drive `users` concurrent users against `base_url` for `duration`
+    seconds, or until `max_requests` requests have been sent.
+    """
+
+    def __init__(self, base_url, users=50, duration=30.0, max_requests=None,
+                 mix=None, think_time=0.0, timeout=60.0):
+        self.base_url = base_url.rstrip('/')
+        self.users = users
+        self.duration = duration
+        self.max_requests = max_requests
+        self.mix = {name: weight for name, weight in (mix or DEFAULT_MIX).items() if weight > 0}
+        unknown = set(self.mix) - set(DEFAULT_MIX)
+        if unknown:
+            raise ValueError(f"Unknown endpoints in mix: {', '.join(sorted(unknown))}")
+        if not self.mix:
+            raise ValueError("The traffic mix is empty")
+        self.think_time = think_time
+        self.timeout = timeout
+        self.stats = {name: EndpointStats() for name in self.mix}
+        self._lock = threading.Lock()
+        self._sent = 0
+        # Tags what the run writes (upload filenames, lead emails) so it can be cleaned up
+        self.run_id = uuid.uuid4().hex[:8]
+        self._workbook = upload_workbook(self.run_id) if 'upload' in self.mix else None
+
+    def _take_ticket(self, deadline):
+        with self._lock:
+            if time.monotonic() >= deadline:
+                return False
+            if self.max_requests is not None and self._sent >= self.max_requests:
+                return False
+            self._sent += 1
+            return True
+
+    def _csrf_headers(self, client):
+        token = client.cookies.get('csrftoken')
+        if token is None:
+            # The home page always renders the upload form's CSRF token
+            client.get('/')
+            token = client.cookies.get('csrftoken', '')
+        return {'X-CSRFToken': token, 'Referer': self.base_url + '/'}
+
+    def _request(self, client, name):
+        if name == 'home':
+            return client.get('/')
+        if name == 'all_leads':
+            return client.get('/all-leads/')
+        if name == 'export':
+            return client.get('/export/')
+        if name == 'search':
+            return client.post('/search/', data={'skills': random.choice(SEARCH_QUERIES)},
+                               headers=self._csrf_headers(client))
+        if name == 'ai':
+            return client.post('/ai-lead-generation/', data={'prompt': random.choice(AI_PROMPTS)},
+                               headers=self._csrf_headers(client))
+        if name == 'upload':
+            files = {'file': (upload_filename(self.run_id), self._workbook,
+                              'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')}
+            return client.post('/upload/', files=files, headers=self._csrf_headers(client))
+        raise ValueError(name)
+
+    def _user(self, deadline):
+        names = list(self.mix)
+        weights = list(self.mix.values())
+        with httpx.Client(base_url=self.base_url, timeout=self.timeout, follow_redirects=False) as client:
+            while self._take_ticket(deadline):
+                name = random.choices(names, weights)[0]
+                started = time.perf_counter()
+                try:
+                    status = self._request(client, name).status_code
+                except httpx.HTTPError:
+                    status = 'error'
+                latency = time.perf_counter() - started
+                with self._lock:
+                    self.stats[name].record(latency, status)
+                if self.think_time:
+                    time.sleep(random.uniform(0, 2 * self.think_time))
+
+    def run(self):
+        """Run the load and return the report dict"""
+        started = time.monotonic()
+        deadline = started + self.duration
+        threads = [
+            threading.Thread(target=self._user, args=(deadline,), daemon=True)
+            for _ in range(self.users)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        total = EndpointStats()
+        for stats in self.stats.values():
+            total.latencies.extend(stats.latencies)
+            total.errors += stats.errors
+            for status, count in stats.statuses.items():
+                total.statuses[status] = total.statuses.get(status, 0) + count
+
+        return {
+            'users': self.users,
+            'elapsed_s': round(elapsed, 2),
+            'endpoints': {name: stats.summary(elapsed) for name, stats in self.stats.items()},
+            'total': total.summary(elapsed),
+        }
@@ -0,0 +1,190 @@
+import json
+import os
+import random
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler, get_internal_wsgi_application
+from django.db import connections
+from django.test.utils import override_settings
+
+from leads.bulk import chunked_delete
+from leads.fake_openai import FakeOpenAIServer
+from leads.ingest import upsert_leads
+from leads.loadtest import DEFAULT_MIX, LoadTest, upload_email_prefix, upload_filename
+from leads.models import Lead, UploadHistory
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def parse_mix(value):
+    """'home=3,search=2,ai=1' -> {'home': 3, 'search': 2, 'ai': 1}"""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        try:
+            mix[name.strip()] = float(weight)
+        except ValueError:
+            raise CommandError(f"Bad mix entry {part!r}; expected name=weight")
+    return mix
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test the lead pages with concurrent users and a fake OpenAI server, "
+        "reporting throughput and p50/p95/p99 latency per endpoint. Without --target "
+        "the app is served in-process (sharing this process's GIL); for tuning WSGI/ASGI "
+        "workers run the real server with OPENAI_BASE_URL pointing at --fake-port and pass --target. "
+        "AI requests still queue for the client-side LEADS_OPENAI_*_PER_MINUTE limits. "
+        "The run writes leads and uploads and rewrites match_score on the leads it searches; "
+        "it refuses a database whose name doesn't contain 'test' unless --allow-writes is given, "
+        "and afterwards removes what it created and restores the scores in this process's "
+        "database (which a --target must share)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', help="Base URL of a running app, e.g. http://127.0.0.1:8000")
+        parser.add_argument('--users', type=int, default=50, help="Concurrent users (default 50)")
+        parser.add_argument('--duration', type=float, default=30, help="Seconds to run (default 30)")
+        parser.add_argument('--requests', type=int, help="Stop after this many requests")
+        parser.add_argument('--think-time', type=float, default=0.0,
+                            help="Mean pause between a user's requests, in seconds")
+        parser.add_argument('--mix', type=parse_mix,
+                            default=DEFAULT_MIX,
+                            help="Endpoint weights, e.g. home=3,all_leads=3,search=2,ai=1,export=1,upload=1")
+        parser.add_argument('--ai-latency', type=float, default=1.0, help="Fake OpenAI mean latency in seconds")
+        parser.add_argument('--ai-jitter', type=float, default=0.3, help="Fake OpenAI latency std deviation")
+        parser.add_argument('--ai-error-rate', type=float, default=0.0,
+                            help="Share of fake OpenAI calls answered with 429/500")
+        parser.add_argument('--fake-port', type=int, default=0, help="Port for the fake OpenAI server")
+        parser.add_argument('--seed', type=int, default=0, help="Create this many synthetic leads first")
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+        parser.add_argument('--allow-writes', action='store_true',
+                            help="Run against a database that isn't a test database")
+
+    run_id = None
+
+    def handle(self, *args, **options):
+        database = str(connections['default'].settings_dict['NAME'])
+        if 'test' not in os.path.basename(database).lower() and not options['allow_writes']:
+            raise CommandError(
+                f"{database} doesn't look like a test database, and the load test writes leads and "
+                "uploads to it. Point DATABASE_URL at a test database, or pass --allow-writes."
+            )
+
+        scores = dict(Lead.objects.values_list('pk', 'match_score').iterator(chunk_size=2000))
+        seeded = self._seed(options['seed']) if options['seed'] else []
+        try:
+            self._load(options)
+        finally:
+            self._clean_up(seeded, scores)
+
+    def _load(self, options):
+        mean, jitter = options['ai_latency'], options['ai_jitter']
+        fake = FakeOpenAIServer(
+            latency=lambda: max(0.0, random.gauss(mean, jitter)),
+            error_rate=options['ai_error_rate'],
+            port=options['fake_port'],
+        ).start()
+        self.stderr.write(f"Fake OpenAI server at {fake.base_url}")
+
+        try:
+            if options['target']:
+                self.stderr.write(f"Target {options['target']} must run with OPENAI_BASE_URL={fake.base_url}")
+                report = self._run(options['target'], options)
+            else:
+                report = self._run_in_process(fake, options)
+        finally:
+            fake.stop()
+
+        report['fake_openai_requests'] = fake.request_count
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self._print_report(report)
+
+    def _seed(self, count):
+        roles = ['Software Engineer', 'Data Scientist', 'Marketing Manager', 'Finance Director', 'Sales Lead']
+        cities = ['Bangalore', 'Pune', 'Hyderabad', 'Mumbai', 'Delhi']
+        rows = [
+            {
+                'name': f'Seed Lead {i}',
+                'email': f'seed.{i}@leads.local',
+                'role': roles[i % len(roles)],
+                'company': f'Seed Company {i % 97}',
+                'location': cities[i % len(cities)],
+                'skills': 'python, django, sql' if i % 2 else 'seo, content, strategy',
+            }
+            for i in range(count)
+        ]
+        result = upsert_leads(rows)
+        self.stderr.write(f"Seeded {result['imported']} new and {result['updated']} existing leads")
+        return result['created_pks']
+
+    def _clean_up(self, seeded, scores):
+        """Delete the leads and uploads the run created and put back the scores its searches wrote"""
+        deleted = 0
+        for start in range(0, len(seeded), 1000):
+            deleted += chunked_delete(Lead.objects.filter(pk__in=seeded[start:start + 1000]))['processed']
+        uploads = 0
+        if self.run_id:
+            deleted += chunked_delete(
+                Lead.objects.filter(email__startswith=upload_email_prefix(self.run_id))
+            )['processed']
+            batches = UploadHistory.objects.filter(filename=upload_filename(self.run_id))
+            uploads = batches.count()
+            batches.delete()
+
+        changed = [
+            Lead(pk=pk, match_score=scores[pk])
+            for pk, score in Lead.objects.values_list('pk', 'match_score').iterator(chunk_size=2000)
+            if pk in scores and score != scores[pk]
+        ]
+        Lead.objects.bulk_update(changed, ['match_score'], batch_size=1000)
+        self.stderr.write(f"Removed {deleted} leads and {uploads} uploads, restored {len(changed)} match scores")
+
+    def _run(self, base_url, options):
+        try:
+            load = LoadTest(
+                base_url,
+                users=options['users'],
+                duration=options['duration'],
+                max_requests=options['requests'],
+                mix=options['mix'],
+                think_time=options['think_time'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.run_id = load.run_id
+        self.stderr.write(f"Running {options['users']} users for up to {options['duration']}s...")
+        return load.run()
+
+    def _run_in_process(self, fake, options):
+        server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler, allow_reuse_address=False)
+        server.set_app(get_internal_wsgi_application())
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        host, port = server.server_address[:2]
+        try:
+            # Changing these settings also resets the shared AI client
+            with override_settings(OPENAI_BASE_URL=fake.base_url, OPENAI_API_KEY='loadtest'):
+                return self._run(f'http://{host}:{port}', options)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def _print_report(self, report):
+        header = f"{'endpoint':<12}{'reqs':>8}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+        self.stdout.write(f"{report['users']} users, {report['elapsed_s']}s, "
+                          f"{report['fake_openai_requests']} fake OpenAI calls")
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        rows = list(report['endpoints'].items()) + [('total', report['total'])]
+        for name, row in rows:
+            self.stdout.write(
+                f"{name:<12}{row['requests']:>8}{row['errors']:>8}{row['rps']:>9}"
+                f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}{row['max_ms']:>10}"
+            )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from leads.conversations import purge_expired_conversations
+
+
+class Command(BaseCommand):
+    help = "Delete lead chat messages whose session has expired (run after clearsessions)"
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_conversations()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} chat messages of expired sessions"))
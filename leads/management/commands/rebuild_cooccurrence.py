@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from leads.cooccurrence import rebuild_cooccurrence
+
+
+class Command(BaseCommand):
+    help = "Recompute the keyword co-occurrence index behind search suggestions from the lead table"
+
+    def handle(self, *args, **options):
+        result = rebuild_cooccurrence()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {result['terms']} terms and {result['pairs']} term pairs"))
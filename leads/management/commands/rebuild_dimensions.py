@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from leads.dimensions import rebuild_dimension_counts
+
+
+class Command(BaseCommand):
+    help = "Recompute Company and Location lead counts from the lead table"
+
+    def handle(self, *args, **options):
+        for label, rows in rebuild_dimension_counts().items():
+            self.stdout.write(self.style.SUCCESS(f"Recounted {rows} {label}"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from leads.similarity import rebuild_signatures
+
+
+class Command(BaseCommand):
+    help = "Recompute the MinHash signatures and LSH buckets behind \"similar leads\""
+
+    def handle(self, *args, **options):
+        total = rebuild_signatures()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt signatures for {total} leads"))
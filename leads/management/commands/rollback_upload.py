@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from leads.ingest import rollback_upload
+from leads.models import UploadHistory
+
+
+class Command(BaseCommand):
+    help = (
+        "Undo an upload: delete the leads it created and restore the values it "
+        "overwrote, in chunks. Leads a later upload has written are left alone "
+        "unless --force is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('upload_id', type=int, help="UploadHistory ID")
+        parser.add_argument('--force', action='store_true',
+                            help="Also revert leads a later upload has written since")
+        parser.add_argument('--chunk-size', type=int, help="Leads per transaction")
+
+    def handle(self, *args, **options):
+        try:
+            upload = UploadHistory.objects.get(pk=options['upload_id'])
+        except UploadHistory.DoesNotExist:
+            raise CommandError(f"No upload with ID {options['upload_id']}")
+
+        def progress(done, total):
+            self.stdout.write(f"  {done}/{total} leads")
+
+        try:
+            result = rollback_upload(
+                upload, chunk_size=options['chunk_size'], force=options['force'], progress=progress
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rolled back {upload.filename}: deleted {result['deleted']} leads, "
+            f"restored {result['restored']}, skipped {result['skipped']}"
+        ))
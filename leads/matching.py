@@ -0,0 +1,140 @@
+"""
+Keyword scoring of leads against a free-text query.
+
+Used by `search_leads`, and by the AI search as its fallback when the
+OpenAI circuit is open.
+"""
+from collections import Counter
+import re
+
+from .models import Lead
+from .profiling import span
+
+
+def normalize_text(text):
+    """Normalize text for matching"""
+    if not text:
+        return []
+    text = text.lower()
+    text = re.sub(r'[^a-z0-9\s]', ' ', text)
+    return [t for t in text.split() if len(t) > 2]
+
+
+def score_lead(lead, query_set):
+    """
+    Score one lead against a set of query tokens.
+    Returns (score, match_context, matched_tokens); score is None when nothing matched.
+    """
+    score = 0
+    include = False
+    match_context = []
+    matched = []
+
+    # Normalize lead fields
+    role_tokens = normalize_text(lead.role)
+    company_tokens = normalize_text(lead.company)
+    skills_tokens = normalize_text(lead.skills)
+    notes_tokens = normalize_text(lead.notes)
+    location_tokens = normalize_text(lead.location)
+
+    # --- Role match ---
+    role_match = set(role_tokens) & query_set
+    if role_match:
+        score += 30 + 5 * len(role_match)
+        include = True
+        matched.extend(role_match)
+        match_context.append(f"Role: {', '.join(role_match)}")
+
+    # --- Skills match ---
+    skills_match = set(skills_tokens) & query_set
+    if skills_match:
+        score += 40 + 5 * len(skills_match)
+        include = True
+        matched.extend(skills_match)
+        match_context.append(f"Skills: {', '.join(skills_match)}")
+
+    # --- Company match ---
+    company_match = set(company_tokens) & query_set
+    if company_match:
+        score += 25
+        include = True
+        matched.extend(company_match)
+        match_context.append(f"Company: {', '.join(company_match)}")
+
+    # --- Location match ---
+    location_match = set(location_tokens) & query_set
+    if location_match:
+        score += 15
+        include = True
+        matched.extend(location_match)
+        match_context.append(f"Location: {', '.join(location_match)}")
+
+    # --- Notes overlap ---
+    misc_overlap = set(notes_tokens) & query_set
+    if misc_overlap:
+        score += 10
+        include = True
+        matched.extend(misc_overlap)
+        match_context.append(f"Notes: {', '.join(misc_overlap)}")
+
+    if not include:
+        return None, [], []
+
+    # Normalize score
+    return min(score, 100), match_context, matched
+
+
+def score_leads(query_text, leads, save_scores=True, stopwords=()):
+    """
+    Score every lead in `leads` against `query_text`.
+    Returns (matched_leads sorted by score, keyword_stats). Each matched lead
+    gets `match_score` and `match_context`; with `save_scores` the score is
+    also written back to the database. Related-term suggestions for the
+    stats come from leads.cooccurrence.keyword_suggestions.
+    """
+    query_tokens = [t for t in normalize_text(query_text) if t not in stopwords]
+    query_set = set(query_tokens)
+
+    matched_leads = []
+
+    # Track keyword statistics
+    matched_keywords = Counter()
+
+    for lead in leads:
+        score, match_context, matched = score_lead(lead, query_set)
+        if score is None:
+            continue
+
+        matched_keywords.update(matched)
+        lead.match_score = score
+        lead.match_context = match_context
+        matched_leads.append(lead)
+
+    if save_scores and matched_leads:
+        with span('search.write', rows=len(matched_leads)):
+            Lead.objects.bulk_update(matched_leads, ['match_score'], batch_size=500)
+
+    # Sort by match score
+    matched_leads.sort(key=lambda x: x.match_score, reverse=True)
+
+    # Calculate keyword statistics
+    matched_keywords_list = [
+        {'word': word, 'count': count}
+        for word, count in matched_keywords.most_common()
+    ]
+
+    # Find missing keywords
+    missing_keywords = query_set - set(matched_keywords.keys())
+
+    # Calculate match rate
+    match_rate = 0
+    if query_tokens:
+        match_rate = round((len(matched_keywords) / len(query_set)) * 100, 1)
+
+    keyword_stats = {
+        'matched': matched_keywords_list,
+        'missing': sorted(list(missing_keywords)),
+        'match_rate': match_rate
+    }
+
+    return matched_leads, keyword_stats
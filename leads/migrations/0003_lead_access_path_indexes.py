@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0002_remove_lead_ai_concerns_remove_lead_ai_highlights_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['-match_score', '-created_at'], name='lead_score_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['company'], name='lead_company_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['created_at'], name='lead_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['updated_at'], name='lead_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='uploadhistory',
+            index=models.Index(fields=['-uploaded_at'], name='upload_uploaded_idx'),
+        ),
+    ]
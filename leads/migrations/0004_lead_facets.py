@@ -0,0 +1,78 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:31
+
+from django.db import migrations, models
+from django.db.models import Count
+
+from leads.industries import infer_industry
+
+FACETS = ['company', 'location', 'industry', 'role']
+
+
+def backfill_industry_and_facets(apps, schema_editor):
+    Lead = apps.get_model('leads', 'Lead')
+    LeadFacet = apps.get_model('leads', 'LeadFacet')
+
+    last_pk = 0
+    while True:
+        batch = list(Lead.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'role', 'company', 'notes')[:1000])
+        if not batch:
+            break
+        for lead in batch:
+            lead.industry = infer_industry(lead.role, lead.company, lead.notes)
+        Lead.objects.bulk_update(batch, ['industry'])
+        last_pk = batch[-1].pk
+
+    for facet in FACETS:
+        grouped = Lead.objects.exclude(**{facet: ''}).order_by().values_list(facet).annotate(count=Count('id'))
+        LeadFacet.objects.bulk_create(
+            [LeadFacet(facet=facet, value=value, count=count) for value, count in grouped],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0003_lead_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeadFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(max_length=20)),
+                ('value', models.CharField(max_length=200)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['facet', '-count', 'value'],
+            },
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='industry',
+            field=models.CharField(blank=True, editable=False, help_text='Derived from role, company and notes on save', max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['location'], name='lead_location_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['industry'], name='lead_industry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['role'], name='lead_role_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leadfacet',
+            index=models.Index(fields=['facet', '-count'], name='leadfacet_top_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='leadfacet',
+            constraint=models.UniqueConstraint(fields=('facet', 'value'), name='leadfacet_facet_value_uniq'),
+        ),
+        migrations.RunPython(backfill_industry_and_facets, migrations.RunPython.noop),
+    ]
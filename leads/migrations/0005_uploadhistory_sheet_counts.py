@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0004_lead_facets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadhistory',
+            name='sheet_counts',
+            field=models.JSONField(blank=True, default=list, help_text='Per-sheet rows, imported, updated and skipped counts'),
+        ),
+    ]
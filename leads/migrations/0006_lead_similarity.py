@@ -0,0 +1,103 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:40
+
+import hashlib
+import re
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+import numpy as np
+
+# The hashing of leads.similarity as of this migration, frozen so the
+# backfill doesn't change with that module. Signatures written later by
+# the live code must stay comparable with these.
+NUM_PERM = 64
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERM // LSH_BANDS
+_PRIME = (1 << 31) - 1
+_rng = np.random.RandomState(20240601)
+_A = _rng.randint(1, _PRIME, size=NUM_PERM, dtype=np.int64)
+_B = _rng.randint(0, _PRIME, size=NUM_PERM, dtype=np.int64)
+
+
+def normalize_text(text):
+    if not text:
+        return []
+    text = re.sub(r'[^a-z0-9\s]', ' ', text.lower())
+    return [t for t in text.split() if len(t) > 2]
+
+
+def lead_tokens(role, skills, notes):
+    return set(normalize_text(role)) | set(normalize_text(skills)) | set(normalize_text(notes))
+
+
+def minhash_signature(tokens):
+    if not tokens:
+        return None
+    hashes = np.fromiter(
+        (zlib.crc32(token.encode()) & _PRIME for token in tokens), dtype=np.int64, count=len(tokens)
+    )
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+def band_keys(signature):
+    keys = []
+    for band in range(LSH_BANDS):
+        chunk = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes()
+        digest = hashlib.blake2b(bytes([band]) + chunk, digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'big', signed=True) >> 1)
+    return keys
+
+
+def backfill_signatures(apps, schema_editor):
+    Lead = apps.get_model('leads', 'Lead')
+    LeadSignature = apps.get_model('leads', 'LeadSignature')
+    LeadBucket = apps.get_model('leads', 'LeadBucket')
+
+    last_pk = 0
+    while True:
+        batch = list(
+            Lead.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'role', 'skills', 'notes')[:1000]
+        )
+        if not batch:
+            break
+        signatures = []
+        buckets = []
+        for pk, role, skills, notes in batch:
+            signature = minhash_signature(lead_tokens(role, skills, notes))
+            if signature is None:
+                continue
+            signatures.append(LeadSignature(lead_id=pk, signature=signature.tobytes()))
+            buckets.extend(LeadBucket(lead_id=pk, key=key) for key in band_keys(signature))
+        LeadSignature.objects.bulk_create(signatures)
+        LeadBucket.objects.bulk_create(buckets, batch_size=2000)
+        last_pk = batch[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0005_uploadhistory_sheet_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeadSignature',
+            fields=[
+                ('lead', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='leads.lead')),
+                ('signature', models.BinaryField(max_length=256)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LeadBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField()),
+                ('lead', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='leads.lead')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['key'], name='leadbucket_key_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_signatures, migrations.RunPython.noop),
+    ]
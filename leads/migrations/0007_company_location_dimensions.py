@@ -0,0 +1,96 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+from leads.canonical import company_key, location_key
+
+# Lead column, Lead foreign key, dimension model, key function
+DIMENSIONS = [
+    ('company', 'canonical_company_id', 'Company', company_key),
+    ('location', 'canonical_location_id', 'Location', location_key),
+]
+
+
+def backfill_dimensions(apps, schema_editor):
+    Lead = apps.get_model('leads', 'Lead')
+
+    for column, fk, model_name, key_for in DIMENSIONS:
+        model = apps.get_model('leads', model_name)
+        # Most common spelling of each key becomes its display name
+        names = {}
+        grouped = Lead.objects.exclude(**{column: ''}).order_by().values_list(column).annotate(count=Count('id'))
+        for name, count in sorted(grouped, key=lambda item: -item[1]):
+            key = key_for(name)
+            if key:
+                names.setdefault(key, name.strip()[:200])
+        model.objects.bulk_create(
+            [model(key=key, name=name) for key, name in names.items()],
+            batch_size=1000,
+        )
+        ids = dict(model.objects.values_list('key', 'pk'))
+
+        last_pk = 0
+        while True:
+            batch = list(Lead.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', column)[:1000])
+            if not batch:
+                break
+            for lead in batch:
+                setattr(lead, fk, ids.get(key_for(getattr(lead, column))))
+            Lead.objects.bulk_update(batch, [fk])
+            last_pk = batch[-1].pk
+
+        counts = Lead.objects.exclude(**{f'{fk}__isnull': True}).order_by().values_list(fk).annotate(count=Count('id'))
+        rows = [model(pk=pk, lead_count=count) for pk, count in counts]
+        model.objects.bulk_update(rows, ['lead_count'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0006_lead_similarity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Company',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('key', models.CharField(max_length=200, unique=True)),
+                ('lead_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Companies',
+                'ordering': ['-lead_count', 'name'],
+                'abstract': False,
+                'indexes': [models.Index(fields=['-lead_count'], name='company_count_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='canonical_company',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='leads', to='leads.company'),
+        ),
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('key', models.CharField(max_length=200, unique=True)),
+                ('lead_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-lead_count', 'name'],
+                'abstract': False,
+                'indexes': [models.Index(fields=['-lead_count'], name='location_count_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='canonical_location',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='leads', to='leads.location'),
+        ),
+        migrations.RunPython(backfill_dimensions, migrations.RunPython.noop),
+    ]
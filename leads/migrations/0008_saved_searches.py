@@ -0,0 +1,56 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:46
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0007_company_location_dimensions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavedSearch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('query', models.TextField()),
+                ('tokens', models.JSONField(default=list, help_text='Normalised query tokens')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_viewed_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Hits found after this are shown as new')),
+            ],
+            options={
+                'verbose_name_plural': 'Saved Searches',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SavedSearchHit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('match_context', models.JSONField(default=list)),
+                ('found_at', models.DateTimeField()),
+                ('lead', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saved_search_hits', to='leads.lead')),
+                ('search', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hits', to='leads.savedsearch')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['search', '-found_at'], name='savedsearchhit_new_idx')],
+                'constraints': [models.UniqueConstraint(fields=('search', 'lead'), name='savedsearchhit_search_lead_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SavedSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100)),
+                ('search', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='leads.savedsearch')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('term', 'search'), name='savedsearchterm_term_search_uniq')],
+            },
+        ),
+    ]
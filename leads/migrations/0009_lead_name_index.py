@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0008_saved_searches'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['name'], name='lead_name_idx'),
+        ),
+    ]
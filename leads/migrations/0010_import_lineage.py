@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0009_lead_name_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='import_batch',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='leads', to='leads.uploadhistory'),
+        ),
+        migrations.AddField(
+            model_name='uploadhistory',
+            name='rolled_back_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='LeadImportChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated')], max_length=10)),
+                ('before', models.JSONField(blank=True, default=dict, help_text='Fields the upload overwrote, with their previous values')),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='leads.uploadhistory')),
+                ('lead', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_changes', to='leads.lead')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('batch', 'lead'), name='leadimportchange_batch_lead_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:08
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0010_import_lineage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChunkedUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255)),
+                ('size', models.BigIntegerField(help_text='Total bytes the client will send')),
+                ('offset', models.BigIntegerField(default=0, help_text='Bytes received and verified so far')),
+                ('sha256', models.CharField(blank=True, help_text='Checksum of the whole file, checked on finalize when given', max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('upload', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='chunked_upload', to='leads.uploadhistory')),
+            ],
+        ),
+    ]
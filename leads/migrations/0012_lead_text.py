@@ -0,0 +1,54 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:11
+
+import django.db.models.deletion
+import leads.fields
+from django.db import migrations, models
+
+
+def move_notes(apps, schema_editor):
+    Lead = apps.get_model('leads', 'Lead')
+    LeadText = apps.get_model('leads', 'LeadText')
+    notes = Lead.objects.exclude(notes='').order_by('pk').values_list('pk', 'notes')
+    last_pk = 0
+    while True:
+        batch = list(notes.filter(pk__gt=last_pk)[:1000])
+        if not batch:
+            break
+        LeadText.objects.bulk_create([LeadText(lead_id=pk, notes=text) for pk, text in batch])
+        last_pk = batch[-1][0]
+
+
+def restore_notes(apps, schema_editor):
+    Lead = apps.get_model('leads', 'Lead')
+    LeadText = apps.get_model('leads', 'LeadText')
+    texts = LeadText.objects.order_by('lead_id').values_list('lead_id', 'notes')
+    last_pk = 0
+    while True:
+        batch = list(texts.filter(lead_id__gt=last_pk)[:1000])
+        if not batch:
+            break
+        leads = [Lead(pk=pk, notes=text) for pk, text in batch]
+        Lead.objects.bulk_update(leads, ['notes'])
+        last_pk = batch[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0011_chunked_uploads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeadText',
+            fields=[
+                ('lead', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='text', serialize=False, to='leads.lead')),
+                ('notes', leads.fields.CompressedTextField(blank=True)),
+            ],
+        ),
+        migrations.RunPython(move_notes, restore_notes),
+        migrations.RemoveField(
+            model_name='lead',
+            name='notes',
+        ),
+    ]
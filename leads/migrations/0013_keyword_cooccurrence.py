@@ -0,0 +1,89 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:16
+
+from collections import Counter
+from itertools import combinations
+import re
+
+from django.db import migrations, models
+
+# The tokenizer of leads.cooccurrence as of this migration, frozen so the
+# backfill doesn't change with that module or the models it imports.
+COOCCURRENCE_FIELDS = ['role', 'skills', 'company', 'location']
+MAX_TERMS_PER_LEAD = 50
+
+
+def normalize_text(text):
+    if not text:
+        return []
+    text = re.sub(r'[^a-z0-9\s]', ' ', text.lower())
+    return [t for t in text.split() if len(t) > 2]
+
+
+def lead_terms(image):
+    terms = {}
+    for field in COOCCURRENCE_FIELDS:
+        for token in normalize_text(image.get(field)):
+            if len(token) <= 100:
+                terms.setdefault(token, None)
+    return sorted(list(terms)[:MAX_TERMS_PER_LEAD])
+
+
+def backfill_cooccurrence(apps, schema_editor):
+    Lead = apps.get_model('leads', 'Lead')
+    TermCount = apps.get_model('leads', 'TermCount')
+    TermPair = apps.get_model('leads', 'TermPair')
+
+    terms = Counter()
+    pairs = Counter()
+    last_pk = 0
+    while True:
+        batch = list(
+            Lead.objects.filter(pk__gt=last_pk).order_by('pk').values('pk', *COOCCURRENCE_FIELDS)[:1000]
+        )
+        if not batch:
+            break
+        for image in batch:
+            tokens = lead_terms(image)
+            terms.update(tokens)
+            pairs.update(combinations(tokens, 2))
+        last_pk = batch[-1]['pk']
+
+    TermCount.objects.bulk_create(
+        [TermCount(term=term, lead_count=count) for term, count in terms.items()], batch_size=1000
+    )
+    TermPair.objects.bulk_create(
+        [TermPair(first=first, second=second, lead_count=count) for (first, second), count in pairs.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0012_lead_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TermCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100, unique=True)),
+                ('lead_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TermPair',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first', models.CharField(max_length=100)),
+                ('second', models.CharField(max_length=100)),
+                ('lead_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['second'], name='termpair_second_idx')],
+                'constraints': [models.UniqueConstraint(fields=('first', 'second'), name='termpair_first_second_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_cooccurrence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0013_keyword_cooccurrence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_key', models.CharField(max_length=40)),
+                ('role', models.CharField(choices=[('user', 'User'), ('assistant', 'Assistant')], max_length=10)),
+                ('content', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('lead', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_messages', to='leads.lead')),
+            ],
+            options={
+                'ordering': ['pk'],
+                'indexes': [models.Index(fields=['session_key', 'lead', 'id'], name='chatmessage_thread_idx')],
+            },
+        ),
+    ]
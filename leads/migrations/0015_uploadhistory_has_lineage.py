@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+def flag_lineage(apps, schema_editor):
+    # Uploads from before lineage have no change rows. One since then that
+    # wrote nothing can't be told apart, and selects nothing either way.
+    UploadHistory = apps.get_model('leads', 'UploadHistory')
+    UploadHistory.objects.filter(changes__isnull=False).update(has_lineage=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0014_chat_messages'),
+    ]
+
+    operations = [
+        # Existing uploads start without lineage; new ones default to having it
+        migrations.AddField(
+            model_name='uploadhistory',
+            name='has_lineage',
+            field=models.BooleanField(default=False, editable=False, help_text='Whether the leads this upload wrote are recorded in LeadImportChange'),
+        ),
+        migrations.RunPython(flag_lineage, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='uploadhistory',
+            name='has_lineage',
+            field=models.BooleanField(default=True, editable=False, help_text='Whether the leads this upload wrote are recorded in LeadImportChange'),
+        ),
+    ]
@@ -1,6 +1,66 @@
+import uuid
+
 from django.db import models
+from django.utils import timezone
 from django.contrib.postgres.fields import ArrayField
 
+from .canonical import company_key, location_key
+from .fields import CompressedTextField
+from .industries import infer_industry
+
+class Dimension(models.Model):
+    """
+    A canonical company or location. Leads reference it by foreign key;
+    `lead_count` is kept current by leads.dimensions. Concrete models set
+    `key_for`, the function giving a name's canonical key.
+    """
+    name = models.CharField(max_length=200)
+    key = models.CharField(max_length=200, unique=True)
+    lead_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+        ordering = ['-lead_count', 'name']
+        indexes = [
+            models.Index(fields=['-lead_count'], name='%(class)s_count_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def resolve(cls, names):
+        """Map names to row IDs by canonical key, creating rows for unseen keys"""
+        keys = {name: cls.key_for(name) for name in dict.fromkeys(names) if name}
+        keys = {name: key for name, key in keys.items() if key}
+        if not keys:
+            return {}
+
+        ids = dict(cls.objects.filter(key__in=set(keys.values())).values_list('key', 'pk'))
+        missing = {}
+        for name, key in keys.items():
+            if key not in ids:
+                missing.setdefault(key, name)
+        if missing:
+            cls.objects.bulk_create(
+                [cls(key=key, name=name.strip()[:200]) for key, name in missing.items()],
+                ignore_conflicts=True,
+            )
+            ids.update(cls.objects.filter(key__in=list(missing)).values_list('key', 'pk'))
+        return {name: ids[key] for name, key in keys.items()}
+
+
+class Company(Dimension):
+    key_for = staticmethod(company_key)
+
+    class Meta(Dimension.Meta):
+        verbose_name_plural = "Companies"
+
+
+class Location(Dimension):
+    key_for = staticmethod(location_key)
+
+
 class Lead(models.Model):
     name = models.CharField(max_length=200)
     email = models.EmailField(unique=True, blank=True, null=True)
@@ -11,7 +71,17 @@ class Lead(models.Model):
     location = models.CharField(max_length=200, blank=True)
     skills = models.TextField(blank=True, help_text="Comma-separated skills")
     experience_years = models.IntegerField(default=0)
-    notes = models.TextField(blank=True)
+    # `notes` is stored in LeadText; see the property below
+    industry = models.CharField(max_length=50, blank=True, editable=False,
+                                help_text="Derived from role, company and notes on save")
+    # Canonical forms of `company` and `location`, assigned on every write
+    canonical_company = models.ForeignKey(Company, null=True, blank=True, editable=False,
+                                          on_delete=models.SET_NULL, related_name='leads')
+    canonical_location = models.ForeignKey(Location, null=True, blank=True, editable=False,
+                                           on_delete=models.SET_NULL, related_name='leads')
+    # Upload that last created or updated this lead (see LeadImportChange)
+    import_batch = models.ForeignKey('UploadHistory', null=True, blank=True, editable=False,
+                                     on_delete=models.SET_NULL, related_name='leads')
     match_score = models.FloatField(default=0.0)
     
     created_at = models.DateTimeField(auto_now_add=True)
@@ -19,10 +89,73 @@ class Lead(models.Model):
 
     class Meta:
         ordering = ['-match_score', '-created_at']
+        indexes = [
+            # Default ordering used by home, all_leads, export and the AI slice
+            models.Index(fields=['-match_score', '-created_at'], name='lead_score_created_idx'),
+            # Admin list filters and ordering
+            models.Index(fields=['company'], name='lead_company_idx'),
+            # Facet filters on all_leads (company is covered above)
+            models.Index(fields=['location'], name='lead_location_idx'),
+            models.Index(fields=['industry'], name='lead_industry_idx'),
+            models.Index(fields=['role'], name='lead_role_idx'),
+            models.Index(fields=['created_at'], name='lead_created_idx'),
+            # Admin search by name prefix
+            models.Index(fields=['name'], name='lead_name_idx'),
+            # Upload batch windows and the list-page Last-Modified
+            models.Index(fields=['updated_at'], name='lead_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.role} at {self.company}"
 
+    @property
+    def notes(self):
+        """
+        Long-form notes from LeadText. Querysets that read them for many
+        leads should select_related('text'); otherwise each lead loads its
+        own row on first access.
+        """
+        if '_notes' not in self.__dict__:
+            try:
+                self._notes = self.text.notes
+            except LeadText.DoesNotExist:
+                self._notes = ''
+        return self._notes
+
+    @notes.setter
+    def notes(self, value):
+        self._notes = value or ''
+        self._notes_changed = True
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        changed = set(update_fields) if update_fields is not None else None
+        # Notes set but left out of update_fields stay pending for a later save
+        text_held = changed is not None and 'notes' not in changed and self.__dict__.pop('_notes_changed', False)
+        derived = set()
+        if changed is None or {'role', 'company', 'notes'} & changed:
+            self.industry = infer_industry(self.role, self.company, self.notes)
+            derived.add('industry')
+        if changed is None or 'company' in changed:
+            self.canonical_company_id = Company.resolve([self.company]).get(self.company)
+            derived.add('canonical_company')
+        if changed is None or 'location' in changed:
+            self.canonical_location_id = Location.resolve([self.location]).get(self.location)
+            derived.add('canonical_location')
+        if changed is not None:
+            # notes is written to LeadText below, not to the lead row
+            kwargs['update_fields'] = (changed - {'notes'}) | derived
+        super().save(*args, **kwargs)
+        # Normally already written by leads.signals ahead of notifying receivers
+        self.save_text()
+        if text_held:
+            self._notes_changed = True
+
+    def save_text(self):
+        """Write notes set since the lead was loaded to LeadText"""
+        if self.__dict__.pop('_notes_changed', False):
+            LeadText.write({self.pk: {'notes': self.notes}})
+
     def get_skills_list(self):
         """Return skills as a list"""
         if not self.skills:
@@ -42,15 +175,267 @@ class Lead(models.Model):
         return round(score, 2)
 
 
+class LeadText(models.Model):
+    """
+    Long free text of a lead, kept out of the Lead row so the list, search
+    and export queries that scan leads stay narrow. Leads without any text
+    have no row.
+    """
+    TEXT_FIELDS = ['notes']
+
+    lead = models.OneToOneField(Lead, on_delete=models.CASCADE, primary_key=True, related_name='text')
+    notes = CompressedTextField(blank=True)
+
+    def __str__(self):
+        return f"Text of lead {self.lead_id}"
+
+    @classmethod
+    def write(cls, texts):
+        """
+        Store `texts`, a dict of lead pk -> {field: text}, in one upsert per
+        set of fields. Rows left without any text are deleted.
+        """
+        empty = {
+            pk for pk, values in texts.items()
+            if set(values) >= set(cls.TEXT_FIELDS) and not any(values.values())
+        }
+        cls.objects.filter(lead_id__in=empty).delete()
+
+        by_fields = {}
+        for pk, values in texts.items():
+            if pk not in empty:
+                by_fields.setdefault(tuple(sorted(values)), []).append(cls(lead_id=pk, **values))
+        for fields, rows in by_fields.items():
+            cls.objects.bulk_create(
+                rows, batch_size=500, update_conflicts=True, unique_fields=['lead'], update_fields=list(fields)
+            )
+
+
 class UploadHistory(models.Model):
     filename = models.CharField(max_length=255)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     records_imported = models.IntegerField(default=0)
     records_updated = models.IntegerField(default=0)
+    sheet_counts = models.JSONField(default=list, blank=True,
+                                    help_text="Per-sheet rows, imported, updated and skipped counts")
+    rolled_back_at = models.DateTimeField(null=True, blank=True, editable=False)
+    has_lineage = models.BooleanField(default=True, editable=False,
+                                      help_text="Whether the leads this upload wrote are recorded in LeadImportChange")
     
     class Meta:
         ordering = ['-uploaded_at']
         verbose_name_plural = "Upload Histories"
+        indexes = [
+            models.Index(fields=['-uploaded_at'], name='upload_uploaded_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} - {self.uploaded_at.strftime('%Y-%m-%d %H:%M')}"
+
+
+class LeadImportChange(models.Model):
+    """
+    A lead written by an upload, with the values it had before. Rolling the
+    upload back deletes the leads it created and restores `before` on the
+    ones it updated.
+    """
+    CREATED = 'created'
+    UPDATED = 'updated'
+
+    batch = models.ForeignKey(UploadHistory, on_delete=models.CASCADE, related_name='changes')
+    lead = models.ForeignKey(Lead, on_delete=models.CASCADE, related_name='import_changes')
+    action = models.CharField(max_length=10, choices=[(CREATED, 'Created'), (UPDATED, 'Updated')])
+    before = models.JSONField(default=dict, blank=True,
+                              help_text="Fields the upload overwrote, with their previous values")
+
+    class Meta:
+        constraints = [
+            # A lead repeated across sheets keeps the before-image of its first write
+            models.UniqueConstraint(fields=['batch', 'lead'], name='leadimportchange_batch_lead_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.batch_id}: {self.action} lead {self.lead_id}"
+
+
+class ChunkedUpload(models.Model):
+    """
+    A workbook sent in chunks. The first `offset` bytes are on disk and
+    acknowledged; the client resumes from there. Finalizing imports the
+    file as `upload`.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField(help_text="Total bytes the client will send")
+    offset = models.BigIntegerField(default=0, help_text="Bytes received and verified so far")
+    sha256 = models.CharField(max_length=64, blank=True,
+                              help_text="Checksum of the whole file, checked on finalize when given")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    upload = models.OneToOneField(UploadHistory, on_delete=models.SET_NULL, null=True, blank=True,
+                                  related_name='chunked_upload')
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size} bytes)"
+
+
+class LeadFacet(models.Model):
+    """
+    Number of leads per facet value (company, location, industry, role).
+    Maintained incrementally by leads.facets so the all_leads sidebar never
+    needs a GROUP BY over the lead table.
+    """
+    facet = models.CharField(max_length=20)
+    value = models.CharField(max_length=200)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['facet', '-count', 'value']
+        constraints = [
+            models.UniqueConstraint(fields=['facet', 'value'], name='leadfacet_facet_value_uniq'),
+        ]
+        indexes = [
+            # Top values of one facet
+            models.Index(fields=['facet', '-count'], name='leadfacet_top_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.facet}={self.value} ({self.count})"
+
+
+class ChatMessage(models.Model):
+    """
+    One message of a conversation about a lead, keyed by browser session.
+    Messages are only appended; clearing a conversation deletes its rows.
+    """
+    USER = 'user'
+    ASSISTANT = 'assistant'
+
+    session_key = models.CharField(max_length=40)
+    lead = models.ForeignKey(Lead, on_delete=models.CASCADE, related_name='chat_messages')
+    role = models.CharField(max_length=10, choices=[(USER, 'User'), (ASSISTANT, 'Assistant')])
+    content = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['pk']
+        indexes = [
+            # One conversation, in order
+            models.Index(fields=['session_key', 'lead', 'id'], name='chatmessage_thread_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.role} on lead {self.lead_id}"
+
+
+class TermCount(models.Model):
+    """
+    Number of leads whose role, skills, company or location contain a
+    keyword token. Maintained incrementally by leads.cooccurrence.
+    """
+    term = models.CharField(max_length=100, unique=True)
+    lead_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.term} ({self.lead_count})"
+
+
+class TermPair(models.Model):
+    """
+    Number of leads containing both keyword tokens of a pair, stored once
+    with `first` < `second`. Maintained incrementally by leads.cooccurrence.
+    """
+    first = models.CharField(max_length=100)
+    second = models.CharField(max_length=100)
+    lead_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['first', 'second'], name='termpair_first_second_uniq'),
+        ]
+        indexes = [
+            # Pairs of a term in the `second` position; `first` is served by the constraint
+            models.Index(fields=['second'], name='termpair_second_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.first} + {self.second} ({self.lead_count})"
+
+
+class LeadSignature(models.Model):
+    """MinHash signature of a lead's role, skills and notes tokens (see leads.similarity)"""
+    lead = models.OneToOneField(Lead, on_delete=models.CASCADE, primary_key=True)
+    signature = models.BinaryField(max_length=256)
+
+
+class LeadBucket(models.Model):
+    """One LSH band of a lead's signature; leads sharing a key are candidate neighbours"""
+    lead = models.ForeignKey(Lead, on_delete=models.CASCADE)
+    key = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['key'], name='leadbucket_key_idx'),
+        ]
+
+
+class SavedSearch(models.Model):
+    """
+    A keyword search kept for re-use. New and updated leads are matched
+    against it as they are written (see leads.percolator).
+    """
+    name = models.CharField(max_length=200)
+    query = models.TextField()
+    tokens = models.JSONField(default=list, help_text="Normalised query tokens")
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_viewed_at = models.DateTimeField(default=timezone.now,
+                                          help_text="Hits found after this are shown as new")
+
+    class Meta:
+        ordering = ['name']
+        verbose_name_plural = "Saved Searches"
+
+    def __str__(self):
+        return self.name
+
+
+class SavedSearchTerm(models.Model):
+    """Inverted index of saved-search tokens: which searches contain a term"""
+    search = models.ForeignKey(SavedSearch, on_delete=models.CASCADE, related_name='terms')
+    term = models.CharField(max_length=100)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['term', 'search'], name='savedsearchterm_term_search_uniq'),
+        ]
+
+
+class SavedSearchHit(models.Model):
+    """A lead matching a saved search, recorded when the lead was written"""
+    search = models.ForeignKey(SavedSearch, on_delete=models.CASCADE, related_name='hits')
+    lead = models.ForeignKey(Lead, on_delete=models.CASCADE, related_name='saved_search_hits')
+    score = models.FloatField()
+    match_context = models.JSONField(default=list)
+    found_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['search', 'lead'], name='savedsearchhit_search_lead_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['search', '-found_at'], name='savedsearchhit_new_idx'),
+        ]
+
+
+class CacheVersion(models.Model):
+    """
+    A counter bumped on every write to the data it names. Cache keys and
+    HTTP validators include it, and being a row rather than a cache entry
+    it is the same for every worker whatever the cache backend.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    version = models.PositiveBigIntegerField(default=1)
 
     def __str__(self):
-        return f"{self.filename} - {self.uploaded_at.strftime('%Y-%m-%d %H:%M')}"
\ No newline at end of file
+        return f"{self.name} v{self.version}"
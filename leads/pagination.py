@@ -0,0 +1,49 @@
+"""
+Pagination for large tables.
+
+Django's Paginator runs COUNT(*) over the whole queryset for every page,
+which on a table of millions of rows costs more than the page itself.
+`EstimatedCountPaginator` counts at most LEADS_ADMIN_EXACT_COUNT_LIMIT
+rows exactly; past that an unfiltered table reports the planner's row
+estimate and a filtered one reports the cap.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+# Seconds a row estimate is reused where the database keeps none
+ESTIMATE_CACHE_TIMEOUT = 300
+
+
+def table_row_estimate(model, using='default'):
+    """Approximate row count of `model`'s table without scanning it"""
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+            row = cursor.fetchone()
+        # -1 until the table is first vacuumed or analyzed
+        if row and row[0] >= 0:
+            return row[0]
+    return cache.get_or_set(
+        f'leads:row_estimate:{using}:{table}',
+        lambda: model._default_manager.using(using).count(),
+        ESTIMATE_CACHE_TIMEOUT,
+    )
+
+
+class EstimatedCountPaginator(Paginator):
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        limit = settings.LEADS_ADMIN_EXACT_COUNT_LIMIT
+        if not queryset.query.has_filters():
+            estimate = table_row_estimate(queryset.model, queryset.db)
+            if estimate > limit:
+                return estimate
+        # LIMIT inside the count stops the scan after limit + 1 rows
+        return queryset.order_by().values('pk')[:limit + 1].count()
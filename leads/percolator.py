@@ -0,0 +1,124 @@
+"""
+Saved searches matched against leads as they are written.
+
+Rather than re-running every saved search over the whole table after an
+import, each `leads_changed` notification scores only the created and
+updated leads, and only against the saved searches sharing a token with
+them: `SavedSearchTerm` is an inverted index from query token to search.
+Matches are stored as `SavedSearchHit` rows, so "what's new for this
+search" is an indexed read of hits found since it was last viewed.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .matching import normalize_text, score_lead
+from .models import Lead, SavedSearch, SavedSearchHit, SavedSearchTerm
+from .signals import leads_changed
+
+# Lead attributes score_lead reads; notes comes from LeadText
+MATCH_FIELDS = ['role', 'company', 'skills', 'notes', 'location']
+MATCH_COLUMNS = ['role', 'company', 'skills', 'location', 'text__notes']
+
+
+def query_tokens(query):
+    return sorted(set(normalize_text(query)))
+
+
+def save_search(query, name=''):
+    """Create a saved search for `query`, or return the one with the same tokens"""
+    tokens = query_tokens(query)
+    if not tokens:
+        raise ValueError("The search has no keywords to match")
+    existing = SavedSearch.objects.filter(tokens=tokens).first()
+    if existing:
+        return existing, False
+    with transaction.atomic():
+        search = SavedSearch.objects.create(name=(name or query)[:200], query=query, tokens=tokens)
+        SavedSearchTerm.objects.bulk_create(
+            [SavedSearchTerm(search=search, term=token[:100]) for token in tokens]
+        )
+    return search, True
+
+
+def lead_tokens(lead):
+    tokens = set()
+    for field in MATCH_FIELDS:
+        tokens.update(normalize_text(getattr(lead, field)))
+    return tokens
+
+
+def percolate(pks):
+    """
+    Match the leads in `pks` against the saved searches sharing a token with
+    them, adding, refreshing or dropping their hits. Returns the number of
+    new hits.
+    """
+    pks = list(pks)
+    if not pks:
+        return 0
+    leads = list(Lead.objects.filter(pk__in=pks).select_related('text').only('pk', *MATCH_COLUMNS))
+    tokens = {lead.pk: lead_tokens(lead) for lead in leads}
+    vocabulary = set().union(*tokens.values()) if tokens else set()
+
+    searches_by_term = defaultdict(set)
+    for term, search_id in SavedSearchTerm.objects.filter(term__in=vocabulary).values_list('term', 'search_id'):
+        searches_by_term[term].add(search_id)
+    query_sets = {
+        search_id: set(search_tokens)
+        for search_id, search_tokens in SavedSearch.objects.filter(
+            pk__in={sid for ids in searches_by_term.values() for sid in ids}
+        ).values_list('pk', 'tokens')
+    }
+
+    matches = {}
+    for lead in leads:
+        candidates = set()
+        for token in tokens[lead.pk]:
+            candidates |= searches_by_term.get(token, set())
+        for search_id in candidates:
+            score, context, _ = score_lead(lead, query_sets[search_id])
+            if score is not None:
+                matches[search_id, lead.pk] = (score, context)
+
+    now = timezone.now()
+    with transaction.atomic():
+        existing = {
+            (hit.search_id, hit.lead_id): hit
+            for hit in SavedSearchHit.objects.select_for_update().filter(lead_id__in=pks)
+        }
+        stale = [hit.pk for key, hit in existing.items() if key not in matches]
+        SavedSearchHit.objects.filter(pk__in=stale).delete()
+
+        to_update = []
+        to_create = []
+        for (search_id, lead_id), (score, context) in matches.items():
+            hit = existing.get((search_id, lead_id))
+            if hit is None:
+                to_create.append(SavedSearchHit(
+                    search_id=search_id, lead_id=lead_id, score=score, match_context=context, found_at=now
+                ))
+            elif hit.score != score or hit.match_context != context:
+                hit.score = score
+                hit.match_context = context
+                to_update.append(hit)
+        SavedSearchHit.objects.bulk_update(to_update, ['score', 'match_context'], batch_size=1000)
+        SavedSearchHit.objects.bulk_create(to_create, batch_size=1000, ignore_conflicts=True)
+    return len(to_create)
+
+
+@receiver(leads_changed)
+def percolate_changed_leads(sender, created, updated, **kwargs):
+    # Hits of deleted leads go with them through the foreign key
+    percolate(list(created) + list(updated))
+
+
+def new_hits(search):
+    """Hits found since the search was last viewed, best first"""
+    return (
+        search.hits.filter(found_at__gt=search.last_viewed_at)
+        .select_related('lead')
+        .order_by('-score', '-found_at')
+    )
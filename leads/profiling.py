@@ -0,0 +1,182 @@
+"""
+Opt-in request profiling and named timing spans.
+
+`span()` times a phase of a view (parse, normalise, score, DB write,
+render...) and logs it as a structured record on the `leads.timing`
+logger. Spans recorded during a request are also summarised in one log
+record and a `Server-Timing` header when the request finishes.
+
+`ProfilingMiddleware` captures a full profile of selected requests:
+those carrying the `X-Profile` header (matching LEADS_PROFILE_TOKEN, or
+any value on a DEBUG server without one) and a random
+LEADS_PROFILE_SAMPLE_RATE share of the rest.
+Profiles are written to LEADS_PROFILE_DIR, as cProfile `.prof` files or,
+with LEADS_PROFILER = 'pyinstrument', as pyinstrument HTML reports.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+import cProfile
+import hmac
+import json
+import logging
+from pathlib import Path
+import random
+import re
+import time
+import uuid
+
+from django.conf import settings
+
+logger = logging.getLogger('leads.timing')
+
+_request_spans = ContextVar('leads_request_spans', default=None)
+
+
+@contextmanager
+def span(name, **fields):
+    """
+    Time the enclosed block and log it as a structured record.
+    Yields a dict; keys added to it (row counts...) are logged with the span.
+    """
+    record = dict(fields)
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        duration_ms = round((time.perf_counter() - start) * 1000, 2)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((name, duration_ms))
+        logger.info(
+            "span %s %.2fms", name, duration_ms,
+            extra={'timing': {'span': name, 'duration_ms': duration_ms, **record}}
+        )
+
+
+class StructuredFormatter(logging.Formatter):
+    """One JSON object per record, merging the `timing` fields passed via `extra`"""
+
+    def format(self, record):
+        payload = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        payload.update(getattr(record, 'timing', {}))
+        return json.dumps(payload, default=str)
+
+
+def has_profile_token(request):
+    """Whether the X-Profile header carries the configured LEADS_PROFILE_TOKEN"""
+    token = settings.LEADS_PROFILE_TOKEN
+    requested = request.headers.get('X-Profile')
+    return bool(token and requested) and hmac.compare_digest(requested, token)
+
+
+def _should_profile(request):
+    if request.headers.get('X-Profile'):
+        if settings.LEADS_PROFILE_TOKEN:
+            if has_profile_token(request):
+                return True
+        # Otherwise any client could slow its requests down and fill the disk with profiles
+        elif settings.DEBUG:
+            return True
+    rate = settings.LEADS_PROFILE_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+class _CProfiler:
+    suffix = 'prof'
+
+    def __init__(self):
+        self._profile = cProfile.Profile()
+
+    def start(self):
+        self._profile.enable()
+
+    def stop(self):
+        self._profile.disable()
+
+    def save(self, path):
+        self._profile.dump_stats(path)
+
+
+class _PyInstrumentProfiler:
+    suffix = 'html'
+
+    def __init__(self):
+        from pyinstrument import Profiler
+        self._profiler = Profiler()
+
+    def start(self):
+        self._profiler.start()
+
+    def stop(self):
+        self._profiler.stop()
+
+    def save(self, path):
+        Path(path).write_text(self._profiler.output_html())
+
+
+def _make_profiler():
+    if settings.LEADS_PROFILER == 'pyinstrument':
+        try:
+            return _PyInstrumentProfiler()
+        except ImportError:
+            logger.warning("pyinstrument is not installed, profiling with cProfile")
+    return _CProfiler()
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        spans = []
+        token = _request_spans.set(spans)
+        profiler = _make_profiler() if _should_profile(request) else None
+        start = time.perf_counter()
+        try:
+            if profiler:
+                profiler.start()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    self._dump(profiler, request)
+            else:
+                response = self.get_response(request)
+        finally:
+            _request_spans.reset(token)
+
+        total_ms = round((time.perf_counter() - start) * 1000, 2)
+        if spans:
+            logger.info(
+                "request %s %s %.2fms", request.method, request.path, total_ms,
+                extra={'timing': {
+                    'request': f'{request.method} {request.path}',
+                    'status': response.status_code,
+                    'duration_ms': total_ms,
+                    'spans': dict(spans),
+                }}
+            )
+            response['Server-Timing'] = ', '.join(
+                f'{name.replace(".", "-")};dur={duration}' for name, duration in spans
+            )
+        return response
+
+    def _dump(self, profiler, request):
+        profiler.stop()
+        directory = Path(settings.LEADS_PROFILE_DIR)
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', request.path).strip('-') or 'root'
+        path = directory / (
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{request.method}-{slug}-{uuid.uuid4().hex[:8]}.{profiler.suffix}"
+        )
+        # A profile that can't be written (read-only filesystem...) must not fail the request
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            profiler.save(path)
+        except Exception:
+            logger.exception("could not write profile to %s", path)
+            return
+        logger.info("profile written to %s", path, extra={'timing': {'profile': str(path)}})
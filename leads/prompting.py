@@ -0,0 +1,148 @@
+"""
+Compact, token-budgeted encoding of leads for the AI prompt.
+
+Leads are sent as a delimited table: one header row of short field codes,
+then one row per lead. Compared with indented JSON this drops the
+whitespace, quotes and repeated keys, so more leads fit in the same
+prompt. The budgeter counts tokens with the model's tokenizer (tiktoken)
+when it is available, and a conservative local estimate otherwise.
+"""
+import logging
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Lead column -> short field code used in the table header
+FIELD_CODES = {
+    'id': 'i',
+    'name': 'n',
+    'role': 'r',
+    'company': 'c',
+    'location': 'l',
+    'skills': 's',
+}
+
+# Token caps per field, so one verbose lead cannot crowd out the others
+FIELD_TOKEN_CAPS = {
+    'name': 12,
+    'role': 16,
+    'company': 12,
+    'location': 10,
+    'skills': 24,
+}
+
+DELIMITER = '|'
+
+TABLE_LEGEND = (
+    "Leads are a '|'-delimited table. The first line is the header; codes: "
+    + ", ".join(f"{code}={field}" for field, code in FIELD_CODES.items())
+    + "."
+)
+
+
+# Seconds before a failed tiktoken load is tried again
+ENCODING_RETRY_SECONDS = 60
+
+_encoding_loaded = None
+_encoding_failed_at = None
+_encoding_lock = threading.Lock()
+
+
+def _encoding():
+    """
+    The model's tiktoken encoding, or None while it can't be loaded. Only
+    a successful load is kept: the BPE file is fetched at runtime, so a
+    failure may be transient and is retried after ENCODING_RETRY_SECONDS.
+    """
+    global _encoding_loaded, _encoding_failed_at
+    if _encoding_loaded is not None:
+        return _encoding_loaded
+    with _encoding_lock:
+        failed_at = _encoding_failed_at
+        if _encoding_loaded is None and (failed_at is None or time.monotonic() - failed_at >= ENCODING_RETRY_SECONDS):
+            try:
+                import tiktoken
+                _encoding_loaded = tiktoken.encoding_for_model('gpt-3.5-turbo')
+            except Exception:
+                # tiktoken missing, or its encoding files cannot be fetched here
+                _encoding_failed_at = time.monotonic()
+                logger.info("tiktoken unavailable, using estimated token counts")
+        return _encoding_loaded
+
+
+# Fallback: words split into pieces of at most four characters, plus
+# punctuation. Slightly overcounts BPE tokens, which keeps the budget safe.
+_ESTIMATE_RE = re.compile(r"[A-Za-z0-9]{1,4}|[^\sA-Za-z0-9]")
+
+
+def count_tokens(text):
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return len(_ESTIMATE_RE.findall(text))
+
+
+def truncate_tokens(text, max_tokens):
+    """Cut text down to at most `max_tokens` tokens"""
+    encoding = _encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text)
+        if len(tokens) <= max_tokens:
+            return text
+        return encoding.decode(tokens[:max_tokens]).rstrip()
+
+    pieces = list(_ESTIMATE_RE.finditer(text))
+    if len(pieces) <= max_tokens:
+        return text
+    return text[:pieces[max_tokens - 1].end()].rstrip()
+
+
+def _clean_cell(value):
+    if value is None:
+        return ''
+    # The delimiter and line breaks would split the row
+    return ' '.join(str(value).replace(DELIMITER, '/').split())
+
+
+def encode_lead_row(values):
+    """Encode one lead, given values in FIELD_CODES order"""
+    cells = []
+    for field, value in zip(FIELD_CODES, values):
+        cell = _clean_cell(value)
+        if field in FIELD_TOKEN_CAPS:
+            cell = truncate_tokens(cell, FIELD_TOKEN_CAPS[field])
+        cells.append(cell)
+    return DELIMITER.join(cells)
+
+
+def pack_leads(leads, token_budget):
+    """
+    Pack as many leads as fit under `token_budget` tokens into one table.
+
+    `leads` is a queryset; rows are streamed in its order and reading
+    stops as soon as the budget is full. Returns a dict with the table
+    text, the number of leads packed, the tokens used and tokens per lead.
+    """
+    header = DELIMITER.join(FIELD_CODES.values())
+    lines = [header]
+    used = count_tokens(header)
+    packed = 0
+
+    for values in leads.values_list(*FIELD_CODES).iterator(chunk_size=500):
+        row = encode_lead_row(values)
+        # +1 for the newline joining rows
+        cost = count_tokens(row) + 1
+        if used + cost > token_budget:
+            break
+        lines.append(row)
+        used += cost
+        packed += 1
+
+    return {
+        'table': '\n'.join(lines),
+        'packed': packed,
+        'tokens': used,
+        'tokens_per_lead': round(used / packed, 1) if packed else 0,
+    }
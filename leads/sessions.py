@@ -0,0 +1,38 @@
+"""
+Session expiry without a write per request.
+
+SESSION_SAVE_EVERY_REQUEST keeps an active session alive by saving it on
+every request, which made the session table a write hotspot. Sessions
+are now saved only when they change, and `SessionRefreshMiddleware`
+re-saves a session in use at most once per LEADS_SESSION_REFRESH_SECONDS
+to push its expiry back.
+"""
+import time
+
+from django.conf import settings
+
+REFRESHED_KEY = '_refreshed_at'
+
+
+class SessionRefreshMiddleware:
+    """Must come after SessionMiddleware, whose response phase does the save"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        session = getattr(request, 'session', None)
+        # Requests without a session cookie have nothing to keep alive
+        if session is None or settings.SESSION_COOKIE_NAME not in request.COOKIES:
+            return response
+        if session.modified:
+            return response
+        refreshed = session.get(REFRESHED_KEY, 0)
+        # An expired or unknown session key loads as empty; don't start a new session for it
+        if session.is_empty():
+            return response
+        now = int(time.time())
+        if now - refreshed >= settings.LEADS_SESSION_REFRESH_SECONDS:
+            session[REFRESHED_KEY] = now
+        return response
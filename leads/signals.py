@@ -0,0 +1,75 @@
+"""
+Lead write notifications.
+
+bulk_create, bulk_update and QuerySet.update/delete skip Django's model
+signals, so every write path in the app sends `leads_changed` itself.
+Single saves (the edit form, the admin) are forwarded from post_save.
+Receivers get `created`, `updated` and `deleted` lists of primary keys,
+and `before`: the SNAPSHOT_FIELDS of each updated or deleted lead as they
+were before the write, so derived counts can be adjusted by delta.
+"""
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from .models import Lead
+
+leads_changed = Signal()
+
+# Lead columns captured in the before-image of updated and deleted leads
+SNAPSHOT_FIELDS = [
+    'role', 'company', 'location', 'industry', 'skills',
+    'canonical_company_id', 'canonical_location_id',
+]
+
+
+def lead_snapshot(lead):
+    """Before-image of a lead instance"""
+    return {field: getattr(lead, field) for field in SNAPSHOT_FIELDS}
+
+
+def lead_snapshots(pks):
+    """Before-images of the leads in `pks` as stored now, keyed by pk"""
+    rows = Lead.objects.filter(pk__in=list(pks)).values('pk', *SNAPSHOT_FIELDS)
+    return {row.pop('pk'): row for row in rows}
+
+
+def notify_leads_changed(created=(), updated=(), deleted=(), before=None):
+    """
+    Tell receivers which leads were written; no-op when nothing changed.
+    Writers that update or delete pass `before`, the lead_snapshots() taken
+    ahead of the write.
+    """
+    if not (created or updated or deleted):
+        return
+    leads_changed.send(
+        sender=Lead,
+        created=list(created),
+        updated=list(updated),
+        deleted=list(deleted),
+        before=before or {},
+    )
+
+
+def _is_score_only(update_fields):
+    # Search re-scoring saves match_score alone on every hit; that is not an edit
+    return update_fields is not None and set(update_fields) <= {'match_score'}
+
+
+@receiver(pre_save, sender=Lead)
+def capture_lead_before_image(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding or instance.pk is None or _is_score_only(update_fields):
+        return
+    instance._before_image = lead_snapshots([instance.pk]).get(instance.pk)
+
+
+@receiver(post_save, sender=Lead)
+def forward_lead_save(sender, instance, created, update_fields=None, **kwargs):
+    if _is_score_only(update_fields):
+        return
+    # Receivers read the notes, which Lead.save() writes after the row
+    instance.save_text()
+    if created:
+        notify_leads_changed(created=[instance.pk])
+        return
+    before = instance.__dict__.pop('_before_image', None)
+    notify_leads_changed(updated=[instance.pk], before={instance.pk: before} if before else None)
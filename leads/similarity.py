@@ -0,0 +1,158 @@
+"""
+"Similar leads" via MinHash signatures and locality-sensitive hashing.
+
+Each lead's normalised role, skills and notes tokens are reduced to a
+MinHash signature of NUM_PERM 32-bit minima; the share of positions two
+signatures agree on estimates the Jaccard similarity of their token sets.
+The signature is cut into LSH_BANDS bands, and each band is hashed to a
+bucket key stored in `LeadBucket`. Leads sharing any bucket are candidate
+neighbours, so finding them is an indexed lookup of LSH_BANDS keys rather
+than a comparison against every lead.
+
+Signatures are refreshed from `leads_changed` (saves, imports, bulk
+edits); bucket rows go with their lead through the foreign key.
+"""
+from collections import Counter
+import hashlib
+import zlib
+
+from django.db import transaction
+from django.dispatch import receiver
+import numpy as np
+
+from .bulk import iter_pk_chunks
+from .matching import normalize_text
+from .models import Lead, LeadBucket, LeadSignature
+from .signals import leads_changed
+
+NUM_PERM = 64
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERM // LSH_BANDS
+
+# Leads compared exactly after the bucket lookup
+MAX_CANDIDATES = 200
+
+# Bucket rows read per band. Leads with a common profile (a bare "Software
+# Engineer") share every bucket, so without a cap a lookup reads them all
+MAX_BUCKET_ROWS = 100
+
+_PRIME = (1 << 31) - 1
+# Fixed seed: signatures must be comparable across processes and restarts
+_rng = np.random.RandomState(20240601)
+_A = _rng.randint(1, _PRIME, size=NUM_PERM, dtype=np.int64)
+_B = _rng.randint(0, _PRIME, size=NUM_PERM, dtype=np.int64)
+
+
+def lead_tokens(role, skills, notes):
+    return set(normalize_text(role)) | set(normalize_text(skills)) | set(normalize_text(notes))
+
+
+def minhash_signature(tokens):
+    """NUM_PERM-long uint32 array of MinHash values, or None for an empty token set"""
+    if not tokens:
+        return None
+    hashes = np.fromiter(
+        (zlib.crc32(token.encode()) & _PRIME for token in tokens), dtype=np.int64, count=len(tokens)
+    )
+    # (a * h + b) mod p stays below 2**62, so int64 never overflows
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+def band_keys(signature):
+    """One signed 63-bit bucket key per band; the band number is part of the key"""
+    keys = []
+    for band in range(LSH_BANDS):
+        chunk = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes()
+        digest = hashlib.blake2b(bytes([band]) + chunk, digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'big', signed=True) >> 1)
+    return keys
+
+
+def estimated_similarity(a, b):
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+def _unpack(data):
+    return np.frombuffer(bytes(data), dtype=np.uint32)
+
+
+def refresh_signatures(pks):
+    """Recompute signatures and bucket rows for `pks`; unchanged signatures are left alone"""
+    pks = list(pks)
+    if not pks:
+        return
+    rows = Lead.objects.filter(pk__in=pks).values_list('pk', 'role', 'skills', 'text__notes')
+    current = dict(LeadSignature.objects.filter(lead_id__in=pks).values_list('lead_id', 'signature'))
+
+    changed = {}
+    for pk, role, skills, notes in rows:
+        signature = minhash_signature(lead_tokens(role, skills, notes))
+        packed = signature.tobytes() if signature is not None else None
+        old = current.get(pk)
+        if (bytes(old) if old is not None else None) != packed:
+            changed[pk] = signature
+
+    if not changed:
+        return
+    with transaction.atomic():
+        LeadBucket.objects.filter(lead_id__in=list(changed)).delete()
+        LeadSignature.objects.filter(lead_id__in=list(changed)).delete()
+        present = {pk: sig for pk, sig in changed.items() if sig is not None}
+        LeadSignature.objects.bulk_create(
+            [LeadSignature(lead_id=pk, signature=sig.tobytes()) for pk, sig in present.items()],
+            batch_size=1000,
+        )
+        LeadBucket.objects.bulk_create(
+            [LeadBucket(lead_id=pk, key=key) for pk, sig in present.items() for key in band_keys(sig)],
+            batch_size=2000,
+        )
+
+
+@receiver(leads_changed)
+def update_signatures(sender, created, updated, **kwargs):
+    # Deleted leads lose their signature and buckets by cascade
+    refresh_signatures(list(created) + list(updated))
+
+
+def rebuild_signatures(chunk_size=1000):
+    """Recompute every signature, one keyset chunk at a time"""
+    total = 0
+    for pks in iter_pk_chunks(Lead.objects.all(), chunk_size):
+        LeadBucket.objects.filter(lead_id__in=pks).delete()
+        LeadSignature.objects.filter(lead_id__in=pks).delete()
+        refresh_signatures(pks)
+        total += len(pks)
+    return total
+
+
+def similar_leads(lead, limit=10):
+    """
+    Up to `limit` leads most similar to `lead`, as (lead, similarity) pairs,
+    best first. Only leads sharing an LSH bucket are compared, and at
+    most MAX_BUCKET_ROWS of them per band.
+    """
+    stored = LeadSignature.objects.filter(lead_id=lead.pk).values_list('signature', flat=True).first()
+    if stored is None:
+        return []
+    signature = _unpack(stored)
+
+    # Leads sharing more bands are likelier to be close; compare those first
+    shared = Counter()
+    for key in band_keys(signature):
+        shared.update(
+            LeadBucket.objects.filter(key=key).exclude(lead_id=lead.pk)
+            .values_list('lead_id', flat=True)[:MAX_BUCKET_ROWS]
+        )
+    candidates = sorted(shared, key=shared.get, reverse=True)[:MAX_CANDIDATES]
+    if not candidates:
+        return []
+
+    scored = [
+        (lead_id, estimated_similarity(signature, _unpack(data)))
+        for lead_id, data in LeadSignature.objects.filter(lead_id__in=candidates).values_list('lead_id', 'signature')
+    ]
+    scored.sort(key=lambda item: item[1], reverse=True)
+    scored = scored[:limit]
+
+    leads = Lead.objects.in_bulk([lead_id for lead_id, _ in scored])
+    return [(leads[lead_id], similarity) for lead_id, similarity in scored if lead_id in leads]
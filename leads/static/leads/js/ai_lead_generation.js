@@ -0,0 +1,4 @@
+function fillPrompt(promptText) {
+    document.querySelector('.prompt-textarea').value = promptText;
+    document.querySelector('.prompt-textarea').focus();
+}
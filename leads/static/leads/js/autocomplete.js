@@ -0,0 +1,161 @@
+/*
+ * Keyword autocomplete for inputs and textareas carrying data-autocomplete-url.
+ *
+ *   data-autocomplete-url        the autocomplete endpoint
+ *   data-autocomplete-fields     optional comma-separated fields (role, skills, company, location)
+ *   data-autocomplete-separator  what separates keywords: "," (default) or " "
+ *
+ * The keyword under the cursor is completed; picking a suggestion replaces it.
+ */
+(function () {
+    'use strict';
+
+    var DEBOUNCE_MS = 80;
+
+    function currentToken(el, separator) {
+        var text = el.value.slice(0, el.selectionStart);
+        var start = Math.max(text.lastIndexOf(separator), text.lastIndexOf('\n')) + 1;
+        return { start: start, end: el.selectionStart, text: text.slice(start).trim() };
+    }
+
+    function attach(el) {
+        var url = el.dataset.autocompleteUrl;
+        var fields = (el.dataset.autocompleteFields || '').split(',').filter(Boolean);
+        var separator = el.dataset.autocompleteSeparator || ',';
+        var cache = new Map();
+        var items = [];
+        var active = -1;
+        var timer = null;
+
+        var menu = document.createElement('div');
+        menu.className = 'list-group shadow-sm autocomplete-menu';
+        menu.style.cssText = 'position:absolute;z-index:1080;display:none;max-height:260px;overflow-y:auto;';
+        document.body.appendChild(menu);
+
+        function hide() {
+            menu.style.display = 'none';
+            items = [];
+            active = -1;
+        }
+
+        function place() {
+            var rect = el.getBoundingClientRect();
+            menu.style.left = (rect.left + window.scrollX) + 'px';
+            menu.style.top = (rect.bottom + window.scrollY) + 'px';
+            menu.style.width = rect.width + 'px';
+        }
+
+        function highlight(index) {
+            active = index;
+            Array.prototype.forEach.call(menu.children, function (child, i) {
+                child.classList.toggle('active', i === active);
+            });
+        }
+
+        function pick(index) {
+            var suggestion = items[index];
+            if (!suggestion) {
+                return;
+            }
+            var token = currentToken(el, separator);
+            var before = el.value.slice(0, token.start);
+            var after = el.value.slice(token.end);
+            var lead = token.start > 0 && separator !== ' ' ? ' ' : '';
+            var insert = lead + suggestion.term + (separator === ' ' ? ' ' : separator + ' ');
+            // Drop the rest of the keyword to the right of the cursor
+            el.value = before + insert + after.replace(separator === ' ' ? /^\S*/ : /^[^,\n]*,?\s*/, '');
+            var caret = (before + insert).length;
+            el.setSelectionRange(caret, caret);
+            hide();
+            el.focus();
+            el.dispatchEvent(new Event('keyup'));
+            el.dispatchEvent(new Event('input'));
+        }
+
+        function render(suggestions) {
+            items = suggestions;
+            menu.innerHTML = '';
+            if (!suggestions.length) {
+                hide();
+                return;
+            }
+            suggestions.forEach(function (suggestion, index) {
+                var option = document.createElement('button');
+                option.type = 'button';
+                option.className = 'list-group-item list-group-item-action d-flex justify-content-between align-items-center py-1';
+                option.innerHTML = '<span></span><small class="text-muted"></small>';
+                option.firstChild.textContent = suggestion.term;
+                option.lastChild.textContent = suggestion.field + ' · ' + suggestion.count;
+                option.addEventListener('mousedown', function (event) {
+                    event.preventDefault();
+                    pick(index);
+                });
+                menu.appendChild(option);
+            });
+            place();
+            menu.style.display = 'block';
+            highlight(-1);
+        }
+
+        function lookup() {
+            var token = currentToken(el, separator).text;
+            if (token.length < 2) {
+                hide();
+                return;
+            }
+            var key = token.toLowerCase();
+            if (cache.has(key)) {
+                render(cache.get(key));
+                return;
+            }
+            var params = new URLSearchParams({ q: token });
+            fields.forEach(function (field) { params.append('field', field); });
+            fetch(url + '?' + params.toString(), { headers: { 'Accept': 'application/json' } })
+                .then(function (response) { return response.ok ? response.json() : { suggestions: [] }; })
+                .then(function (data) {
+                    cache.set(key, data.suggestions);
+                    // Ignore answers for a keyword the user has already moved past
+                    if (currentToken(el, separator).text.toLowerCase() === key) {
+                        render(data.suggestions);
+                    }
+                })
+                .catch(hide);
+        }
+
+        el.setAttribute('autocomplete', 'off');
+        el.addEventListener('input', function (event) {
+            if (!event.isTrusted) {
+                return;
+            }
+            clearTimeout(timer);
+            timer = setTimeout(lookup, DEBOUNCE_MS);
+        });
+        el.addEventListener('keydown', function (event) {
+            if (menu.style.display === 'none') {
+                return;
+            }
+            if (event.key === 'ArrowDown') {
+                event.preventDefault();
+                highlight(Math.min(active + 1, items.length - 1));
+            } else if (event.key === 'ArrowUp') {
+                event.preventDefault();
+                highlight(Math.max(active - 1, 0));
+            } else if ((event.key === 'Enter' || event.key === 'Tab') && active >= 0) {
+                event.preventDefault();
+                pick(active);
+            } else if (event.key === 'Escape') {
+                hide();
+            }
+        });
+        el.addEventListener('blur', function () { setTimeout(hide, 100); });
+        window.addEventListener('resize', function () {
+            if (menu.style.display !== 'none') {
+                place();
+            }
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        document.querySelectorAll('[data-autocomplete-url]').forEach(attach);
+    });
+})();
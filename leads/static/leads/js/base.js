@@ -0,0 +1,63 @@
+// Auto-dismiss alerts after 5 seconds
+document.addEventListener('DOMContentLoaded', function() {
+    const alerts = document.querySelectorAll('.alert');
+    alerts.forEach(function(alert) {
+        setTimeout(function() {
+            const bsAlert = new bootstrap.Alert(alert);
+            bsAlert.close();
+        }, 5000);
+    });
+});
+
+// Scroll to top button
+const scrollTopBtn = document.getElementById('scrollTop');
+
+window.addEventListener('scroll', function() {
+    if (window.pageYOffset > 300) {
+        scrollTopBtn.classList.add('active');
+    } else {
+        scrollTopBtn.classList.remove('active');
+    }
+});
+
+scrollTopBtn.addEventListener('click', function() {
+    window.scrollTo({
+        top: 0,
+        behavior: 'smooth'
+    });
+});
+
+// Show loading spinner on form submissions
+document.addEventListener('submit', function(e) {
+    // Only show spinner for specific forms (you can customize this)
+    if (e.target.classList.contains('show-spinner') || 
+        e.target.querySelector('[type="submit"]')?.classList.contains('show-spinner')) {
+        document.getElementById('loadingSpinner').classList.add('active');
+    }
+});
+
+// Form validation feedback
+(function () {
+    'use strict'
+    const forms = document.querySelectorAll('.needs-validation')
+    Array.from(forms).forEach(function (form) {
+        form.addEventListener('submit', function (event) {
+            if (!form.checkValidity()) {
+                event.preventDefault()
+                event.stopPropagation()
+            }
+            form.classList.add('was-validated')
+        }, false)
+    })
+})();
+
+// Confirm delete actions
+document.addEventListener('click', function(e) {
+    if (e.target.classList.contains('confirm-delete') || 
+        e.target.closest('.confirm-delete')) {
+        if (!confirm('Are you sure you want to delete this? This action cannot be undone.')) {
+            e.preventDefault();
+            return false;
+        }
+    }
+});
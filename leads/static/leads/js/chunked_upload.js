@@ -0,0 +1,157 @@
+/*
+ * Chunked, resumable upload for forms carrying data-chunked-upload-url.
+ *
+ * The selected file is sent in chunks, each with its offset and SHA-256,
+ * and then finished, which imports it. A failed chunk is retried; the
+ * upload ID is remembered per file, so choosing the same file again after
+ * a reload resumes from the last offset the server acknowledged, or
+ * retries the import if that is what failed.
+ * Browsers without fetch or crypto.subtle (plain HTTP) submit the form
+ * as before.
+ */
+(function () {
+    'use strict';
+
+    var MAX_ATTEMPTS = 5;
+    var STORAGE_PREFIX = 'leads-chunked-upload:';
+
+    function csrfToken(form) {
+        var input = form.querySelector('input[name="csrfmiddlewaretoken"]');
+        return input ? input.value : '';
+    }
+
+    function storageKey(file) {
+        return STORAGE_PREFIX + [file.name, file.size, file.lastModified].join(':');
+    }
+
+    function hex(buffer) {
+        return Array.prototype.map.call(new Uint8Array(buffer), function (b) {
+            return ('0' + b.toString(16)).slice(-2);
+        }).join('');
+    }
+
+    function sleep(ms) {
+        return new Promise(function (resolve) { setTimeout(resolve, ms); });
+    }
+
+    function request(url, options) {
+        return fetch(url, Object.assign({ credentials: 'same-origin' }, options)).then(function (response) {
+            return response.json().catch(function () { return {}; }).then(function (body) {
+                body.status = response.status;
+                return body;
+            });
+        });
+    }
+
+    function resumeOrStart(form, file) {
+        var token = csrfToken(form);
+        var saved = null;
+        try { saved = JSON.parse(localStorage.getItem(storageKey(file))); } catch (e) { /* start over */ }
+        var resumed = saved ? request(saved.url, { headers: { 'X-CSRFToken': token } }) : Promise.resolve(null);
+        return resumed.then(function (state) {
+            if (state && state.success && !state.complete) {
+                return state;
+            }
+            var data = new FormData();
+            data.append('filename', file.name);
+            data.append('size', file.size);
+            return request(form.dataset.chunkedUploadUrl, {
+                method: 'POST', headers: { 'X-CSRFToken': token }, body: data
+            }).then(function (created) {
+                if (!created.success) {
+                    throw new Error(created.error || 'Could not start the upload');
+                }
+                localStorage.setItem(storageKey(file), JSON.stringify({ url: created.url }));
+                return created;
+            });
+        });
+    }
+
+    function sendChunk(form, file, state, attempt) {
+        var end = Math.min(state.offset + state.chunk_size, file.size);
+        var blob = file.slice(state.offset, end);
+        return blob.arrayBuffer().then(function (buffer) {
+            return crypto.subtle.digest('SHA-256', buffer).then(function (digest) {
+                return request(state.url, {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/octet-stream',
+                        'X-CSRFToken': csrfToken(form),
+                        'X-Upload-Offset': String(state.offset),
+                        'X-Chunk-SHA256': hex(digest)
+                    },
+                    body: buffer
+                });
+            });
+        }).then(function (result) {
+            if (result.success) {
+                return result;
+            }
+            // Out of step with the server (e.g. the previous ack was lost): carry on from its offset
+            if (result.status === 409 && typeof result.offset === 'number') {
+                return Object.assign({}, state, { offset: result.offset });
+            }
+            throw new Error(result.error || 'Chunk rejected');
+        }).catch(function (error) {
+            if (attempt + 1 >= MAX_ATTEMPTS) {
+                throw error;
+            }
+            return sleep(1000 * Math.pow(2, attempt)).then(function () {
+                return sendChunk(form, file, state, attempt + 1);
+            });
+        });
+    }
+
+    function upload(form, file, progress) {
+        return resumeOrStart(form, file).then(function loop(state) {
+            progress(state.offset / file.size);
+            if (state.offset < file.size) {
+                return sendChunk(form, file, state, 0).then(function (next) {
+                    return loop(Object.assign({}, state, next));
+                });
+            }
+            return request(state.finish_url, {
+                method: 'POST', headers: { 'X-CSRFToken': csrfToken(form) }
+            }).then(function (result) {
+                // A failed import keeps the received file; submitting again finishes it without resending
+                if (result.status >= 500) {
+                    throw new Error(result.error || 'The import failed');
+                }
+                localStorage.removeItem(storageKey(file));
+                return result;
+            });
+        });
+    }
+
+    function attach(form) {
+        var input = form.querySelector('input[type="file"]');
+        var button = form.querySelector('[type="submit"]');
+        var label = button.innerHTML;
+
+        form.addEventListener('submit', function (event) {
+            var file = input.files[0];
+            if (!file) {
+                return;
+            }
+            event.preventDefault();
+            button.disabled = true;
+            upload(form, file, function (fraction) {
+                button.textContent = 'Uploading… ' + Math.floor(fraction * 100) + '%';
+            }).then(function () {
+                // The import's outcome is shown as a message on the reloaded page
+                window.location.href = form.dataset.chunkedUploadDone || window.location.href;
+            }).catch(function (error) {
+                button.disabled = false;
+                button.innerHTML = label;
+                alert(error.message + '. Submit again to resume.');
+            });
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        if (!window.fetch || !window.crypto || !crypto.subtle || !Blob.prototype.arrayBuffer) {
+            return;
+        }
+        document.querySelectorAll('form[data-chunked-upload-url]').forEach(attach);
+    });
+})();
@@ -0,0 +1,146 @@
+let selectedData = {
+    relationType: '',
+    industries: [],
+    roles: [],
+    locations: [],
+    requirements: [],
+    serviceProduct: '',
+    customLocation: '',
+    customRequirements: ''
+};
+
+function selectRelationType(type) {
+    selectedData.relationType = type;
+
+    // Update UI
+    document.querySelectorAll('.relationship-type').forEach(el => {
+        el.classList.remove('active');
+    });
+    document.querySelector(`[data-type="${type}"]`).classList.add('active');
+
+    updateSelection();
+}
+
+function updateSelection() {
+    // Get industries
+    selectedData.industries = [];
+    document.querySelectorAll('#tech, #finance, #healthcare, #manufacturing, #retail, #consulting, #realestate, #education, #energy, #telecom, #media, #automotive').forEach(cb => {
+        if (cb.checked) selectedData.industries.push(cb.value);
+    });
+
+    // Get roles
+    selectedData.roles = [];
+    document.querySelectorAll('#ceo, #cto, #vp, #manager, #head, #procurement').forEach(cb => {
+        if (cb.checked) selectedData.roles.push(cb.value);
+    });
+
+    // Get locations
+    selectedData.locations = [];
+    document.querySelectorAll('#northamerica, #europe, #asia, #india, #uk, #usa').forEach(cb => {
+        if (cb.checked) selectedData.locations.push(cb.value);
+    });
+
+    // Get requirements
+    selectedData.requirements = [];
+    document.querySelectorAll('#enterprise, #startup, #b2b, #b2c, #experience, #compliance').forEach(cb => {
+        if (cb.checked) selectedData.requirements.push(cb.value);
+    });
+
+    // Get custom inputs
+    selectedData.serviceProduct = document.getElementById('serviceProduct').value;
+    selectedData.customLocation = document.getElementById('customLocation').value;
+    selectedData.customRequirements = document.getElementById('customRequirements').value;
+}
+
+function generatePrompt() {
+    updateSelection();
+
+    if (!selectedData.relationType) {
+        alert('Please select whether you are looking for a supplier or consumer');
+        return;
+    }
+
+    if (selectedData.industries.length === 0) {
+        alert('Please select at least one industry');
+        return;
+    }
+
+    let prompt = '';
+
+    // Build the prompt based on relationship type
+    if (selectedData.relationType === 'supplier') {
+        prompt = "I'm looking for suppliers/vendors who can provide ";
+    } else {
+        prompt = "I'm looking for potential clients/consumers who would be interested in purchasing ";
+    }
+
+    // Add service/product
+    if (selectedData.serviceProduct) {
+        prompt += selectedData.serviceProduct;
+    } else {
+        prompt += "products or services";
+    }
+
+    // Add industry context
+    if (selectedData.industries.length > 0) {
+        prompt += " in the " + selectedData.industries.join(', ') + " sector";
+        if (selectedData.industries.length > 1) {
+            prompt = prompt.replace(/, ([^,]*)$/, ' and $1');
+        }
+    }
+
+    prompt += ". ";
+
+    // Add role/decision maker
+    if (selectedData.roles.length > 0) {
+        prompt += "Specifically looking for " + selectedData.roles.join(', ');
+        if (selectedData.roles.length > 1) {
+            prompt = prompt.replace(/, ([^,]*)$/, ' or $1');
+        }
+        prompt += " level contacts. ";
+    }
+
+    // Add location
+    let allLocations = [...selectedData.locations];
+    if (selectedData.customLocation) {
+        allLocations.push(selectedData.customLocation);
+    }
+    if (allLocations.length > 0) {
+        prompt += "Preferably based in " + allLocations.join(', ');
+        if (allLocations.length > 1) {
+            prompt = prompt.replace(/, ([^,]*)$/, ' or $1');
+        }
+        prompt += ". ";
+    }
+
+    // Add requirements
+    let allRequirements = [...selectedData.requirements];
+    if (selectedData.customRequirements) {
+        allRequirements.push(selectedData.customRequirements);
+    }
+    if (allRequirements.length > 0) {
+        prompt += "Additional requirements: " + allRequirements.join(', ') + ".";
+    }
+
+    // Display the prompt
+    document.getElementById('generatedPrompt').textContent = prompt;
+    document.getElementById('promptBox').style.display = 'block';
+
+    // Scroll to prompt
+    document.getElementById('promptBox').scrollIntoView({ behavior: 'smooth', block: 'nearest' });
+}
+
+function copyPrompt() {
+    const promptText = document.getElementById('generatedPrompt').textContent;
+    navigator.clipboard.writeText(promptText).then(() => {
+        alert('Prompt copied to clipboard!');
+    });
+}
+
+function usePrompt() {
+    const promptText = document.getElementById('generatedPrompt').textContent;
+    // Post the prompt to the AI lead generation page
+    const form = document.getElementById('usePromptForm');
+    form.elements.prompt.value = promptText;
+    form.submit();
+}
@@ -0,0 +1,18 @@
+"""
+Static files storage: content-hashed names.
+
+`collectstatic` writes each file under a name carrying its content hash,
+so `/static/` can be cached as immutable (see vercel.json). Compression
+is left to the front server, which negotiates Accept-Encoding per request.
+"""
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+
+class HashedStaticFilesStorage(ManifestStaticFilesStorage):
+    manifest_strict = False
+
+    def stored_name(self, name):
+        # Without a collected manifest (tests, a fresh checkout) serve the plain name
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
@@ -1,3 +1,1298 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+from io import BytesIO, StringIO
+import os
+import tempfile
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.admin.sites import site
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+import httpx
+import openai
+from openai import OpenAI
+import pandas as pd
+
+from . import autocomplete, prompting, storage
+from .admin import indexed_search_filter
+from .ai_client import AIClient, BudgetExhausted, CircuitBreaker, CircuitOpen, TokenBucket
+from .bulk import chunked_delete, chunked_update
+from .conversations import append_message, conversation
+from .cooccurrence import rebuild_cooccurrence
+from .dimensions import rebuild_dimension_counts
+from .facets import rebuild_facets
+from .fake_openai import FakeOpenAIServer
+from .ingest import import_upload, rollback_upload, upsert_leads
+from .loadtest import EndpointStats, LoadTest, percentile, upload_email_prefix, upload_filename
+from .management.commands.loadtest import Command as LoadTestCommand, parse_mix
+from .models import ChatMessage, Company, Lead, LeadFacet, LeadText, Location, TermCount, TermPair, UploadHistory
+from .matching import score_lead
+from .pagination import EstimatedCountPaginator
+from .percolator import new_hits, save_search
+from .prompting import count_tokens, pack_leads
+from .signals import leads_changed
+from .similarity import LSH_BANDS, rebuild_signatures, similar_leads
+
+
+class QueryPlanTests(TestCase):
+    """
+    Capture EXPLAIN output for the queries the views actually run and
+    assert they are answered from an index, without a full sort or scan.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        companies = ['Infosys', 'TCS', 'Wipro', 'Accenture', 'Deloitte']
+        Lead.objects.bulk_create([
+            Lead(
+                name=f'Lead {i}',
+                email=f'lead{i}@example.com',
+                role='Data Engineer' if i % 3 else 'Product Manager',
+                company=companies[i % len(companies)],
+                location='Hyderabad',
+                match_score=i % 101,
+            )
+            for i in range(2000)
+        ])
+        UploadHistory.objects.bulk_create([
+            UploadHistory(filename=f'batch{i}.xlsx') for i in range(50)
+        ])
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            if connection.vendor == 'postgresql':
+                # Seeded tables are small enough that a seq scan would win on cost
+                cursor.execute('SET enable_seqscan = off')
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+        if connection.vendor == 'sqlite':
+            self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
+            self.assertNotRegex(plan, r'SCAN leads_lead(?! USING)')
+        elif connection.vendor == 'postgresql':
+            self.assertNotIn('Seq Scan', plan)
+            self.assertNotRegex(plan, r'(?m)^\s*(->\s*)?Sort\b')
+
+    def test_default_ordering_uses_score_index(self):
+        # home, all_leads, export_leads and the AI prompt slice
+        self.assertUsesIndex(Lead.objects.all()[:150], 'lead_score_created_idx')
+
+    def test_admin_ordering_uses_created_index(self):
+        ordering = site._registry[Lead].ordering
+        self.assertUsesIndex(Lead.objects.order_by(*ordering)[:100], 'lead_created_idx')
+
+    def test_admin_company_filter_uses_company_index(self):
+        self.assertUsesIndex(
+            Lead.objects.filter(company='Infosys').order_by(), 'lead_company_idx'
+        )
+
+    def test_admin_search_uses_indexes(self):
+        plan_queryset = Lead.objects.filter(indexed_search_filter('lead 1')).order_by()
+        self.assertUsesIndex(plan_queryset, 'lead_name_idx')
+
+    def test_admin_count_is_capped(self):
+        queryset = Lead.objects.filter(role='Data Engineer')
+        with self.settings(LEADS_ADMIN_EXACT_COUNT_LIMIT=100):
+            self.assertEqual(EstimatedCountPaginator(queryset, 100).count, 101)
+        self.assertEqual(EstimatedCountPaginator(queryset, 100).count, queryset.count())
+
+    def test_newest_update_uses_updated_index(self):
+        # Same access path as the Max('updated_at') behind the list Last-Modified
+        self.assertUsesIndex(
+            Lead.objects.order_by('-updated_at').values('updated_at')[:1], 'lead_updated_idx'
+        )
+
+    def test_upload_history_ordering_uses_uploaded_index(self):
+        self.assertUsesIndex(UploadHistory.objects.all()[:20], 'upload_uploaded_idx')
+
+
+class FakeOpenAIMixin:
+    latency = 0.0
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.fake = FakeOpenAIServer(latency=cls.latency).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fake.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        self.fake.reset()
+        self.fake.latency = self.latency
+
+    def make_client(self, requests_per_minute=6000, tokens_per_minute=10**7, **kwargs):
+        openai = OpenAI(api_key='test', base_url=self.fake.base_url, max_retries=0)
+        return AIClient(openai, requests_per_minute, tokens_per_minute, **kwargs)
+
+
+def completion_kwargs(prompt):
+    return {
+        'model': 'gpt-3.5-turbo',
+        'messages': [{'role': 'user', 'content': prompt}],
+        'max_tokens': 50,
+    }
+
+
+class AIClientCoalescingTests(FakeOpenAIMixin, SimpleTestCase):
+    latency = 0.3
+
+    def test_concurrent_identical_requests_share_one_call(self):
+        client = self.make_client()
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            responses = list(pool.map(
+                lambda _: client.chat_completion(**completion_kwargs('same prompt')), range(8)
+            ))
+
+        self.assertEqual(self.fake.request_count, 1)
+        self.assertEqual(len({r.choices[0].message.content for r in responses}), 1)
+        self.assertEqual(client.stats()['coalesced'], 7)
+        self.assertEqual(client.stats()['in_flight'], 0)
+
+    def test_different_requests_are_not_coalesced(self):
+        client = self.make_client()
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            list(pool.map(
+                lambda i: client.chat_completion(**completion_kwargs(f'prompt {i}')), range(3)
+            ))
+
+        self.assertEqual(self.fake.request_count, 3)
+        self.assertEqual(client.stats()['coalesced'], 0)
+
+
+class AIClientRateLimitTests(FakeOpenAIMixin, SimpleTestCase):
+
+    def test_requests_over_the_limit_queue_instead_of_failing(self):
+        client = self.make_client()
+        # Burst of 5, then one request every 50ms: the last of 15 waits ~0.5s
+        client.request_bucket = TokenBucket(rate=20, capacity=5)
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=15) as pool:
+            list(pool.map(
+                lambda i: client.chat_completion(**completion_kwargs(f'prompt {i}')), range(15)
+            ))
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(self.fake.request_count, 15)
+        self.assertGreaterEqual(elapsed, 0.4)
+        stats = client.stats()['requests']
+        self.assertEqual(stats['acquired'], 15)
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertGreaterEqual(stats['max_queue_depth'], 1)
+        self.assertGreater(stats['max_wait'], 0)
+
+    def test_token_bucket_waits_for_refill(self):
+        bucket = TokenBucket(rate=100, capacity=10)
+        self.assertEqual(bucket.acquire(10), 0)
+        self.assertAlmostEqual(bucket.acquire(5), 0.05, delta=0.01)
+        self.assertEqual(bucket.stats()['acquired'], 2)
+
+
+class AIClientResilienceTests(FakeOpenAIMixin, SimpleTestCase):
+
+    def test_transient_failures_are_retried(self):
+        client = self.make_client(max_retries=2, backoff_base=0.01)
+        self.fake.fail_next(2, status=503)
+
+        response = client.chat_completion(**completion_kwargs('retry me'))
+
+        self.assertTrue(response.choices[0].message.content)
+        self.assertEqual(self.fake.request_count, 3)
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_consecutive_failures_open_the_circuit(self):
+        client = self.make_client(max_retries=0, failure_threshold=3, reset_timeout=60)
+        self.fake.fail_next(3, status=500)
+        for _ in range(3):
+            with self.assertRaises(Exception):
+                client.chat_completion(**completion_kwargs('down'))
+
+        self.assertEqual(client.breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpen):
+            client.chat_completion(**completion_kwargs('down'))
+        # The open circuit answered without calling upstream
+        self.assertEqual(self.fake.request_count, 3)
+
+    def test_slow_calls_count_as_failures(self):
+        self.fake.latency = 0.05
+        client = self.make_client(failure_threshold=2, slow_call_seconds=0.01)
+        for i in range(2):
+            client.chat_completion(**completion_kwargs(f'slow {i}'))
+
+        self.assertEqual(client.breaker.state, CircuitBreaker.OPEN)
+
+    def test_half_open_trial_closes_the_circuit(self):
+        client = self.make_client(max_retries=0, failure_threshold=1, reset_timeout=0.05)
+        self.fake.fail_next(1)
+        with self.assertRaises(Exception):
+            client.chat_completion(**completion_kwargs('down'))
+        time.sleep(0.06)
+
+        client.chat_completion(**completion_kwargs('back up'))
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+    def open_then_wait(self, client):
+        self.fake.fail_next(1)
+        with self.assertRaises(Exception):
+            client.chat_completion(**completion_kwargs('down'))
+        time.sleep(0.06)
+        self.assertEqual(client.breaker.state, CircuitBreaker.HALF_OPEN)
+
+    def test_budget_running_out_while_half_open_frees_the_trial(self):
+        client = self.make_client(max_retries=0, failure_threshold=1, reset_timeout=0.05)
+        self.open_then_wait(client)
+        client.latency_budget = 0.05
+
+        class QueueingBucket(TokenBucket):
+            # The queue wait takes up the whole latency budget
+            def acquire(self, amount=1, max_wait=None):
+                time.sleep(max(max_wait, 0))
+                return max_wait
+
+        bucket, client.token_bucket = client.token_bucket, QueueingBucket(1, 1)
+        with self.assertRaises(BudgetExhausted):
+            client.chat_completion(**completion_kwargs('queued'))
+        client.token_bucket = bucket
+        client.latency_budget = 25.0
+
+        client.chat_completion(**completion_kwargs('back up'))
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_non_retryable_error_does_not_close_a_half_open_circuit(self):
+        client = self.make_client(max_retries=0, failure_threshold=1, reset_timeout=0.05)
+        self.open_then_wait(client)
+        self.fake.fail_next(1, status=401)
+        with self.assertRaises(openai.AuthenticationError):
+            client.chat_completion(**completion_kwargs('bad key'))
+
+        self.assertEqual(client.breaker.state, CircuitBreaker.HALF_OPEN)
+        client.chat_completion(**completion_kwargs('back up'))
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+
+class AILeadGenerationViewTests(FakeOpenAIMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Lead.objects.bulk_create([
+            Lead(name=f'Lead {i}', email=f'lead{i}@example.com', role='Data Engineer', company='Infosys')
+            for i in range(20)
+        ])
+
+    def test_prompt_is_answered_through_the_fake_server(self):
+        with override_settings(OPENAI_API_KEY='test', OPENAI_BASE_URL=self.fake.base_url):
+            response = self.client.post(reverse('ai_lead_generation'), {'prompt': 'data engineers'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'leads/ai_lead_results.html')
+        self.assertEqual(len(response.context['leads']), self.fake.matches)
+        self.assertEqual(response.context['analyzed_leads'], 20)
+        self.assertEqual(self.fake.request_count, 1)
+
+    def test_open_circuit_falls_back_to_keyword_matching(self):
+        self.fake.fail_next(10)
+        with override_settings(
+            OPENAI_API_KEY='test', OPENAI_BASE_URL=self.fake.base_url,
+            LEADS_OPENAI_MAX_RETRIES=0, LEADS_OPENAI_BREAKER_FAILURES=1,
+        ):
+            first = self.client.post(reverse('ai_lead_generation'), {'prompt': 'data engineers'})
+            second = self.client.post(reverse('ai_lead_generation'), {'prompt': 'data engineers'})
+
+        for response in (first, second):
+            self.assertTemplateUsed(response, 'leads/ai_lead_results.html')
+            self.assertTrue(response.context['degraded'])
+            self.assertEqual(len(response.context['leads']), 20)
+        # The second request never reached the upstream
+        self.assertEqual(self.fake.request_count, 1)
+
+
+class ChunkedUploadTests(TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = override_settings(LEADS_CHUNKED_UPLOAD_DIR=tmp.name, LEADS_CHUNKED_UPLOAD_CHUNK_SIZE=1024)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        workbook = BytesIO()
+        pd.DataFrame({
+            'Name': [f'Lead {i}' for i in range(200)],
+            'Email': [f'lead{i}@example.com' for i in range(200)],
+            'Company': ['Infosys'] * 200,
+        }).to_excel(workbook, index=False)
+        self.content = workbook.getvalue()
+
+    def send(self, state, offset, chunk, checksum=None):
+        return self.client.post(
+            state['url'], chunk, content_type='application/octet-stream',
+            headers={
+                'X-Upload-Offset': str(offset),
+                'X-Chunk-SHA256': checksum or hashlib.sha256(chunk).hexdigest(),
+            },
+        )
+
+    def test_chunks_are_verified_and_resumed_from_the_acknowledged_offset(self):
+        state = self.client.post(reverse('start_chunked_upload'), {
+            'filename': 'leads.xlsx', 'size': len(self.content),
+            'sha256': hashlib.sha256(self.content).hexdigest(),
+        }).json()
+
+        first = self.content[:1024]
+        self.assertEqual(self.send(state, 0, first).json()['offset'], 1024)
+        # A corrupted chunk is dropped; a resent one is told where to resume
+        corrupted = self.send(state, 1024, self.content[1024:2048], checksum='0' * 64)
+        self.assertEqual((corrupted.status_code, corrupted.json()['offset']), (400, 1024))
+        duplicate = self.send(state, 0, first)
+        self.assertEqual((duplicate.status_code, duplicate.json()['offset']), (409, 1024))
+        early = self.client.post(state['finish_url'])
+        self.assertEqual(early.status_code, 409)
+
+        offset = self.client.get(state['url']).json()['offset']
+        while offset < len(self.content):
+            offset = self.send(state, offset, self.content[offset:offset + 1024]).json()['offset']
+
+        result = self.client.post(state['finish_url']).json()
+        self.assertEqual(result['imported'], 200)
+        self.assertEqual(Lead.objects.filter(import_batch_id=result['upload']).count(), 200)
+        self.assertEqual(os.listdir(settings.LEADS_CHUNKED_UPLOAD_DIR), [])
+        self.assertEqual(self.client.post(state['finish_url']).status_code, 409)
+
+    def test_failed_import_can_be_finished_again(self):
+        state = self.client.post(reverse('start_chunked_upload'), {
+            'filename': 'leads.xlsx', 'size': len(self.content),
+        }).json()
+        for offset in range(0, len(self.content), 1024):
+            self.send(state, offset, self.content[offset:offset + 1024])
+
+        with mock.patch('leads.chunked_uploads.import_upload', side_effect=OperationalError('database is locked')):
+            failed = self.client.post(state['finish_url'])
+        self.assertEqual(failed.status_code, 500)
+        status = self.client.get(state['url']).json()
+        self.assertEqual((status['complete'], status['offset']), (False, len(self.content)))
+        self.assertEqual(Lead.objects.count(), 0)
+
+        result = self.client.post(state['finish_url']).json()
+        self.assertEqual(result['imported'], 200)
+        self.assertEqual(os.listdir(settings.LEADS_CHUNKED_UPLOAD_DIR), [])
+
+    def test_file_failing_its_checksum_is_received_again(self):
+        state = self.client.post(reverse('start_chunked_upload'), {
+            'filename': 'leads.xlsx', 'size': len(self.content), 'sha256': '0' * 64,
+        }).json()
+        for offset in range(0, len(self.content), 1024):
+            self.send(state, offset, self.content[offset:offset + 1024])
+
+        self.assertEqual(self.client.post(state['finish_url']).status_code, 409)
+        status = self.client.get(state['url']).json()
+        self.assertEqual((status['complete'], status['offset']), (False, 0))
+
+
+class LeadTextTests(TestCase):
+
+    def test_notes_round_trip_through_the_side_table(self):
+        about = 'Data engineer building streaming pipelines with Spark and Kafka. ' * 20
+        lead = Lead.objects.create(name='Asha', email='asha@example.com', notes=about)
+
+        # Not a column of the lead row, and compressed in LeadText
+        self.assertNotIn('notes', [field.column for field in Lead._meta.concrete_fields])
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT notes FROM leads_leadtext WHERE lead_id = %s', [lead.pk])
+            self.assertLess(len(cursor.fetchone()[0]), len(about) // 4)
+
+        self.assertEqual(Lead.objects.get(pk=lead.pk).notes, about)
+        with self.assertNumQueries(1):
+            self.assertEqual(Lead.objects.select_related('text').get(pk=lead.pk).notes, about)
+
+        lead.notes = ''
+        lead.save()
+        self.assertFalse(LeadText.objects.filter(lead=lead).exists())
+
+
+class KeywordSuggestionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Lead.objects.bulk_create([
+            Lead(name=f'Py {i}', email=f'py{i}@example.com', role='Backend Engineer', skills='Python, Django')
+            for i in range(5)
+        ] + [
+            Lead(name=f'Fe {i}', email=f'fe{i}@example.com', role='Frontend Engineer', skills='React')
+            for i in range(5)
+        ])
+        rebuild_cooccurrence()
+
+    def test_search_suggests_related_terms_and_spellings_from_the_index(self):
+        response = self.client.post(reverse('search_leads'), {'skills': 'python engineers'})
+
+        stats = response.context['keyword_stats']
+        # Backend and Django appear exactly where Python does; Engineer is everywhere
+        self.assertEqual(stats['partial'], [{'word': 'backend', 'count': 5}, {'word': 'django', 'count': 5}])
+        self.assertEqual(stats['missing'], [{'word': 'engineers', 'hints': ['engineer']}])
+
+    def test_index_follows_lead_writes(self):
+        Lead.objects.create(name='New', email='new@example.com', role='Data Engineer', skills='Python')
+        chunked_delete(Lead.objects.filter(email='py0@example.com'))
+
+        self.assertEqual(TermCount.objects.get(term='python').lead_count, 5)
+        self.assertEqual(TermPair.objects.get(first='django', second='python').lead_count, 4)
+
+
+class SessionWriteTests(TestCase):
+
+    def setUp(self):
+        self.lead = Lead.objects.create(name='Ravi', email='ravi@example.com')
+        session = self.client.session
+        session['seen'] = True
+        session.save()
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+
+    def test_unchanged_session_is_only_refreshed_periodically(self):
+        self.client.get(reverse('home'))
+        session_key = self.client.session.session_key
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('home'))
+        writes = [q['sql'] for q in queries if 'django_session' in q['sql'] and not q['sql'].startswith('SELECT')]
+        self.assertEqual(writes, [])
+        self.assertEqual(self.client.session.session_key, session_key)
+
+    def test_chat_history_is_stored_per_session_and_lead(self):
+        request = self.client.get(reverse('home')).wsgi_request
+        append_message(request, self.lead.pk, ChatMessage.USER, 'Is Ravi open to work?')
+        ChatMessage.objects.create(session_key='other', lead=self.lead, role=ChatMessage.USER, content='Hi')
+        self.assertEqual([m.content for m in conversation(request, self.lead.pk)], ['Is Ravi open to work?'])
+
+        response = self.client.get(reverse('clear_chat_history', args=[self.lead.pk]))
+        self.assertRedirects(response, reverse('lead_detail', args=[self.lead.pk]), fetch_redirect_response=False)
+        self.assertEqual(list(ChatMessage.objects.values_list('session_key', flat=True)), ['other'])
+
+
+class UploadBatchSelectionTests(TestCase):
+
+    def test_bulk_delete_by_upload_uses_lineage_only(self):
+        upload = UploadHistory.objects.create(filename='batch.xlsx')
+        upsert_leads([
+            {'name': f'Lead {i}', 'email': f'lead{i}@example.com'} for i in range(3)
+        ], upload=upload)
+        # Edited by hand in the same window; not part of the batch
+        Lead.objects.create(name='Manual', email='manual@example.com')
+
+        response = self.client.post(reverse('bulk_delete_leads'), {'upload': upload.pk})
+
+        self.assertRedirects(response, reverse('all_leads'), fetch_redirect_response=False)
+        self.assertEqual(list(Lead.objects.values_list('email', flat=True)), ['manual@example.com'])
+
+    def test_upload_without_lineage_is_refused(self):
+        Lead.objects.create(name='Manual', email='manual@example.com')
+        legacy = UploadHistory.objects.create(filename='legacy.xlsx', has_lineage=False)
+
+        response = self.client.post(
+            reverse('bulk_delete_leads'), {'upload': legacy.pk}, headers={'X-Requested-With': 'XMLHttpRequest'}
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('upload', response.json()['errors'])
+        self.assertEqual(Lead.objects.count(), 1)
+
+    def test_upload_that_changed_nothing_selects_nothing(self):
+        Lead.objects.create(name='Manual', email='manual@example.com')
+        upload = UploadHistory.objects.create(filename='unchanged.xlsx')
+
+        self.client.post(reverse('bulk_delete_leads'), {'upload': upload.pk})
+
+        self.assertEqual(Lead.objects.count(), 1)
+
+
+class ChunkedBulkOperationTests(TestCase):
+
+    def setUp(self):
+        upsert_leads([
+            {'name': f'Lead {i}', 'email': f'lead{i}@example.com', 'role': 'Data Engineer',
+             'company': 'Acme' if i < 5 else 'Initech', 'location': 'Pune', 'notes': f'Note {i}'}
+            for i in range(7)
+        ])
+        self.notifications = []
+        handler = lambda sender, **kwargs: self.notifications.append(kwargs)
+        leads_changed.connect(handler)
+        self.addCleanup(leads_changed.disconnect, handler)
+
+    def company_counts(self):
+        return (
+            dict(LeadFacet.objects.filter(facet='company', count__gt=0).values_list('value', 'count')),
+            dict(Company.objects.filter(lead_count__gt=0).values_list('name', 'lead_count')),
+        )
+
+    def test_chunked_delete_by_filter(self):
+        progress = []
+        result = chunked_delete(Lead.objects.filter(company='Acme'), chunk_size=2,
+                                progress=lambda done, total: progress.append((done, total)))
+
+        self.assertEqual(result, {'matched': 5, 'processed': 5, 'chunks': 3})
+        self.assertEqual(progress, [(2, 5), (4, 5), (5, 5)])
+        self.assertEqual(Lead.objects.count(), 2)
+        self.assertEqual(LeadText.objects.count(), 2)
+        self.assertEqual([len(n['deleted']) for n in self.notifications], [2, 2, 1])
+        self.assertEqual(self.company_counts(), ({'Initech': 2}, {'Initech': 2}))
+
+    def test_chunked_delete_removes_dependent_rows_without_loading_leads(self):
+        with CaptureQueriesContext(connection) as queries:
+            chunked_delete(Lead.objects.all(), chunk_size=10)
+
+        deletes = [q['sql'] for q in queries if q['sql'].startswith('DELETE')]
+        self.assertIn('DELETE FROM "leads_leadtext"', ' '.join(deletes))
+        self.assertEqual(sum('FROM "leads_lead" ' in sql for sql in deletes), 1)
+        self.assertFalse(any('"leads_lead"."name"' in q['sql'] for q in queries))
+
+    def test_chunked_update_by_filter(self):
+        result = chunked_update(Lead.objects.filter(company='Acme'), {'company': 'Initech', 'location': 'Chennai'},
+                                chunk_size=2)
+
+        self.assertEqual(result, {'matched': 5, 'processed': 5, 'chunks': 3})
+        self.assertEqual(Lead.objects.filter(company='Initech', location='Chennai').count(), 5)
+        self.assertEqual([len(n['updated']) for n in self.notifications], [2, 2, 1])
+        self.assertEqual(self.company_counts(), ({'Initech': 7}, {'Initech': 7}))
+        self.assertEqual(
+            dict(Location.objects.filter(lead_count__gt=0).values_list('name', 'lead_count')),
+            {'Chennai': 5, 'Pune': 2},
+        )
+        with self.assertRaises(ValueError):
+            chunked_update(Lead.objects.all(), {'email': 'x@example.com'})
+
+    @override_settings(LEADS_BULK_CHUNK_SIZE=2)
+    def test_bulk_update_view(self):
+        ids = ','.join(str(pk) for pk in Lead.objects.filter(company='Initech').values_list('pk', flat=True))
+        response = self.client.post(
+            reverse('bulk_update_leads'), {'search': 'Lead', 'ids': ids, 'role': 'Data Scientist'},
+            headers={'X-Requested-With': 'XMLHttpRequest'},
+        )
+
+        self.assertEqual(response.json(), {'success': True, 'matched': 2, 'processed': 2, 'chunks': 1})
+        self.assertEqual(Lead.objects.filter(role='Data Scientist').count(), 2)
+
+        response = self.client.post(reverse('bulk_update_leads'), {'search': 'Lead'},
+                                    headers={'X-Requested-With': 'XMLHttpRequest'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Lead.objects.filter(role='Data Scientist').count(), 2)
+
+    @override_settings(LEADS_BULK_CHUNK_SIZE=2)
+    def test_admin_actions(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        url = reverse('admin:leads_lead_changelist')
+        acme = list(Lead.objects.filter(company='Acme').values_list('pk', flat=True))
+
+        self.client.post(url, {
+            'action': 'update_in_chunks', '_selected_action': acme, 'field': 'company', 'value': 'Globex',
+        })
+        self.assertEqual(Lead.objects.filter(company='Globex').count(), 5)
+        self.assertEqual(self.company_counts(), ({'Globex': 5, 'Initech': 2}, {'Globex': 5, 'Initech': 2}))
+
+        response = self.client.post(url, {'action': 'delete_in_chunks', '_selected_action': acme}, follow=True)
+        self.assertContains(response, 'Deleted 5 of 5 leads in 3 chunks')
+        self.assertEqual(Lead.objects.count(), 2)
+        self.assertEqual(self.company_counts(), ({'Initech': 2}, {'Initech': 2}))
+
+
+class RollbackUploadTests(TestCase):
+
+    def setUp(self):
+        self.existing = Lead.objects.create(
+            name='Asha', email='asha@example.com', role='Analyst', company='Infosys', notes='Met at a meetup',
+        )
+        self.upload = UploadHistory.objects.create(filename='batch.xlsx')
+        upsert_leads([
+            {'name': 'Asha', 'email': 'asha@example.com', 'role': 'Data Engineer', 'company': 'TCS', 'notes': 'Moved'},
+            *({'name': f'New {i}', 'email': f'new{i}@example.com'} for i in range(3)),
+        ], upload=self.upload)
+
+    def assertRolledBack(self):
+        self.assertEqual(list(Lead.objects.values_list('email', flat=True)), ['asha@example.com'])
+        lead = Lead.objects.select_related('text').get()
+        self.assertEqual(
+            (lead.role, lead.company, lead.canonical_company.name, lead.notes, lead.import_batch),
+            ('Analyst', 'Infosys', 'Infosys', 'Met at a meetup', None),
+        )
+        self.upload.refresh_from_db()
+        self.assertIsNotNone(self.upload.rolled_back_at)
+
+    def test_rollback_in_chunks(self):
+        progress = []
+        result = rollback_upload(self.upload, chunk_size=1, progress=lambda done, total: progress.append((done, total)))
+
+        self.assertEqual(result, {'deleted': 3, 'restored': 1, 'skipped': 0})
+        self.assertEqual(progress, [(1, 4), (2, 4), (3, 4), (4, 4)])
+        self.assertRolledBack()
+        with self.assertRaises(ValueError):
+            rollback_upload(self.upload)
+
+    def test_leads_written_by_a_later_upload_are_skipped_unless_forced(self):
+        later = UploadHistory.objects.create(filename='later.xlsx')
+        upsert_leads([{'name': 'Asha', 'email': 'asha@example.com', 'role': 'Lead Engineer'}], upload=later)
+
+        result = rollback_upload(self.upload)
+
+        self.assertEqual(result, {'deleted': 3, 'restored': 0, 'skipped': 1})
+        self.assertEqual(Lead.objects.get().role, 'Lead Engineer')
+
+    def test_upload_without_lineage_cannot_be_rolled_back(self):
+        legacy = UploadHistory.objects.create(filename='legacy.xlsx', has_lineage=False)
+        with self.assertRaises(ValueError):
+            rollback_upload(legacy)
+
+    def test_management_command(self):
+        out = StringIO()
+        call_command('rollback_upload', self.upload.pk, chunk_size=2, stdout=out)
+
+        self.assertIn('deleted 3 leads, restored 1, skipped 0', out.getvalue())
+        self.assertIn('2/4 leads', out.getvalue())
+        self.assertRolledBack()
+        with self.assertRaises(CommandError):
+            call_command('rollback_upload', self.upload.pk, stdout=StringIO())
+
+    def test_view(self):
+        response = self.client.post(reverse('rollback_upload', args=[self.upload.pk]))
+
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+        self.assertRolledBack()
+        again = self.client.post(
+            reverse('rollback_upload', args=[self.upload.pk]), headers={'X-Requested-With': 'XMLHttpRequest'}
+        )
+        self.assertEqual(again.status_code, 409)
+
+    def test_admin_action(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+
+        response = self.client.post(reverse('admin:leads_uploadhistory_changelist'), {
+            'action': 'roll_back', '_selected_action': [self.upload.pk],
+        })
+
+        self.assertEqual(response.status_code, 302)
+        self.assertRolledBack()
+
+
+class WorkbookImportTests(TestCase):
+
+    def setUp(self):
+        tmp = tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False)
+        tmp.close()
+        self.addCleanup(os.unlink, tmp.name)
+        self.path = tmp.name
+        with pd.ExcelWriter(self.path) as writer:
+            pd.DataFrame({
+                'Name': ['Asha', 'Ravi', None], 'Email': ['asha@example.com', 'ravi@example.com', 'anon@example.com'],
+            }).to_excel(writer, sheet_name='North', index=False)
+            pd.DataFrame({
+                'Name': ['Meera', 'Asha'], 'Email': ['meera@example.com', 'asha@example.com'],
+                'Company Name': ['Wipro', 'TCS'],
+            }).to_excel(writer, sheet_name='South', index=False)
+
+    def assertImportedBothSheets(self):
+        upload, result = import_upload(self.path, 'regions.xlsx')
+
+        self.assertEqual((result['imported'], result['updated'], result['skipped']), (3, 1, 1))
+        self.assertEqual([(s['sheet'], s['rows']) for s in upload.sheet_counts], [('North', 2), ('South', 2)])
+        self.assertEqual(
+            sorted(Lead.objects.values_list('email', 'company')),
+            [('asha@example.com', 'TCS'), ('meera@example.com', 'Wipro'), ('ravi@example.com', '')],
+        )
+
+    def test_small_workbook_is_parsed_in_process(self):
+        with mock.patch('leads.ingest.ProcessPoolExecutor') as pool:
+            self.assertImportedBothSheets()
+        pool.assert_not_called()
+
+    @override_settings(LEADS_INGEST_WORKERS=2, LEADS_INGEST_PARALLEL_MIN_BYTES=0)
+    def test_sheets_are_parsed_in_a_process_pool(self):
+        self.assertImportedBothSheets()
+
+    @override_settings(LEADS_INGEST_WORKERS=2, LEADS_INGEST_PARALLEL_MIN_BYTES=0)
+    def test_falls_back_to_in_process_parsing_without_a_pool(self):
+        # As on hosts without /dev/shm, where the pool's semaphores can't be created
+        with mock.patch('leads.ingest.ProcessPoolExecutor', side_effect=OSError(38, 'Function not implemented')):
+            self.assertImportedBothSheets()
+
+
+@override_settings(LEADS_API_TOKEN='secret', LEADS_API_MAX_BATCH=3)
+class LeadAPITests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.leads = [Lead.objects.create(name=f'Lead {i}', email=f'lead{i}@example.com') for i in range(5)]
+
+    def api(self, name, data=None, **kwargs):
+        headers = {'Authorization': 'Bearer secret', **kwargs.pop('headers', {})}
+        if data is None:
+            return self.client.get(reverse(name), kwargs, headers=headers)
+        return self.client.post(reverse(name), data, content_type='application/json', headers=headers)
+
+    def test_token_is_required(self):
+        with override_settings(LEADS_API_TOKEN=None):
+            self.assertEqual(self.api('api_lead_list').status_code, 403)
+            # A cross-site form post can't write leads either
+            response = self.client.post(
+                reverse('api_lead_upsert'), '{"leads": [{"name": "X", "email": "x@example.com"}]}',
+                content_type='text/plain',
+            )
+            self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.api('api_lead_list', headers={'Authorization': 'Bearer wrong'}).status_code, 401)
+        self.assertEqual(self.api('api_lead_list').status_code, 200)
+        self.assertFalse(Lead.objects.filter(email='x@example.com').exists())
+
+    def test_list_is_cursor_paginated(self):
+        seen = []
+        cursor = ''
+        while cursor is not None:
+            page = self.api('api_lead_list', limit=2, cursor=cursor).json()
+            seen.extend(row['email'] for row in page['results'])
+            cursor = page['next_cursor']
+
+        self.assertEqual(seen, [lead.email for lead in self.leads])
+        self.assertEqual(self.api('api_lead_list', cursor='x').status_code, 400)
+
+    def test_lookup_by_ids_and_emails(self):
+        response = self.api('api_lead_lookup', {'ids': [self.leads[0].pk, 0], 'emails': ['lead4@example.com']})
+
+        body = response.json()
+        self.assertEqual([row['email'] for row in body['results']], ['lead0@example.com', 'lead4@example.com'])
+        self.assertEqual(body['missing_ids'], [0])
+        too_many = self.api('api_lead_lookup', {'ids': [1, 2], 'emails': ['a@example.com', 'b@example.com']})
+        self.assertEqual(too_many.status_code, 400)
+
+    def test_upsert_creates_and_updates_by_email(self):
+        response = self.api('api_lead_upsert', {'leads': [
+            {'name': 'Lead 0', 'email': 'lead0@example.com', 'role': 'Data Engineer', 'notes': 'Prefers email'},
+            {'name': 'New', 'email': 'new@example.com'},
+        ]})
+
+        self.assertEqual((response.json()['imported'], response.json()['updated']), (1, 1))
+        lead = Lead.objects.select_related('text').get(email='lead0@example.com')
+        self.assertEqual((lead.role, lead.notes), ('Data Engineer', 'Prefers email'))
+
+        invalid = self.api('api_lead_upsert', {'leads': [
+            {'name': 'Other', 'email': 'other@example.com'}, {'name': '', 'email': 'not-an-email'},
+        ]})
+        self.assertEqual(invalid.status_code, 400)
+        self.assertEqual(list(invalid.json()['errors']), ['1'])
+        self.assertFalse(Lead.objects.filter(email='other@example.com').exists())
+
+
+class ProfilingTests(TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = os.path.join(tmp.name, 'profiles')
+        override = override_settings(LEADS_PROFILE_DIR=self.directory, LEADS_PROFILE_SAMPLE_RATE=0)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def profiles(self):
+        return os.listdir(self.directory) if os.path.isdir(self.directory) else []
+
+    @override_settings(LEADS_PROFILE_TOKEN=None, DEBUG=False)
+    def test_header_without_a_token_is_ignored(self):
+        self.client.get(reverse('home'), headers={'X-Profile': '1'})
+        self.assertEqual(self.profiles(), [])
+
+        with override_settings(DEBUG=True):
+            self.client.get(reverse('home'), headers={'X-Profile': '1'})
+        self.assertEqual(len(self.profiles()), 1)
+
+    @override_settings(LEADS_PROFILE_TOKEN='secret')
+    def test_header_must_match_the_token(self):
+        self.client.get(reverse('home'), headers={'X-Profile': 'guess'})
+        self.assertEqual(self.profiles(), [])
+
+        self.client.get(reverse('home'), headers={'X-Profile': 'secret'})
+        self.assertEqual(len(self.profiles()), 1)
+        self.assertTrue(self.profiles()[0].endswith('.prof'))
+
+    @override_settings(LEADS_PROFILE_TOKEN='secret')
+    def test_unwritable_profile_directory_does_not_fail_the_request(self):
+        # A file where the directory should be: mkdir fails as on a read-only filesystem
+        os.makedirs(os.path.dirname(self.directory), exist_ok=True)
+        open(self.directory, 'w').close()
+
+        with self.assertLogs('leads.timing', 'ERROR'):
+            response = self.client.get(reverse('home'), headers={'X-Profile': 'secret'})
+
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(LEADS_PROFILE_TOKEN='secret', OPENAI_API_KEY='test')
+    def test_ai_client_stats_need_staff_or_the_token(self):
+        url = reverse('ai_client_stats')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.get(url, headers={'X-Profile': 'guess'}).status_code, 403)
+        self.client.force_login(User.objects.create_user('ravi', 'ravi@example.com', 'password'))
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.assertEqual(self.client.get(url, headers={'X-Profile': 'secret'}).json()['circuit']['state'], 'closed')
+        self.client.force_login(User.objects.create_user('asha', 'asha@example.com', 'password', is_staff=True))
+        self.assertIn('requests', self.client.get(url).json())
+
+
+class SimilarLeadsTests(TestCase):
+
+    def setUp(self):
+        self.lead = Lead.objects.create(
+            name='Asha', email='asha@example.com', role='Data Engineer', skills='Python, Spark, Kafka, Airflow, SQL',
+        )
+
+    def test_near_duplicates_are_found_and_unrelated_leads_are_not(self):
+        twin = Lead.objects.create(
+            name='Ravi', email='ravi@example.com', role='Data Engineer', skills='Python, Spark, Kafka, Airflow, SQL',
+        )
+        Lead.objects.create(name='Meera', email='meera@example.com', role='Sales Manager', skills='Negotiation, CRM')
+
+        similar = similar_leads(self.lead)
+
+        self.assertEqual([(lead.pk, score) for lead, score in similar], [(twin.pk, 1.0)])
+
+    def test_rows_read_per_band_are_capped(self):
+        Lead.objects.bulk_create([
+            Lead(name=f'Engineer {i}', email=f'eng{i}@example.com', role='Software Engineer') for i in range(20)
+        ])
+        common = Lead.objects.create(name='Common', email='common@example.com', role='Software Engineer')
+        rebuild_signatures()
+
+        with mock.patch('leads.similarity.MAX_BUCKET_ROWS', 5), CaptureQueriesContext(connection) as queries:
+            similar = similar_leads(common, limit=50)
+
+        bucket_reads = [q['sql'] for q in queries if 'leads_leadbucket' in q['sql']]
+        self.assertEqual(len(bucket_reads), LSH_BANDS)
+        self.assertTrue(all('LIMIT 5' in sql for sql in bucket_reads))
+        self.assertLessEqual(len(similar), 5)
+        self.assertTrue(all(score == 1.0 for _, score in similar))
+
+
+class AutocompleteTests(TestCase):
+
+    def setUp(self):
+        self.reset()
+        self.addCleanup(self.reset)
+        Lead.objects.bulk_create([
+            Lead(name=f'Sw {i}', email=f'sw{i}@example.com', role='Software Engineer', skills='Python, Django')
+            for i in range(3)
+        ] + [Lead(name='Data', email='data@example.com', role='Data Engineer', skills='Python')])
+
+    def reset(self):
+        autocomplete._vocabulary = autocomplete._version = None
+        autocomplete._rebuilding = False
+        cache.delete(autocomplete.VERSION_KEY)
+
+    def terms(self, prefix, **params):
+        response = self.client.get(reverse('autocomplete'), {'q': prefix, **params})
+        return [(s['term'], s['count']) for s in response.json()['suggestions']]
+
+    def test_prefix_lookup_matches_any_word_most_frequent_first(self):
+        self.assertEqual(self.terms('eng', field='role'), [('software engineer', 3), ('data engineer', 1)])
+        self.assertEqual(self.terms('pyt'), [('python', 4)])
+        self.assertEqual(self.terms('dj', field='role'), [])
+
+    def test_writes_in_this_process_apply_without_a_rebuild(self):
+        self.terms('pyt')
+        with mock.patch('leads.autocomplete._start_rebuild') as start:
+            Lead.objects.create(name='New', email='new@example.com', role='ML Engineer', skills='Python')
+            chunked_delete(Lead.objects.filter(role='Data Engineer'))
+
+            self.assertEqual(self.terms('pyt'), [('python', 4)])
+            self.assertEqual(self.terms('ml'), [('ml engineer', 1)])
+        start.assert_not_called()
+
+    def test_writes_elsewhere_are_picked_up_by_a_background_rebuild(self):
+        self.terms('pyt')
+        # Another process: no signal here, only the shared version moves
+        Lead.objects.bulk_create([Lead(name='Go', email='go@example.com', role='Go Developer')])
+        cache.incr(autocomplete.VERSION_KEY)
+        autocomplete._checked_at = 0.0
+
+        with mock.patch('leads.autocomplete._start_rebuild') as start:
+            # The old index keeps answering until the rebuild lands
+            self.assertEqual(self.terms('go'), [])
+            self.assertEqual(self.terms('go'), [])
+        start.assert_called_once()
+
+        autocomplete._rebuild()
+        self.assertEqual(self.terms('go'), [('go developer', 1)])
+
+
+class DimensionTests(TestCase):
+
+    def counts(self, model):
+        return dict(model.objects.filter(lead_count__gt=0).values_list('name', 'lead_count'))
+
+    def test_resolve_maps_name_variants_to_one_row(self):
+        companies = Company.resolve(['Infosys', 'infosys ltd', 'Infosys Limited.', 'TCS', ''])
+        locations = Location.resolve(['Hyderabad, India', 'hyderabad india'])
+
+        self.assertEqual(len(set(companies.values())), 2)
+        self.assertEqual(companies['Infosys'], companies['Infosys Limited.'])
+        self.assertNotIn('', companies)
+        # The first spelling seen names the row
+        self.assertEqual(Company.objects.get(pk=companies['infosys ltd']).name, 'Infosys')
+        self.assertEqual(len(set(locations.values())), 1)
+        self.assertEqual(Company.resolve(['INFOSYS LTD']), {'INFOSYS LTD': companies['Infosys']})
+
+    def test_lead_counts_follow_lead_writes(self):
+        asha = Lead.objects.create(name='Asha', email='asha@example.com', company='Infosys Ltd', location='Pune')
+        upsert_leads([
+            {'name': 'Ravi', 'email': 'ravi@example.com', 'company': 'infosys', 'location': 'Pune'},
+            {'name': 'Meera', 'email': 'meera@example.com', 'company': 'TCS', 'location': 'Chennai'},
+        ])
+        self.assertEqual(self.counts(Company), {'Infosys Ltd': 2, 'TCS': 1})
+
+        asha.company = 'TCS Limited'
+        asha.save()
+        chunked_update(Lead.objects.filter(email='meera@example.com'), {'location': 'pune'})
+        chunked_delete(Lead.objects.filter(email='ravi@example.com'))
+
+        self.assertEqual(self.counts(Company), {'TCS': 2})
+        self.assertEqual(self.counts(Location), {'Pune': 2})
+        expected = (self.counts(Company), self.counts(Location))
+        rebuild_dimension_counts()
+        self.assertEqual((self.counts(Company), self.counts(Location)), expected)
+
+
+class FacetCountTests(TestCase):
+
+    def counts(self):
+        return set(LeadFacet.objects.filter(count__gt=0).values_list('facet', 'value', 'count'))
+
+    def assertMatchesRecount(self):
+        incremental = self.counts()
+        rebuild_facets()
+        self.assertEqual(incremental, self.counts())
+        return incremental
+
+    def test_counts_follow_single_writes(self):
+        asha = Lead.objects.create(name='Asha', email='asha@example.com', company='Infosys', location='Pune', role='Data Engineer')
+        Lead.objects.create(name='Ravi', email='ravi@example.com', company='Infosys', location='Chennai')
+        counts = self.assertMatchesRecount()
+        self.assertIn(('company', 'Infosys', 2), counts)
+
+        asha.company = 'TCS'
+        asha.location = ''
+        asha.save()
+        counts = self.assertMatchesRecount()
+        self.assertIn(('company', 'Infosys', 1), counts)
+        self.assertIn(('company', 'TCS', 1), counts)
+        self.assertNotIn(('location', 'Pune', 1), counts)
+
+        # Single deletes go through the view, which sends the notification
+        self.client.post(reverse('delete_lead', args=[asha.pk]))
+        self.assertFalse(Lead.objects.filter(pk=asha.pk).exists())
+        self.assertMatchesRecount()
+
+    def test_counts_follow_bulk_writes(self):
+        upsert_leads([
+            {'name': f'Lead {i}', 'email': f'lead{i}@example.com', 'company': 'Acme' if i % 2 else 'Initech',
+             'location': 'Pune', 'role': 'Data Engineer'}
+            for i in range(6)
+        ])
+        self.assertMatchesRecount()
+
+        chunked_update(Lead.objects.filter(company='Acme'), {'company': 'Initech', 'role': 'Data Scientist'}, chunk_size=2)
+        counts = self.assertMatchesRecount()
+        self.assertIn(('company', 'Initech', 6), counts)
+
+        chunked_delete(Lead.objects.filter(role='Data Scientist'), chunk_size=2)
+        counts = self.assertMatchesRecount()
+        self.assertIn(('company', 'Initech', 3), counts)
+        self.assertIn(('location', 'Pune', 3), counts)
+
+        # Rows that dropped to zero stay behind and are ignored by the sidebar
+        chunked_delete(Lead.objects.all())
+        self.assertEqual(self.assertMatchesRecount(), set())
+
+
+class SavedSearchPercolatorTests(TestCase):
+
+    def setUp(self):
+        self.search, _ = save_search('python django developer')
+        self.other, _ = save_search('Kubernetes SRE')
+
+    def hits(self, search):
+        return set(search.hits.values_list('lead__email', flat=True))
+
+    def test_save_search_indexes_its_tokens(self):
+        self.assertEqual(
+            set(self.search.terms.values_list('term', flat=True)), {'python', 'django', 'developer'}
+        )
+        self.assertEqual(save_search('Developer, Django & Python!'), (self.search, False))
+        with self.assertRaises(ValueError):
+            save_search('a b')
+
+    def test_created_leads_match_only_searches_sharing_a_token(self):
+        Lead.objects.create(name='Asha', email='asha@example.com', skills='Python, Django')
+        Lead.objects.create(name='Ravi', email='ravi@example.com', role='Accountant', skills='Excel')
+        upsert_leads([
+            {'name': 'Meera', 'email': 'meera@example.com', 'role': 'SRE'},
+            {'name': 'Kiran', 'email': 'kiran@example.com', 'notes': 'Built Django sites'},
+        ])
+
+        self.assertEqual(self.hits(self.search), {'asha@example.com', 'kiran@example.com'})
+        self.assertEqual(self.hits(self.other), {'meera@example.com'})
+        hit = self.search.hits.get(lead__email='asha@example.com')
+        self.assertGreater(hit.score, 0)
+        self.assertEqual([line.split(':')[0] for line in hit.match_context], ['Skills'])
+
+    def test_leads_are_scored_only_against_candidate_searches(self):
+        with mock.patch('leads.percolator.score_lead', wraps=score_lead) as scored:
+            Lead.objects.create(name='Ravi', email='ravi@example.com', role='Accountant', skills='Excel')
+            self.assertFalse(scored.called)
+
+            Lead.objects.create(name='Asha', email='asha@example.com', skills='Python')
+        self.assertEqual([call.args[1] for call in scored.call_args_list], [{'python', 'django', 'developer'}])
+
+    def test_updates_add_and_drop_hits(self):
+        lead = Lead.objects.create(name='Ravi', email='ravi@example.com', role='Accountant')
+        self.assertEqual(self.hits(self.search), set())
+
+        lead.role = 'Python Developer'
+        lead.save()
+        self.assertEqual(self.hits(self.search), {'ravi@example.com'})
+        self.assertEqual(list(new_hits(self.search).values_list('lead__email', flat=True)), ['ravi@example.com'])
+
+        chunked_update(Lead.objects.filter(pk=lead.pk), {'role': 'Accountant'})
+        self.assertEqual(self.hits(self.search), set())
+
+        chunked_update(Lead.objects.filter(pk=lead.pk), {'skills': 'Kubernetes'})
+        self.assertEqual(self.hits(self.other), {'ravi@example.com'})
+        self.assertEqual(self.hits(self.search), set())
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        self.lead = Lead.objects.create(name='Asha', email='asha@example.com', role='Data Engineer')
+        Lead.objects.create(name='Ravi', email='ravi@example.com', role='Data Engineer')
+
+    def get(self, name, etag=None, args=()):
+        headers = {'If-None-Match': etag} if etag else {}
+        return self.client.get(reverse(name, args=args), headers=headers)
+
+    def test_unchanged_list_answers_not_modified(self):
+        etag = self.get('all_leads')['ETag']
+
+        self.assertEqual(self.get('all_leads', etag).status_code, 304)
+        self.assertEqual(self.get('home', self.get('home')['ETag']).status_code, 304)
+
+    def test_lead_writes_change_the_etag(self):
+        etag = self.get('all_leads')['ETag']
+        detail_etag = self.get('lead_detail', args=[self.lead.pk])['ETag']
+
+        # A bulk edit keeps the count the same; updated_at and the cache version still move
+        chunked_update(Lead.objects.filter(email='ravi@example.com'), {'role': 'Data Scientist'})
+        response = self.get('all_leads', etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        # The detail page lists similar leads, so another lead's change invalidates it too
+        self.assertEqual(self.get('lead_detail', detail_etag, args=[self.lead.pk]).status_code, 200)
+
+        etag = response['ETag']
+        self.lead.name = 'Asha R'
+        self.lead.save()
+        self.assertEqual(self.get('all_leads', etag).status_code, 200)
+
+    def test_search_scores_from_another_worker_change_the_etag(self):
+        etag = self.get('all_leads')['ETag']
+        detail_etag = self.get('lead_detail', args=[self.lead.pk])['ETag']
+
+        # A worker with its own local-memory cache rescores the leads
+        other_worker = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                    'LOCATION': 'other-worker'}}
+        with override_settings(CACHES=other_worker):
+            self.client.post(reverse('search_leads'), {'skills': 'data engineer'})
+        self.assertGreater(Lead.objects.get(pk=self.lead.pk).match_score, 0)
+
+        self.assertEqual(self.get('all_leads', etag).status_code, 200)
+        self.assertEqual(self.get('lead_detail', detail_etag, args=[self.lead.pk]).status_code, 200)
+
+    def test_pending_flash_message_is_never_answered_with_not_modified(self):
+        etag = self.get('all_leads')['ETag']
+        self.client.get(reverse('delete_lead', args=[self.lead.pk]))
+
+        response = self.get('all_leads', etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertContains(response, 'Lead deleted successfully!')
+
+
+class PromptPackingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Lead.objects.bulk_create([
+            Lead(
+                name=f'Lead {i}', email=f'lead{i}@example.com', role='Senior Data Engineer', company='Infosys',
+                skills='Python, Spark, Kafka, Airflow, dbt, Snowflake, Terraform, Kubernetes', match_score=i,
+            )
+            for i in range(60)
+        ])
+
+    def test_packing_stays_within_the_budget_best_ranked_first(self):
+        leads = Lead.objects.order_by('-match_score')
+        packed = pack_leads(leads, token_budget=400)
+
+        self.assertGreater(packed['packed'], 0)
+        self.assertLess(packed['packed'], 60)
+        self.assertLessEqual(packed['tokens'], 400)
+        self.assertLessEqual(count_tokens(packed['table']), 400)
+        ids = [int(line.split('|')[0]) for line in packed['table'].splitlines()[1:]]
+        self.assertEqual(ids, list(leads.values_list('pk', flat=True)[:packed['packed']]))
+
+    def test_fields_are_capped_so_one_lead_cannot_crowd_out_the_rest(self):
+        Lead.objects.filter(match_score=59).update(skills='kubernetes ' * 500)
+        packed = pack_leads(Lead.objects.order_by('-match_score'), token_budget=400)
+
+        self.assertLessEqual(count_tokens(packed['table'].splitlines()[1]), 90)
+        self.assertGreater(packed['packed'], 1)
+
+    def test_only_a_successful_encoding_load_is_kept(self):
+        saved = prompting._encoding_loaded, prompting._encoding_failed_at
+        self.addCleanup(setattr, prompting, '_encoding_loaded', saved[0])
+        self.addCleanup(setattr, prompting, '_encoding_failed_at', saved[1])
+        prompting._encoding_loaded = prompting._encoding_failed_at = None
+        encoding = mock.Mock()
+
+        with mock.patch('tiktoken.encoding_for_model', side_effect=[OSError('BPE fetch failed'), encoding]) as load:
+            self.assertIsNone(prompting._encoding())
+            # Not retried on every call while the failure is recent
+            self.assertIsNone(prompting._encoding())
+            self.assertEqual(load.call_count, 1)
+
+            prompting._encoding_failed_at -= prompting.ENCODING_RETRY_SECONDS
+            self.assertIs(prompting._encoding(), encoding)
+            self.assertIs(prompting._encoding(), encoding)
+            self.assertEqual(load.call_count, 2)
+
+
+class HashedStaticFilesTests(SimpleTestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+
+    def test_without_a_manifest_plain_names_are_served(self):
+        with override_settings(STATIC_ROOT=self.root):
+            self.assertEqual(storage.HashedStaticFilesStorage().url('leads/css/base.css'),
+                             '/static/leads/css/base.css')
+
+    def test_collectstatic_writes_hashed_names(self):
+        with override_settings(STATIC_ROOT=self.root):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            static_storage = storage.HashedStaticFilesStorage()
+            hashed = static_storage.stored_name('leads/css/base.css')
+            url = static_storage.url('leads/css/base.css')
+
+        self.assertRegex(hashed, r'^leads/css/base\.[0-9a-f]{12}\.css$')
+        self.assertEqual(url, '/static/' + hashed)
+        with open(os.path.join(self.root, hashed), 'rb') as handle, \
+                open(os.path.join(settings.BASE_DIR, 'leads/static/leads/css/base.css'), 'rb') as source:
+            self.assertEqual(handle.read(), source.read())
+
+
+class FakeOpenAIServerTests(FakeOpenAIMixin, SimpleTestCase):
+
+    def post(self):
+        return httpx.post(f'{self.fake.base_url}/chat/completions', json=completion_kwargs('hi'), timeout=5)
+
+    def test_latency_is_injected_per_request(self):
+        self.fake.latency = lambda: 0.05
+        started = time.perf_counter()
+        response = self.post()
+
+        self.assertGreaterEqual(time.perf_counter() - started, 0.05)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['choices'][0]['message']['role'], 'assistant')
+        self.assertEqual(self.fake.request_count, 1)
+
+    def test_error_rate_fails_that_share_of_requests(self):
+        self.fake.error_rate = 1.0
+        self.addCleanup(setattr, self.fake, 'error_rate', 0.0)
+        statuses = {self.post().status_code for _ in range(20)}
+        self.assertLessEqual(statuses, {429, 500})
+
+        self.fake.error_rate = 0.0
+        self.fake.fail_next(1, status=503)
+        self.assertEqual([self.post().status_code for _ in range(2)], [503, 200])
+
+
+class LoadTestTests(TestCase):
+
+    def test_percentile_is_nearest_rank(self):
+        values = list(range(1, 11))
+        self.assertEqual(percentile([], 50), 0.0)
+        self.assertEqual(percentile(values, 1), 1)
+        self.assertEqual(percentile(values, 50), 5)
+        self.assertEqual(percentile(values, 95), 10)
+        self.assertEqual(percentile([0.2], 99), 0.2)
+
+    def test_endpoint_stats_summary(self):
+        stats = EndpointStats()
+        for latency, status in [(0.1, 200), (0.3, 200), (0.2, 500), (0.4, 'error')]:
+            stats.record(latency, status)
+        summary = stats.summary(elapsed=2)
+
+        self.assertEqual(summary['requests'], 4)
+        self.assertEqual(summary['errors'], 2)
+        self.assertEqual(summary['rps'], 2.0)
+        self.assertEqual((summary['p50_ms'], summary['max_ms']), (200.0, 400.0))
+        self.assertEqual(summary['statuses'], {'200': 2, '500': 1, 'error': 1})
+        self.assertEqual(EndpointStats().summary(elapsed=0)['rps'], 0.0)
+
+    def test_mix_parsing(self):
+        self.assertEqual(parse_mix('home=3, search=2,ai=0.5'), {'home': 3.0, 'search': 2.0, 'ai': 0.5})
+        with self.assertRaises(CommandError):
+            parse_mix('home')
+        with self.assertRaisesMessage(ValueError, 'Unknown endpoints in mix: admin'):
+            LoadTest('http://testserver', mix={'home': 1, 'admin': 1})
+        with self.assertRaisesMessage(ValueError, 'empty'):
+            LoadTest('http://testserver', mix={'home': 0})
+
+    def test_refuses_a_database_that_is_not_a_test_database(self):
+        with mock.patch.dict(connection.settings_dict, {'NAME': '/srv/leads/production.db'}), \
+                mock.patch.object(LoadTestCommand, '_load') as load:
+            with self.assertRaisesMessage(CommandError, '--allow-writes'):
+                call_command('loadtest', seed=5, stderr=StringIO())
+        self.assertFalse(load.called)
+        self.assertFalse(Lead.objects.exists())
+
+    def test_removes_what_the_run_created(self):
+        kept = Lead.objects.create(name='Asha', email='asha@example.com', company='Acme', match_score=7)
+
+        def run(command, options):
+            # What the uploads and searches of a run leave behind
+            command.run_id = 'abc123'
+            upload = UploadHistory.objects.create(filename=upload_filename('abc123'))
+            upsert_leads([
+                {'name': f'Load Test {i}', 'email': f'{upload_email_prefix("abc123")}{i}@leads.local',
+                 'company': 'Acme'}
+                for i in range(3)
+            ], upload=upload)
+            Lead.objects.filter(pk=kept.pk).update(match_score=99)
+            self.assertEqual(Lead.objects.count(), 1 + 4 + 3)
+
+        with mock.patch.object(LoadTestCommand, '_load', autospec=True, side_effect=run):
+            call_command('loadtest', seed=4, allow_writes=True, stderr=StringIO())
+
+        self.assertEqual(list(Lead.objects.values_list('pk', 'match_score')), [(kept.pk, 7)])
+        self.assertFalse(UploadHistory.objects.exists())
+        self.assertEqual(
+            set(LeadFacet.objects.filter(facet='company', count__gt=0).values_list('value', 'count')),
+            {('Acme', 1)},
+        )
@@ -1,15 +1,31 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.home, name='home'),
     path('upload/', views.upload_leads, name='upload_leads'),
+    path('upload/<int:pk>/rollback/', views.rollback_upload_view, name='rollback_upload'),
+    path('upload/chunked/', views.start_chunked_upload, name='start_chunked_upload'),
+    path('upload/chunked/<uuid:upload_id>/', views.chunked_upload, name='chunked_upload'),
+    path('upload/chunked/<uuid:upload_id>/finish/', views.finish_chunked_upload, name='finish_chunked_upload'),
     path('search/', views.search_leads, name='search_leads'),
+    path('autocomplete/', views.autocomplete, name='autocomplete'),
+    path('saved-searches/', views.saved_searches, name='saved_searches'),
+    path('saved-searches/<int:pk>/', views.saved_search_detail, name='saved_search_detail'),
+    path('saved-searches/<int:pk>/delete/', views.delete_saved_search, name='delete_saved_search'),
     path('ai-lead-generation/', views.ai_lead_generation, name='ai_lead_generation'),
+    path('ai-lead-generation/stats/', views.ai_client_stats, name='ai_client_stats'),
     path('prompt-builder/', views.prompt_builder, name='prompt_builder'),
     path('lead/<int:pk>/', views.lead_detail, name='lead_detail'),
     path('lead/<int:pk>/delete/', views.delete_lead, name='delete_lead'),
+    path('leads/bulk-delete/', views.bulk_delete_leads, name='bulk_delete_leads'),
+    path('leads/bulk-update/', views.bulk_update_leads, name='bulk_update_leads'),
     path('export/', views.export_leads, name='export_leads'),
     path('all-leads/', views.all_leads, name='all_leads'),
     path('clear-chat/<int:pk>/', views.clear_chat_history, name='clear_chat_history'),
+
+    # JSON API
+    path('api/v1/leads/', api.lead_list, name='api_lead_list'),
+    path('api/v1/leads/lookup/', api.lead_lookup, name='api_lead_lookup'),
+    path('api/v1/leads/upsert/', api.lead_upsert, name='api_lead_upsert'),
 ]
\ No newline at end of file
@@ -1,30 +1,58 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.http import HttpResponse, JsonResponse
-from django.db.models import Q
 from django.conf import settings
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from django.urls import reverse
+from django.views.decorators.http import condition
 import pandas as pd
 import openpyxl
 from io import BytesIO
-from .models import Lead, UploadHistory
-from .forms import LeadUploadForm, LeadSearchForm, LeadForm
-import re
+from .models import ChunkedUpload, Company, Lead, LeadFacet, Location, SavedSearch, UploadHistory
+from .forms import LeadUploadForm, LeadSearchForm, LeadForm, BulkLeadFilterForm, BulkLeadUpdateForm
+from .ingest import import_upload, rollback_upload, uploaded_workbook_path
+from .chunked_uploads import OffsetMismatch, append_chunk, finish_upload, start_upload
+from .caching import (
+    bump_lead_cache_version, cached_for_version, lead_table_state,
+    lead_list_etag, lead_list_last_modified, lead_detail_etag, lead_detail_last_modified,
+)
+from .signals import lead_snapshot, notify_leads_changed
+from .prompting import TABLE_LEGEND, count_tokens, pack_leads
+from .ai_client import AIUnavailable, CircuitBreaker, RETRYABLE_ERRORS, get_ai_client
+from .matching import normalize_text, score_leads
+from .profiling import has_profile_token, span
+from .bulk import leads_matching, chunked_delete, chunked_update, search_query_filter
+from .facets import facet_sidebar, filter_by_facets, selected_facets
+from .autocomplete import AUTOCOMPLETE_FIELDS, complete
+from .similarity import similar_leads
+from .percolator import new_hits, save_search
+from .cooccurrence import keyword_suggestions
+from .conversations import clear_conversation
 from collections import Counter
-from openai import OpenAI
 import json
+import logging
 
+logger = logging.getLogger(__name__)
 
+# Chat formatting tokens added per message by the API, with some margin
+PROMPT_OVERHEAD_TOKENS = 20
+
+
+@condition(etag_func=lead_list_etag, last_modified_func=lead_list_last_modified)
 def home(request):
     """Home page with upload and search functionality"""
     upload_form = LeadUploadForm()
     search_form = LeadSearchForm()
     leads = Lead.objects.all()[:1000]  # Show recent 1000 leads
+    table_state = lead_table_state(request)
     
     context = {
         'upload_form': upload_form,
         'search_form': search_form,
         'leads': leads,
-        'total_leads': Lead.objects.count()
+        'total_leads': table_state['count'],
+        'leads_fingerprint': table_state['fingerprint'],
     }
     return render(request, 'leads/home.html', context)
 
@@ -42,119 +70,138 @@ def upload_leads(request):
     excel_file = request.FILES['file']
 
     try:
-        df = pd.read_excel(excel_file)
-
-        # Column mapping from Excel to Lead model
-        column_mapping = {
-            'Name': 'name',
-            'Linkedin Link': 'linkedin_url',
-            'Designation': 'role',
-            'Linkedin About': 'notes',
-            'Company Name': 'company',
-            'Location\n(Where GCC center is opening.\nIf 2 locations, one is HQ one is GCC)': 'location',
-            'Company Headquarters': 'company_hq',
-            'Category': 'category',
-            'Expansion Type': 'expansion_type',
-            'Comments': 'comments',
-            'Email': 'email',
-            'Phone': 'phone',
-            'Category\n(By level of relationship)': 'relationship_category',
-            'Message, invite sent for lead generation only (Yes/No/Doubtful)': 'invite_sent',
-            'MB Connection Level': 'connection_level',
-            'Relevant': 'relevant',
-            'Phone Number sent to sir': 'phone_sent',
-            'Response': 'response',
-            'Remarks': 'remarks',
-            'Original Sheet': 'original_sheet'
-        }
+        with uploaded_workbook_path(excel_file) as path:
+            upload, result = import_upload(path, excel_file.name)
+    except Exception as e:
+        # Batches written before the failure stay recorded against the upload
+        # so they can be rolled back
+        messages.error(request, f"Upload failed: {str(e)}")
+        return redirect('home')
 
-        # Rename columns
-        df = df.rename(columns=column_mapping)
+    if upload is None:
+        messages.error(request, "Excel must contain a 'Name' column")
+    else:
+        messages.success(request, upload_summary(result))
+    return redirect('home')
 
-        # Check if 'name' column exists after mapping
-        if 'name' not in df.columns:
-            messages.error(request, "Excel must contain a 'Name' column")
-            return redirect('home')
 
-        imported = 0
-        updated = 0
-        skipped = 0
+def upload_summary(result):
+    """Success message for an import_upload() result"""
+    sheets = result['sheets']
+    rejected = [sheet['sheet'] for sheet in sheets if sheet['error']]
+    message_parts = [f"Imported {result['imported']} new leads, updated {result['updated']} existing leads"]
+    if len(sheets) > 1:
+        message_parts[0] += f" from {len(sheets) - len(rejected)} sheets"
+    if result['skipped'] > 0:
+        message_parts.append(f"skipped {result['skipped']} empty rows")
+    if rejected:
+        message_parts.append(f"ignored sheets without a 'Name' column: {', '.join(rejected)}")
+    return ", ".join(message_parts)
 
-        for idx, row in df.iterrows():
-            # Get name - skip if empty
-            name = str(row.get('name', '')).strip()
-            if not name or name == 'nan':
-                skipped += 1
-                continue
 
-            # Get email - generate if missing
-            email = row.get('email')
-            if pd.notna(email) and str(email).strip() and str(email).strip().lower() != 'nan':
-                email = str(email).strip()
-            else:
-                # Auto-generate email if missing
-                email = f"{name.lower().replace(' ', '.')}.{idx}@leads.local"
-
-            # Helper function to safely get string values
-            def safe_str(value, default=''):
-                if pd.notna(value) and str(value).strip() and str(value).strip().lower() != 'nan':
-                    return str(value).strip()
-                return default
-
-            # Prepare lead data with all mapped fields
-            lead_data = {
-                'name': name,
-                'email': email,
-                'phone': safe_str(row.get('phone')),
-                'role': safe_str(row.get('role')),
-                'company': safe_str(row.get('company')),
-                'linkedin_url': safe_str(row.get('linkedin_url')),
-                'location': safe_str(row.get('location')),
-                'skills': '',
-                'experience_years': 0,
-                'notes': safe_str(row.get('notes')),
-            }
+def _chunked_upload_state(chunked):
+    return {
+        'upload_id': str(chunked.pk),
+        'url': reverse('chunked_upload', args=[chunked.pk]),
+        'finish_url': reverse('finish_chunked_upload', args=[chunked.pk]),
+        'offset': chunked.offset,
+        'size': chunked.size,
+        'chunk_size': settings.LEADS_CHUNKED_UPLOAD_CHUNK_SIZE,
+        'complete': chunked.completed_at is not None,
+    }
 
-            # Create or update lead
-            lead, created = Lead.objects.update_or_create(
-                email=email,
-                defaults=lead_data
-            )
 
-            if created:
-                imported += 1
-            else:
-                updated += 1
+def start_chunked_upload(request):
+    """Open a chunked upload; the client then appends the file in chunks from offset 0"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
+    try:
+        size = int(request.POST.get('size', ''))
+        chunked = start_upload(request.POST.get('filename', ''), size, request.POST.get('sha256', ''))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e) or 'Invalid size'}, status=400)
+    return JsonResponse({'success': True, **_chunked_upload_state(chunked)}, status=201)
 
-        # Create upload history record
-        UploadHistory.objects.create(
-            filename=excel_file.name,
-            records_imported=imported,
-            records_updated=updated
-        )
 
-        # Success message
-        message_parts = [f"Imported {imported} new leads, updated {updated} existing leads"]
-        if skipped > 0:
-            message_parts.append(f"skipped {skipped} empty rows")
-        
-        messages.success(request, ", ".join(message_parts))
+def chunked_upload(request, upload_id):
+    """
+    GET: how much of the upload has been received, to resume from.
+    POST: append the request body at the X-Upload-Offset header, verified
+    against the X-Chunk-SHA256 header.
+    """
+    chunked = get_object_or_404(ChunkedUpload, pk=upload_id)
+    if request.method == 'GET':
+        return JsonResponse({'success': True, **_chunked_upload_state(chunked)})
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
 
+    try:
+        offset = int(request.headers.get('X-Upload-Offset', ''))
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'X-Upload-Offset and Content-Length are required'}, status=400)
+    try:
+        # Streamed from the request: request.body would hold the chunk in memory
+        append_chunk(chunked, offset, request, length, request.headers.get('X-Chunk-SHA256', ''))
+    except OffsetMismatch as e:
+        return JsonResponse({'success': False, 'error': str(e), 'offset': e.offset}, status=409)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e), 'offset': chunked.offset}, status=400)
+    return JsonResponse({'success': True, **_chunked_upload_state(chunked)})
+
+
+def finish_chunked_upload(request, upload_id):
+    """Import a fully received chunked upload like a single-request upload"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
+    chunked = get_object_or_404(ChunkedUpload, pk=upload_id)
+    try:
+        upload, result = finish_upload(chunked)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=409)
     except Exception as e:
         messages.error(request, f"Upload failed: {str(e)}")
+        return JsonResponse({'success': False, 'error': f"Upload failed: {str(e)}"}, status=500)
+
+    if upload is None:
+        error = "Excel must contain a 'Name' column"
+        messages.error(request, error)
+        return JsonResponse({'success': False, 'error': error}, status=400)
+    message = upload_summary(result)
+    # Shown on the page the client loads next
+    messages.success(request, message)
+    return JsonResponse({
+        'success': True,
+        'message': message,
+        'upload': upload.pk,
+        'imported': result['imported'],
+        'updated': result['updated'],
+        'skipped': result['skipped'],
+    })
+
+
+def rollback_upload_view(request, pk):
+    """Undo an upload: delete the leads it created and restore the ones it updated"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
+    upload = get_object_or_404(UploadHistory, pk=pk)
+    try:
+        result = rollback_upload(upload, force=request.POST.get('force') == '1')
+    except ValueError as e:
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            return JsonResponse({'success': False, 'error': str(e)}, status=409)
+        messages.error(request, str(e))
+        return redirect('home')
 
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return JsonResponse({'success': True, **result})
+    message = f"Rolled back {upload.filename}: deleted {result['deleted']} leads, restored {result['restored']}"
+    if result['skipped']:
+        message += f", left {result['skipped']} changed by later uploads"
+    messages.success(request, message)
     return redirect('home')
 
 
-def normalize_text(text):
-    """Normalize text for matching"""
-    if not text:
-        return []
-    text = text.lower()
-    text = re.sub(r'[^a-z0-9\s]', ' ', text)
-    return [t for t in text.split() if len(t) > 2]
-
-
 def search_leads(request):
     if request.method != 'POST':
         return redirect('home')
@@ -163,133 +210,81 @@ def search_leads(request):
     if not query_text:
         return redirect('home')
 
-    query_tokens = normalize_text(query_text)
-    query_set = set(query_tokens)
-    query_counter = Counter(query_tokens)
-
-    leads = Lead.objects.all()
-    matched_leads = []
-    
-    # Track keyword statistics
-    matched_keywords = Counter()
-
-    for lead in leads:
-        score = 0
-        include = False
-        match_context = []
-
-        # Normalize lead fields
-        role_tokens = normalize_text(lead.role)
-        company_tokens = normalize_text(lead.company)
-        skills_tokens = normalize_text(lead.skills)
-        notes_tokens = normalize_text(lead.notes)
-        location_tokens = normalize_text(lead.location)
-
-        # --- Role match ---
-        role_match = set(role_tokens) & query_set
-        if role_match:
-            score += 30 + 5 * len(role_match)
-            include = True
-            matched_keywords.update(role_match)
-            match_context.append(f"Role: {', '.join(role_match)}")
-
-        # --- Skills match ---
-        skills_match = set(skills_tokens) & query_set
-        if skills_match:
-            score += 40 + 5 * len(skills_match)
-            include = True
-            matched_keywords.update(skills_match)
-            match_context.append(f"Skills: {', '.join(skills_match)}")
-
-        # --- Company match ---
-        company_match = set(company_tokens) & query_set
-        if company_match:
-            score += 25
-            include = True
-            matched_keywords.update(company_match)
-            match_context.append(f"Company: {', '.join(company_match)}")
-
-        # --- Location match ---
-        location_match = set(location_tokens) & query_set
-        if location_match:
-            score += 15
-            include = True
-            matched_keywords.update(location_match)
-            match_context.append(f"Location: {', '.join(location_match)}")
-
-        # --- Notes overlap ---
-        misc_overlap = set(notes_tokens) & query_set
-        if misc_overlap:
-            score += 10
-            include = True
-            matched_keywords.update(misc_overlap)
-            match_context.append(f"Notes: {', '.join(misc_overlap)}")
-
-        # Normalize score
-        score = min(score, 100)
-
-        if include:
-            lead.match_score = score
-            lead.match_context = match_context
-            lead.save(update_fields=['match_score'])
-            matched_leads.append(lead)
+    with span('search.score') as timing:
+        # The notes match is the one list query that joins in LeadText
+        matched_leads, keyword_stats = score_leads(query_text, Lead.objects.select_related('text'))
+        timing['matched'] = len(matched_leads)
+
+    with span('search.suggest'):
+        keyword_stats.update(keyword_suggestions(normalize_text(query_text), keyword_stats['missing']))
+
+    # Scores changed without touching updated_at; refresh cached lists
+    if matched_leads:
+        bump_lead_cache_version()
+
+    with span('search.render'):
+        return render(
+            request,
+            'leads/search_results.html',
+            {
+                'leads': matched_leads,
+                'query': query_text,
+                'keyword_stats': keyword_stats,
+                'mode': 'generalized_match'
+            }
+        )
 
-    # Sort by match score
-    matched_leads.sort(key=lambda x: x.match_score, reverse=True)
 
-    # Calculate keyword statistics
-    matched_keywords_list = [
-        {'word': word, 'count': count} 
-        for word, count in matched_keywords.most_common()
-    ]
-    
-    # Find missing keywords
-    missing_keywords = query_set - set(matched_keywords.keys())
-    
-    # Find common keywords in results (partial matches)
-    all_db_keywords = Counter()
-    for lead in matched_leads[:20]:
-        all_db_keywords.update(normalize_text(lead.role))
-        all_db_keywords.update(normalize_text(lead.company))
-        all_db_keywords.update(normalize_text(lead.location))
-    
-    partial_keywords = []
-    for word, count in all_db_keywords.most_common(10):
-        if word not in query_set and count > 2:
-            partial_keywords.append({'word': word, 'count': count})
-    
-    # Calculate match rate
-    match_rate = 0
-    if query_tokens:
-        match_rate = round((len(matched_keywords) / len(query_set)) * 100, 1)
-
-    keyword_stats = {
-        'matched': matched_keywords_list,
-        'missing': sorted(list(missing_keywords)),
-        'partial': partial_keywords[:5],
-        'match_rate': match_rate
-    }
+def saved_searches(request):
+    """List saved searches with their new hits; POST saves the given query"""
+    if request.method == 'POST':
+        query_text = request.POST.get('query', '').strip()
+        try:
+            search, created = save_search(query_text, request.POST.get('name', '').strip())
+        except ValueError as e:
+            messages.error(request, str(e))
+            return redirect('saved_searches')
+        if created:
+            messages.success(request, f"Saved search \"{search.name}\". New matching leads will show up here.")
+        else:
+            messages.info(request, f"Already saved as \"{search.name}\"")
+        return redirect('saved_searches')
 
-    return render(
-        request,
-        'leads/search_results.html',
-        {
-            'leads': matched_leads,
-            'query': query_text,
-            'keyword_stats': keyword_stats,
-            'mode': 'generalized_match'
-        }
+    searches = SavedSearch.objects.annotate(
+        total_hits=Count('hits', distinct=True),
+        new_hits=Count('hits', filter=Q(hits__found_at__gt=F('last_viewed_at')), distinct=True),
     )
+    return render(request, 'leads/saved_searches.html', {'searches': searches})
 
 
-def truncate_text(text, max_length=100):
-    """Truncate text to maximum length"""
-    if not text:
-        return ""
-    text = str(text).strip()
-    if len(text) > max_length:
-        return text[:max_length] + "..."
-    return text
+def saved_search_detail(request, pk):
+    """Leads that matched a saved search since it was last viewed (?all=1 for every hit)"""
+    search = get_object_or_404(SavedSearch, pk=pk)
+    show_all = request.GET.get('all') == '1'
+    if show_all:
+        hits = search.hits.select_related('lead').order_by('-score', '-found_at')
+    else:
+        hits = new_hits(search)
+    hits = list(hits[:500])
+
+    context = {
+        'search': search,
+        'hits': hits,
+        'show_all': show_all,
+        'last_viewed_at': search.last_viewed_at,
+    }
+    if not show_all:
+        SavedSearch.objects.filter(pk=pk).update(last_viewed_at=timezone.now())
+    return render(request, 'leads/saved_search_detail.html', context)
+
+
+def delete_saved_search(request, pk):
+    if request.method != 'POST':
+        return redirect('saved_searches')
+    search = get_object_or_404(SavedSearch, pk=pk)
+    search.delete()
+    messages.success(request, f"Deleted saved search \"{search.name}\"")
+    return redirect('saved_searches')
 
 
 def get_industry_distribution(leads):
@@ -297,15 +292,15 @@ def get_industry_distribution(leads):
     Get distribution of leads across different industries/domains
     Returns top 5 industries with counts and percentages
     """
-    industry_counter = Counter()
     total = leads.count()
     
     if total == 0:
         return []
     
-    for lead in leads:
-        industry = infer_industry(lead.role, lead.company, lead.notes)
-        industry_counter[industry] += 1
+    # Industry is stored on each lead at write time, so this is one GROUP BY
+    industry_counter = Counter(dict(
+        leads.order_by().values_list('industry').annotate(count=Count('id'))
+    ))
     
     # Format the results with percentages - TOP 5 ONLY
     industry_stats = []
@@ -320,6 +315,14 @@ def get_industry_distribution(leads):
     return industry_stats
 
 
+def cached_industry_distribution():
+    """Industry overview for the AI page, cached until the next lead write"""
+    return cached_for_version(
+        'industry_stats',
+        lambda: get_industry_distribution(Lead.objects.all())
+    )
+
+
 def ai_lead_generation(request):
     """
     AI-powered lead generation using OpenAI to understand user intent
@@ -327,8 +330,7 @@ def ai_lead_generation(request):
     """
     if request.method != 'POST':
         # Get industry distribution for overview
-        all_leads = Lead.objects.all()
-        industry_stats = get_industry_distribution(all_leads)
+        industry_stats = cached_industry_distribution()
         
         return render(request, 'leads/ai_lead_generation.html', {
             'total_leads': Lead.objects.count(),
@@ -339,16 +341,15 @@ def ai_lead_generation(request):
     
     if not user_prompt:
         messages.error(request, "Please enter a description of what you're looking for")
-        all_leads = Lead.objects.all()
-        industry_stats = get_industry_distribution(all_leads)
+        industry_stats = cached_industry_distribution()
         return render(request, 'leads/ai_lead_generation.html', {
             'total_leads': Lead.objects.count(),
             'industry_stats': industry_stats
         })
     
     try:
-        # Initialize OpenAI client (v1.0+ API)
-        client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        # Shared OpenAI client: coalesces identical requests and queues for rate limits
+        client = get_ai_client()
         
         # Get all leads
         all_leads = Lead.objects.all()
@@ -361,22 +362,13 @@ def ai_lead_generation(request):
                 'industry_stats': []
             })
         
+        # Skip prompt assembly entirely while OpenAI is known to be down
+        if client.breaker.state == CircuitBreaker.OPEN:
+            return ai_keyword_fallback(request, user_prompt)
+
         # Analyze database composition for industry insights
-        industry_analysis = analyze_database_composition(all_leads)
-        
-        # OPTIMIZED: Limit to 150 leads and truncate long fields
-        # This keeps us well under the 16K token limit
-        leads_data = []
-        for lead in all_leads[:150]:  # Reduced from 500 to 150
-            leads_data.append({
-                'id': lead.id,
-                'name': truncate_text(lead.name, 50),
-                'role': truncate_text(lead.role, 60),
-                'company': truncate_text(lead.company, 50),
-                'location': truncate_text(lead.location, 40),
-                'skills': truncate_text(lead.skills, 80),
-                # Removed notes and experience_years to save tokens
-            })
+        with span('ai.analyze'):
+            industry_analysis = analyze_database_composition(all_leads)
         
         # Create OPTIMIZED AI prompt (much shorter)
         system_prompt = """You are a lead matching expert. Analyze the user's request and match it with leads from the database.
@@ -413,25 +405,43 @@ Only leads with score >= 50. Top 20 matches max."""
             'top_industries': list(industry_analysis['industries_represented'].keys())[:5]
         }
 
-        user_message = f"""User Request: {user_prompt}
+        user_message_head = f"""User Request: {user_prompt}
 
-Database Summary: {json.dumps(db_summary)}
+Database Summary: {json.dumps(db_summary, separators=(',', ':'))}
 
-Leads (ID, Name, Role, Company, Location, Skills):
-{json.dumps(leads_data, indent=1)}
+{TABLE_LEGEND}
+"""
+        user_message_tail = "\n\nReturn best matches in JSON format."
 
-Return best matches in JSON format."""
+        # Fill whatever the prompt budget leaves with as many leads as fit
+        fixed_tokens = sum(map(count_tokens, (system_prompt, user_message_head, user_message_tail)))
+        with span('ai.prompt') as timing:
+            packed = pack_leads(
+                all_leads,
+                settings.LEADS_AI_PROMPT_TOKEN_BUDGET - fixed_tokens - PROMPT_OVERHEAD_TOKENS
+            )
+            timing.update(leads=packed['packed'], tokens=packed['tokens'])
+        logger.info(
+            "AI prompt packed %d leads in %d tokens (%.1f tokens/lead)",
+            packed['packed'], packed['tokens'], packed['tokens_per_lead']
+        )
+        user_message = user_message_head + packed['table'] + user_message_tail
 
         # Call OpenAI API with reduced context
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message}
-            ],
-            temperature=0.3,
-            max_tokens=1500  # Reduced from 2000
-        )
+        try:
+            with span('ai.call'):
+                response = client.chat_completion(
+                    model="gpt-3.5-turbo",
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_message}
+                    ],
+                    temperature=0.3,
+                    max_tokens=settings.LEADS_AI_COMPLETION_TOKENS
+                )
+        except (AIUnavailable,) + RETRYABLE_ERRORS as e:
+            logger.warning("AI lead search degraded to keyword matching: %s", e)
+            return ai_keyword_fallback(request, user_prompt, industry_analysis)
         
         # Parse AI response
         ai_response_text = response.choices[0].message.content
@@ -448,18 +458,20 @@ Return best matches in JSON format."""
         
         ai_result = json.loads(ai_response_text)
         
-        # Retrieve matched leads from database
+        # Retrieve matched leads from database in one query
+        matches = ai_result.get('matches', [])
+        with span('ai.fetch_matches', matches=len(matches)):
+            leads_by_id = Lead.objects.in_bulk([match['lead_id'] for match in matches])
         matched_leads = []
-        for match in ai_result.get('matches', []):
-            try:
-                lead = Lead.objects.get(id=match['lead_id'])
-                lead.ai_confidence_score = match['confidence_score']
-                lead.ai_reasoning = match['reasoning']
-                lead.ai_strengths = match.get('strengths', [])
-                lead.ai_concerns = match.get('concerns', [])
-                matched_leads.append(lead)
-            except Lead.DoesNotExist:
+        for match in matches:
+            lead = leads_by_id.get(match['lead_id'])
+            if lead is None:
                 continue
+            lead.ai_confidence_score = match['confidence_score']
+            lead.ai_reasoning = match['reasoning']
+            lead.ai_strengths = match.get('strengths', [])
+            lead.ai_concerns = match.get('concerns', [])
+            matched_leads.append(lead)
         
         context = {
             'leads': matched_leads,
@@ -468,19 +480,20 @@ Return best matches in JSON format."""
             'search_type': ai_result.get('search_type', ''),
             'industry_alignment': ai_result.get('industry_alignment', ''),
             'total_leads': Lead.objects.count(),
-            'analyzed_leads': 150,  # Show user how many were analyzed
+            'analyzed_leads': packed['packed'],  # Show user how many were analyzed
+            'tokens_per_lead': packed['tokens_per_lead'],
             'database_insights': industry_analysis,
             'mode': 'ai_powered'
         }
         
-        return render(request, 'leads/ai_lead_results.html', context)
+        with span('ai.render'):
+            return render(request, 'leads/ai_lead_results.html', context)
         
     except Exception as e:
         # Handle different types of errors
         error_message = str(e)
         
-        all_leads = Lead.objects.all()
-        industry_stats = get_industry_distribution(all_leads)
+        industry_stats = cached_industry_distribution()
         
         if "api_key" in error_message.lower() or "authentication" in error_message.lower():
             messages.error(request, "OpenAI API key is invalid. Please check your settings.")
@@ -500,86 +513,99 @@ Return best matches in JSON format."""
         })
 
 
-def analyze_database_composition(leads):
+# Filler words of natural-language prompts that would match almost any notes text
+FALLBACK_STOPWORDS = {
+    'the', 'and', 'for', 'with', 'who', 'are', 'that', 'this', 'from', 'our',
+    'looking', 'need', 'want', 'find', 'someone', 'people', 'leads', 'lead',
+}
+
+
+def ai_keyword_fallback(request, user_prompt, industry_analysis=None):
     """
-    Analyze the database to understand which industries/sectors are well-represented
-    This helps the AI provide better context about match confidence
+    Answer an AI search with the keyword scorer from search_leads while
+    OpenAI is unavailable, so the page still returns results in time.
     """
-    analysis = {
-        'total_leads': leads.count(),
-        'top_roles': Counter(),
-        'top_companies': Counter(),
-        'top_locations': Counter(),
-        'industries_represented': Counter()
-    }
-    
-    for lead in leads:
-        # Count roles
-        if lead.role:
-            analysis['top_roles'][lead.role.lower()] += 1
-        
-        # Count companies
-        if lead.company:
-            analysis['top_companies'][lead.company.lower()] += 1
-        
-        # Count locations
-        if lead.location:
-            analysis['top_locations'][lead.location.lower()] += 1
-        
-        # Infer industry from company/role
-        industry = infer_industry(lead.role, lead.company, lead.notes)
-        if industry:
-            analysis['industries_represented'][industry] += 1
-    
-    # Convert to serializable format
-    return {
-        'total_leads': analysis['total_leads'],
-        'top_roles': dict(analysis['top_roles'].most_common(10)),
-        'top_companies': dict(analysis['top_companies'].most_common(10)),
-        'top_locations': dict(analysis['top_locations'].most_common(10)),
-        'industries_represented': dict(analysis['industries_represented'].most_common(10))
+    matched_leads, _ = score_leads(
+        user_prompt, Lead.objects.select_related('text'), save_scores=False, stopwords=FALLBACK_STOPWORDS
+    )
+    matched_leads = matched_leads[:20]
+    for lead in matched_leads:
+        lead.ai_confidence_score = lead.match_score
+        lead.ai_reasoning = "Keyword match - " + "; ".join(lead.match_context)
+        lead.ai_strengths = lead.match_context
+        lead.ai_concerns = []
+
+    total_leads = Lead.objects.count()
+    context = {
+        'leads': matched_leads,
+        'user_prompt': user_prompt,
+        'interpretation': "AI matching is temporarily unavailable, so these results come from keyword matching.",
+        'search_type': '',
+        'industry_alignment': '',
+        'total_leads': total_leads,
+        'analyzed_leads': total_leads,
+        'database_insights': industry_analysis,
+        'degraded': True,
+        'mode': 'keyword_fallback'
     }
+    return render(request, 'leads/ai_lead_results.html', context)
+
+
+def autocomplete(request):
+    """Keyword suggestions for the search boxes, most frequent first"""
+    prefix = request.GET.get('q', '').strip()
+    fields = [f for f in request.GET.getlist('field') if f in AUTOCOMPLETE_FIELDS] or None
+    try:
+        limit = min(max(int(request.GET.get('limit', 8)), 1), 25)
+    except ValueError:
+        limit = 8
+
+    response = JsonResponse({'query': prefix, 'suggestions': complete(prefix, limit=limit, fields=fields)})
+    response['Cache-Control'] = 'private, max-age=30'
+    return response
 
 
-def infer_industry(role, company, notes):
+def ai_client_stats(request):
     """
-    Infer industry sector from role, company name, and notes
+    Coalescing, rate limiter and circuit state of this process's OpenAI
+    client, for staff or a caller holding the profiling token
     """
-    text = f"{role} {company} {notes}".lower()
-    
-    industry_keywords = {
-        'technology': ['software', 'tech', 'it', 'developer', 'engineer', 'data', 'ai', 'cloud', 'saas', 'digital', 'cyber', 'programming', 'coding'],
-        'finance': ['finance', 'bank', 'investment', 'trading', 'accounting', 'fintech', 'financial', 'capital', 'wealth', 'credit'],
-        'healthcare': ['healthcare', 'medical', 'pharma', 'hospital', 'clinical', 'health', 'biotech', 'medicine', 'pharmaceutical'],
-        'manufacturing': ['manufacturing', 'production', 'factory', 'industrial', 'assembly', 'supply chain', 'operations'],
-        'retail': ['retail', 'ecommerce', 'store', 'shop', 'merchant', 'consumer', 'sales'],
-        'consulting': ['consulting', 'consultant', 'advisory', 'strategy', 'management consulting'],
-        'real_estate': ['real estate', 'property', 'construction', 'building', 'infrastructure'],
-        'education': ['education', 'university', 'school', 'training', 'learning', 'academic', 'teaching'],
-        'energy': ['energy', 'oil', 'gas', 'renewable', 'power', 'utilities', 'solar', 'wind'],
-        'telecommunications': ['telecom', 'network', 'wireless', 'broadband', 'communication', '5g'],
-        'media': ['media', 'advertising', 'marketing', 'content', 'publishing', 'broadcasting'],
-        'automotive': ['automotive', 'automobile', 'vehicle', 'car', 'transportation'],
-        'aerospace': ['aerospace', 'aviation', 'aircraft', 'defense'],
-        'logistics': ['logistics', 'shipping', 'freight', 'delivery', 'warehouse', 'distribution'],
-        'hospitality': ['hospitality', 'hotel', 'restaurant', 'tourism', 'travel'],
-        'legal': ['legal', 'law', 'attorney', 'lawyer', 'compliance'],
-        'insurance': ['insurance', 'underwriting', 'risk', 'claims'],
-        'agriculture': ['agriculture', 'farming', 'agribusiness', 'agro'],
-        'gaming': ['gaming', 'game', 'esports', 'entertainment'],
-        'government': ['government', 'public sector', 'municipal', 'federal', 'state']
+    if not (request.user.is_staff or has_profile_token(request)):
+        return JsonResponse({'error': 'Staff login or the X-Profile token is required'}, status=403)
+    return JsonResponse(get_ai_client().stats())
+
+
+def analyze_database_composition(leads):
+    """
+    Analyze the database to understand which industries/sectors are well-represented
+    This helps the AI provide better context about match confidence.
+    Reads the maintained Company/Location and facet counts, so it covers the
+    whole table whatever `leads` is filtered to; only the total uses `leads`.
+    """
+    def top_dimension(model):
+        return {row.name.lower(): row.lead_count
+                for row in model.objects.filter(lead_count__gt=0)[:10]}
+
+    def top_facet(facet, merge_case=False):
+        counts = Counter()
+        for value, count in (LeadFacet.objects.filter(facet=facet, count__gt=0)
+                             .order_by('-count').values_list('value', 'count')[:50]):
+            counts[value.lower() if merge_case else value] += count
+        return dict(counts.most_common(10))
+
+    return {
+        'total_leads': leads.count(),
+        'top_roles': top_facet('role', merge_case=True),
+        'top_companies': top_dimension(Company),
+        'top_locations': top_dimension(Location),
+        'industries_represented': top_facet('industry'),
     }
-    
-    for industry, keywords in industry_keywords.items():
-        if any(keyword in text for keyword in keywords):
-            return industry
-    
-    return 'other'
 
 
+@condition(etag_func=lead_detail_etag, last_modified_func=lead_detail_last_modified)
 def lead_detail(request, pk):
     """View and edit individual lead"""
-    lead = get_object_or_404(Lead, pk=pk)
+    lead = get_object_or_404(Lead.objects.select_related('text'), pk=pk)
     
     if request.method == 'POST':
         form = LeadForm(request.POST, instance=lead)
@@ -590,9 +616,14 @@ def lead_detail(request, pk):
     else:
         form = LeadForm(instance=lead)
     
+    with span('detail.similar') as timing:
+        similar = similar_leads(lead)
+        timing['found'] = len(similar)
+
     context = {
         'lead': lead,
-        'form': form
+        'form': form,
+        'similar_leads': similar,
     }
     return render(request, 'leads/lead_detail.html', context)
 
@@ -600,38 +631,97 @@ def lead_detail(request, pk):
 def delete_lead(request, pk):
     """Delete a lead"""
     lead = get_object_or_404(Lead, pk=pk)
+    before = {pk: lead_snapshot(lead)}
     lead.delete()
+    notify_leads_changed(deleted=[pk], before=before)
     messages.success(request, "Lead deleted successfully!")
     return redirect('home')
 
 
+def _bulk_error(request, form, verb):
+    """Report an invalid bulk request as JSON for XHR callers, or as a flash message"""
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return JsonResponse({'success': False, 'errors': form.errors}, status=400)
+    messages.error(request, f"Bulk {verb} failed: {form.errors.as_text()}")
+    return redirect('all_leads')
+
+
+def _bulk_done(request, result, verb):
+    """Report bulk progress counts as JSON for XHR callers, or as a flash message"""
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return JsonResponse({'success': True, **result})
+    messages.success(
+        request,
+        f"Bulk {verb}: processed {result['processed']} of {result['matched']} leads in {result['chunks']} chunks"
+    )
+    return redirect('all_leads')
+
+
+def bulk_delete_leads(request):
+    """Delete every lead matching a search, upload batch or ID list, in chunks"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=400)
+
+    form = BulkLeadFilterForm(request.POST)
+    if not form.is_valid():
+        return _bulk_error(request, form, 'delete')
+
+    leads = leads_matching(
+        search=form.cleaned_data['search'],
+        upload=form.cleaned_data['upload'],
+        ids=form.cleaned_data['ids'],
+    )
+    result = chunked_delete(leads)
+    return _bulk_done(request, result, 'delete')
+
+
+def bulk_update_leads(request):
+    """Overwrite fields on every lead matching a search, upload batch or ID list, in chunks"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=400)
+
+    form = BulkLeadUpdateForm(request.POST)
+    if form.is_valid() and not form.get_update_values():
+        form.add_error(None, 'Provide at least one field to update')
+    if not form.is_valid():
+        return _bulk_error(request, form, 'update')
+
+    leads = leads_matching(
+        search=form.cleaned_data['search'],
+        upload=form.cleaned_data['upload'],
+        ids=form.cleaned_data['ids'],
+    )
+    result = chunked_update(leads, form.get_update_values())
+    return _bulk_done(request, result, 'update')
+
+
+EXPORT_FIELDS = [
+    'name', 'role', 'company', 'linkedin_url', 'location', 'email',
+    'phone', 'skills', 'experience_years', 'match_score',
+]
+
+
 def export_leads(request):
-    """Export all leads to Excel"""
+    """Export all leads to Excel; `?notes=1` adds the notes column"""
     leads = Lead.objects.all()
+    columns = list(EXPORT_FIELDS)
+    text = {}
+    if request.GET.get('notes') == '1':
+        columns.insert(columns.index('match_score'), 'notes')
+        text['notes'] = F('text__notes')
     
     # Create DataFrame
-    data = []
-    for lead in leads:
-        data.append({
-            'name': lead.name,
-            'role': lead.role,
-            'company': lead.company,
-            'linkedin_url': lead.linkedin_url,
-            'location': lead.location,
-            'email': lead.email,
-            'phone': lead.phone,
-            'skills': lead.skills,
-            'experience_years': lead.experience_years,
-            'notes': lead.notes,
-            'match_score': lead.match_score,
-        })
+    with span('export.fetch') as timing:
+        data = list(leads.values(*EXPORT_FIELDS, **text))
+        timing['rows'] = len(data)
     
-    df = pd.DataFrame(data)
-    
-    # Create Excel file in memory
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Leads')
+    with span('export.excel'):
+        df = pd.DataFrame(data, columns=columns)
+        
+        # Create Excel file in memory
+        output = BytesIO()
+        with pd.ExcelWriter(output, engine='openpyxl') as writer:
+            df.to_excel(writer, index=False, sheet_name='Leads')
     
     output.seek(0)
     
@@ -646,37 +736,37 @@ def export_leads(request):
 
 
 def clear_chat_history(request, pk):
-    """Clear chat history for a specific lead"""
+    """Clear this session's chat history for a specific lead"""
     if request.method == 'POST' or request.method == 'GET':
-        history_key = f'chat_history_{pk}'
-        if history_key in request.session:
-            del request.session[history_key]
-            request.session.modified = True
+        clear_conversation(request, pk)
         
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return JsonResponse({'success': True, 'message': 'Chat history cleared'})
         else:
             messages.success(request, 'Chat history cleared successfully!')
-            return redirect('all_leads', pk=pk)
+            return redirect('lead_detail', pk=pk)
     
     return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=400)
 
 
+@condition(etag_func=lead_list_etag, last_modified_func=lead_list_last_modified)
 def all_leads(request):
     leads = Lead.objects.all()
     search_query = request.GET.get('search', '').strip()
+    active_facets = selected_facets(request.GET)
 
     if search_query:
-        leads = leads.filter(
-            Q(name__icontains=search_query) |
-            Q(email__icontains=search_query) |
-            Q(company__icontains=search_query) |
-            Q(skills__icontains=search_query)
-        )
+        leads = leads.filter(search_query_filter(search_query))
+    leads = filter_by_facets(leads, active_facets)
 
     context = {
         'leads': leads,
         'search_query': search_query,
+        'active_facets': active_facets,
+        'facet_groups': facet_sidebar(request.GET),
+        # Fragment cache key for the current search and facet selection
+        'filter_key': request.GET.urlencode(),
+        'leads_fingerprint': lead_table_state(request)['fingerprint'],
         'upload_form': LeadUploadForm(),
         'search_form': LeadSearchForm(),
     }
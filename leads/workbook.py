@@ -0,0 +1,108 @@
+"""
+Excel parsing for lead uploads.
+
+Nothing here touches the database or Django's app registry, so
+`parse_sheet` can run in a worker process that has not set Django up.
+"""
+import re
+
+import pandas as pd
+
+# Column mapping from Excel to Lead model
+COLUMN_MAPPING = {
+    'Name': 'name',
+    'Linkedin Link': 'linkedin_url',
+    'Designation': 'role',
+    'Linkedin About': 'notes',
+    'Company Name': 'company',
+    'Location\n(Where GCC center is opening.\nIf 2 locations, one is HQ one is GCC)': 'location',
+    'Company Headquarters': 'company_hq',
+    'Category': 'category',
+    'Expansion Type': 'expansion_type',
+    'Comments': 'comments',
+    'Email': 'email',
+    'Phone': 'phone',
+    'Category\n(By level of relationship)': 'relationship_category',
+    'Message, invite sent for lead generation only (Yes/No/Doubtful)': 'invite_sent',
+    'MB Connection Level': 'connection_level',
+    'Relevant': 'relevant',
+    'Phone Number sent to sir': 'phone_sent',
+    'Response': 'response',
+    'Remarks': 'remarks',
+    'Original Sheet': 'original_sheet'
+}
+
+
+def safe_str(value, default=''):
+    """Stringify a cell, treating NaN/blank as missing"""
+    if pd.notna(value) and str(value).strip() and str(value).strip().lower() != 'nan':
+        return str(value).strip()
+    return default
+
+
+def rows_from_dataframe(df, email_tag=''):
+    """
+    Turn a renamed upload DataFrame into lead dicts.
+    Returns (rows, skipped) where skipped counts rows without a name.
+    `email_tag` keeps generated emails unique across the sheets of a workbook.
+    """
+    rows = []
+    skipped = 0
+
+    for idx, row in df.iterrows():
+        # Get name - skip if empty
+        name = str(row.get('name', '')).strip()
+        if not name or name == 'nan':
+            skipped += 1
+            continue
+
+        # Get email - generate if missing
+        email = safe_str(row.get('email'))
+        if not email:
+            email = f"{name.lower().replace(' ', '.')}.{email_tag}{idx}@leads.local"
+
+        rows.append({
+            'name': name,
+            'email': email,
+            'phone': safe_str(row.get('phone')),
+            'role': safe_str(row.get('role')),
+            'company': safe_str(row.get('company')),
+            'linkedin_url': safe_str(row.get('linkedin_url')),
+            'location': safe_str(row.get('location')),
+            'skills': '',
+            'experience_years': 0,
+            'notes': safe_str(row.get('notes')),
+        })
+
+    return rows, skipped
+
+
+def sheet_names(path):
+    """Names of the worksheets in a workbook, in tab order"""
+    with pd.ExcelFile(path) as workbook:
+        return workbook.sheet_names
+
+
+def parse_sheet(path, sheet_name, position=0):
+    """
+    Read one worksheet and clean it into lead dicts.
+
+    Returns a dict with the sheet name, the rows, the number of rows
+    skipped for having no name and an error for sheets without a Name
+    column. Generated emails of the first sheet keep their single-sheet
+    form so re-uploading an old file still matches its leads.
+    """
+    df = pd.read_excel(path, sheet_name=sheet_name)
+    df = df.rename(columns=COLUMN_MAPPING)
+    result = {'sheet': sheet_name, 'rows': [], 'skipped': 0, 'error': None}
+
+    if 'name' not in df.columns:
+        result['error'] = "no 'Name' column"
+        result['skipped'] = len(df)
+        return result
+
+    email_tag = ''
+    if position:
+        email_tag = re.sub(r'[^a-z0-9]+', '-', str(sheet_name).lower()).strip('-') + '.'
+    result['rows'], result['skipped'] = rows_from_dataframe(df, email_tag=email_tag)
+    return result
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
 from pathlib import Path
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -45,7 +46,11 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Compresses HTML and JSON responses; outermost so it sees the final body
+    'django.middleware.gzip.GZipMiddleware',
+    'leads.profiling.ProfilingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'leads.sessions.SessionRefreshMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -95,8 +100,118 @@ DATABASES = {
 #     }
 # }
 
+# Cache used for page fragments and lead-derived data. Entries are keyed by
+# a version kept in the database (see leads.caching), so the per-process
+# local-memory default stays correct with many workers; set REDIS_URL to
+# share the cached entries between them.
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 import os
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
+OPENAI_BASE_URL = os.environ.get('OPENAI_BASE_URL')  # None uses api.openai.com
+
+# Client-side limits for OpenAI calls; requests over the limit wait in line
+LEADS_OPENAI_REQUESTS_PER_MINUTE = int(os.environ.get('LEADS_OPENAI_REQUESTS_PER_MINUTE', 60))
+LEADS_OPENAI_TOKENS_PER_MINUTE = int(os.environ.get('LEADS_OPENAI_TOKENS_PER_MINUTE', 90000))
+
+# Retries and circuit breaker for OpenAI calls. The AI search answers within
+# LEADS_AI_LATENCY_BUDGET seconds, falling back to keyword matching if needed.
+LEADS_AI_LATENCY_BUDGET = float(os.environ.get('LEADS_AI_LATENCY_BUDGET', 25))
+LEADS_OPENAI_MAX_RETRIES = int(os.environ.get('LEADS_OPENAI_MAX_RETRIES', 2))
+LEADS_OPENAI_BREAKER_FAILURES = int(os.environ.get('LEADS_OPENAI_BREAKER_FAILURES', 5))
+LEADS_OPENAI_BREAKER_SLOW_CALL_SECONDS = float(os.environ.get('LEADS_OPENAI_BREAKER_SLOW_CALL_SECONDS', 15))
+LEADS_OPENAI_BREAKER_RESET_SECONDS = float(os.environ.get('LEADS_OPENAI_BREAKER_RESET_SECONDS', 30))
+
+# Token budget for the AI lead search prompt (system + user message) and
+# its completion; the leads table gets whatever the prompt text leaves over.
+LEADS_AI_PROMPT_TOKEN_BUDGET = int(os.environ.get('LEADS_AI_PROMPT_TOKEN_BUDGET', 12000))
+LEADS_AI_COMPLETION_TOKENS = int(os.environ.get('LEADS_AI_COMPLETION_TOKENS', 1500))
+
+# Rows per transaction for bulk delete/edit of leads. A delete chunk runs
+# one DELETE per table that cascades from Lead (seven in all), each with
+# this many IDs in its IN list.
+LEADS_BULK_CHUNK_SIZE = int(os.environ.get('LEADS_BULK_CHUNK_SIZE', 1000))
+
+# Rows per transaction when importing leads (Excel upload and API upsert)
+LEADS_INGEST_BATCH_SIZE = int(os.environ.get('LEADS_INGEST_BATCH_SIZE', 500))
+
+# Processes parsing the sheets of an uploaded workbook (0 = one per CPU,
+# up to 4), and the smallest workbook worth starting them for
+LEADS_INGEST_WORKERS = int(os.environ.get('LEADS_INGEST_WORKERS', 0))
+LEADS_INGEST_PARALLEL_MIN_BYTES = int(os.environ.get('LEADS_INGEST_PARALLEL_MIN_BYTES', 2 * 1024 * 1024))
+
+# zlib-compress long lead text (notes) in the LeadText side table
+LEADS_COMPRESS_TEXT = os.environ.get('LEADS_COMPRESS_TEXT', '1') != '0'
+
+# Chunked uploads: directory the chunks are assembled in (must be shared
+# by every instance for uploads to resume across them), the largest chunk
+# per request (kept under the serverless request body limit), the largest
+# file, and how long an unfinished upload can be resumed
+LEADS_CHUNKED_UPLOAD_DIR = os.environ.get(
+    'LEADS_CHUNKED_UPLOAD_DIR', os.path.join(tempfile.gettempdir(), 'leads-chunked-uploads')
+)
+LEADS_CHUNKED_UPLOAD_CHUNK_SIZE = int(os.environ.get('LEADS_CHUNKED_UPLOAD_CHUNK_SIZE', 4 * 1024 * 1024))
+LEADS_CHUNKED_UPLOAD_MAX_SIZE = int(os.environ.get('LEADS_CHUNKED_UPLOAD_MAX_SIZE', 500 * 1024 * 1024))
+LEADS_CHUNKED_UPLOAD_EXPIRY_HOURS = int(os.environ.get('LEADS_CHUNKED_UPLOAD_EXPIRY_HOURS', 24))
+
+# JSON API: max IDs/emails/leads per batch call, and the bearer token it
+# requires (the API answers 403 until one is set)
+LEADS_API_MAX_BATCH = int(os.environ.get('LEADS_API_MAX_BATCH', 500))
+LEADS_API_TOKEN = os.environ.get('LEADS_API_TOKEN')
+
+# Values listed per facet in the all_leads sidebar
+LEADS_FACET_SIZE = int(os.environ.get('LEADS_FACET_SIZE', 10))
+
+# Admin changelist: rows counted exactly before falling back to the
+# planner's row estimate (unfiltered) or a capped count (filtered)
+LEADS_ADMIN_EXACT_COUNT_LIMIT = int(os.environ.get('LEADS_ADMIN_EXACT_COUNT_LIMIT', 10000))
+
+# Profiling: requests with an X-Profile header (equal to LEADS_PROFILE_TOKEN,
+# or any value when DEBUG is on and no token is set) plus a random
+# LEADS_PROFILE_SAMPLE_RATE share are profiled with
+# LEADS_PROFILER ('cprofile' or 'pyinstrument') and dumped to LEADS_PROFILE_DIR.
+# The same header (or a staff login) unlocks /ai-lead-generation/stats/.
+LEADS_PROFILE_SAMPLE_RATE = float(os.environ.get('LEADS_PROFILE_SAMPLE_RATE', 0))
+LEADS_PROFILE_TOKEN = os.environ.get('LEADS_PROFILE_TOKEN')
+LEADS_PROFILER = os.environ.get('LEADS_PROFILER', 'cprofile')
+LEADS_PROFILE_DIR = os.environ.get('LEADS_PROFILE_DIR', BASE_DIR / 'profiles')
+
+# Phase timing spans go to the leads.timing logger as one JSON object per
+# line. Spans log at INFO, so they are off unless LEADS_TIMING_LOG_LEVEL=INFO.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'structured': {
+            '()': 'leads.profiling.StructuredFormatter',
+        },
+    },
+    'handlers': {
+        'timing': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'structured',
+        },
+    },
+    'loggers': {
+        'leads.timing': {
+            'handlers': ['timing'],
+            'level': os.environ.get('LEADS_TIMING_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -128,10 +243,18 @@ USE_I18N = True
 
 USE_TZ = True
 
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# Sessions are read through the cache when it is shared (Redis); a
+# per-process cache could serve another worker's stale copy. They are
+# saved only when they change, plus a sliding-expiry refresh at most
+# every LEADS_SESSION_REFRESH_SECONDS (see leads.sessions).
+if os.getenv("REDIS_URL"):
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+else:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.db'
 SESSION_COOKIE_AGE = 3600
 SESSION_COOKIE_HTTPONLY = True
-SESSION_SAVE_EVERY_REQUEST = True
+SESSION_SAVE_EVERY_REQUEST = False
+LEADS_SESSION_REFRESH_SECONDS = int(os.environ.get('LEADS_SESSION_REFRESH_SECONDS', 300))
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 SESSION_COOKIE_SAMESITE = 'Lax'
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
@@ -149,6 +272,12 @@ CSRF_COOKIE_NAME = 'csrftoken'
 STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# collectstatic writes content-hashed names; compression is the front server's job
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'leads.storage.HashedStaticFilesStorage'},
+}
+
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 